@@ -5,6 +5,8 @@ from pydantic import BaseModel, Field
 class Credits(Document):
     institution = StringField(required=True, unique=True)
     credits = IntField(required=True)
+    # incremented by every write, the ETag of get_credits
+    version = IntField(default=0)
 
     class Config:
         json_schema_extra = {
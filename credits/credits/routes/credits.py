@@ -1,6 +1,8 @@
+from typing import Optional
+
 from credits.models.models import Credits, CreditsModel
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import JSONResponse, Response
 
 router = APIRouter()
 
@@ -23,6 +25,7 @@ async def add_credits(credits: CreditsModel) -> JSONResponse:
         credits_obj = Credits.objects(institution=credits.institution).first()
         if credits_obj:
             credits_obj.credits += added_credits
+            credits_obj.version += 1
             credits_obj.save()
         else:
             new_credits = Credits(institution=institution, credits=added_credits)
@@ -57,6 +60,7 @@ async def remove_credits(credits: CreditsModel) -> JSONResponse:
             credits_obj = credits_obj.first()
             if credits_obj.credits >= removed_credits:
                 credits_obj.credits -= removed_credits
+                credits_obj.version += 1
                 credits_obj.save()
             else:
                 raise HTTPException(
@@ -82,22 +86,32 @@ async def remove_credits(credits: CreditsModel) -> JSONResponse:
 @router.get(
     "/get_credits", response_description="Credits fetched successfully"
 )  # type: ignore
-async def get_credits(institution: str) -> JSONResponse:
+async def get_credits(
+    institution: str, if_none_match: Optional[str] = Header(None)
+) -> Response:
     """
-    Returns credits from a specific institution
+    Returns credits from a specific institution.
+    The ETag is the version of the credits: a request with a matching If-None-Match header gets a 304.
 
     :param institution: The institution's name
     :type institution: str
+    :param if_none_match: The ETag of a previous response
+    :type if_none_match: Optional[str]
     """
     try:
         credits_obj = Credits.objects(institution=institution).first()
         if credits_obj:
+            etag = f'"{credits_obj.id}-{credits_obj.version}"'
+            if if_none_match == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+
             return JSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={
                     "description": "Credits fetched successfully",
                     "credits": credits_obj.credits,
                 },
+                headers={"ETag": etag},
             )
         else:
             raise HTTPException(
@@ -111,11 +111,21 @@ class GetCredits(unittest.TestCase):
         response = client.get("/credits/get_credits?institution=uni_1")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["credits"], 300)
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "/credits/get_credits?institution=uni_1", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
 
         remove_credits = {"institution": "uni_1", "credits": 150}
         response = client.request("PUT", "/credits/remove_credits", json=remove_credits)
         self.assertEqual(response.status_code, 200)
 
-        response = client.get("/credits/get_credits?institution=uni_1")
+        # the removal changed the version
+        response = client.get(
+            "/credits/get_credits?institution=uni_1", headers={"If-None-Match": etag}
+        )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["credits"], 150)
+        self.assertNotEqual(response.headers["ETag"], etag)
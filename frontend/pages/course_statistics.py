@@ -7,7 +7,7 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
-from orchestrator.statistics.statistics_ops import get_course_stats
+from orchestrator.statistics.statistics_ops import get_course_stats_many
 
 # Check authentication
 if "username" not in st.session_state or "role" not in st.session_state:
@@ -31,44 +31,37 @@ if "filters" not in st.session_state:
     }
 
 
-async def fetch_course_stats(course_id: str, exam_year: int, exam_type: str):  # type: ignore
-    """Fetch statistics for a specific course exam period"""
+async def fetch_course_stats_many(course_id: str, periods: list[tuple[int, str]]):  # type: ignore
+    """Fetch statistics for several exam periods of a course in one batch"""
     try:
-        response = await get_course_stats(course_id, exam_year, exam_type)
-        response_body = json.loads(response.body)
-        if response.status_code == 200:
-            return response_body
-        st.error(f"Error fetching stats: {response_body['detail']}")
-        return None
+        response = await get_course_stats_many(
+            [
+                {"course_id": course_id, "exam_year": year, "exam_type": exam_type}
+                for year, exam_type in periods
+            ]
+        )
+        results = json.loads(response.body)["results"]
     except Exception as e:
         st.error(f"API connection failed: {str(e)}")
-        return None
+        return {}
+
+    stats = {}
+    for result in results:
+        if result["status_code"] == 200:
+            stats[(result["exam_year"], result["exam_type"])] = result["content"]
+    return stats
 
 
 def display_success_pie(stats_data: dict) -> None:
     """Display a pie chart of success (pass/fail) rates using Altair."""
-    grades_dist = stats_data.get("grades_dist", {})
-    if not grades_dist:
-        st.warning("No grade distribution data available for success rate")
-        return
-
-    pass_count = 0
-    fail_count = 0
-    for grade_str, count in grades_dist.items():
-        try:
-            grade = float(grade_str)
-        except ValueError:
-            continue
-        if grade >= 5:
-            pass_count += count
-        else:
-            fail_count += count
-
-    total = pass_count + fail_count
-    if total == 0:
+    summary = stats_data.get("summary", {})
+    if not summary.get("count"):
         st.warning("No graded students to calculate success rate")
         return
 
+    pass_count = round(summary["pass_rate"] * summary["count"])
+    fail_count = summary["count"] - pass_count
+
     df = pd.DataFrame({"Result": ["Pass", "Fail"], "Count": [pass_count, fail_count]})
 
     # Pie chart with Altair
@@ -95,6 +88,29 @@ def display_success_pie(stats_data: dict) -> None:
     st.altair_chart(chart, use_container_width=False)
 
 
+def display_summary(stats_data: dict) -> None:
+    """Display the summary metrics computed by the statistics service."""
+    summary = stats_data.get("summary", {})
+    if not summary.get("count"):
+        return
+
+    st.subheader("Summary")
+    columns = st.columns(5)
+    columns[0].metric("Students", summary["count"])
+    columns[1].metric("Mean", f"{summary['mean']:.2f}")
+    columns[2].metric("Median", f"{summary['median']:.2f}")
+    columns[3].metric("Std. deviation", f"{summary['variance'] ** 0.5:.2f}")
+    columns[4].metric("Pass rate", f"{summary['pass_rate']:.1%}")
+
+    questions = pd.DataFrame(summary["questions"])
+    if not questions.empty:
+        questions.index = [f"Question {q + 1}" for q in range(len(questions))]
+        questions = questions.rename(
+            columns={"mean": "Mean", "correlation": "Correlation with grade"}
+        )
+        st.dataframe(questions)
+
+
 def display_grade_distribution(stats_data: dict) -> None:
     """Display grade distribution charts using Streamlit's native functions"""
     st.subheader("Grade Distribution")
@@ -196,19 +212,27 @@ def main():  # type: ignore
         st.warning("Please enter a Course ID to view statistics")
         return
 
+    periods = [
+        (year, exam_type)
+        for year in selected_years
+        for exam_type in selected_exam_types
+    ]
+    with st.spinner(f"Loading statistics for {len(periods)} exam periods..."):
+        all_stats = asyncio.run(fetch_course_stats_many(course_id, periods))
+
     # Display statistics for each selected year and exam type
     for year in selected_years:
         for exam_type in selected_exam_types:
             st.header(f"Statistics for {course_id} - {exam_type} {year}")
 
-            with st.spinner(f"Loading statistics for {exam_type} {year}..."):
-                stats_data = asyncio.run(fetch_course_stats(course_id, year, exam_type))
+            stats_data = all_stats.get((year, exam_type))
 
-                if stats_data:
-                    display_grade_distribution(stats_data)
-                    display_success_pie(stats_data)
-                else:
-                    st.warning(f"No statistics available for {exam_type} {year}")
+            if stats_data:
+                display_summary(stats_data)
+                display_grade_distribution(stats_data)
+                display_success_pie(stats_data)
+            else:
+                st.warning(f"No statistics available for {exam_type} {year}")
 
 
 if __name__ == "__main__":
@@ -12,7 +12,7 @@ import streamlit as st
 
 from orchestrator.credits.credits_ops import get_credits, remove_credits
 from orchestrator.statistics.statistics_ops import (
-    add_grades,
+    add_grades_in_background,
     finalize_course,
     get_status_of_grades,
     initialize_course_grades,
@@ -166,10 +166,16 @@ with st.container():
         if st.button("Confirm"):
             remove_credits_also = False
             if st.session_state.status_of_grades == "UNKNOWN":
-                response = asyncio.run(add_grades(st.session_state.grades))
+                with st.spinner("Posting grades..."):
+                    response = asyncio.run(
+                        add_grades_in_background(st.session_state.grades)
+                    )
                 remove_credits_also = True
             else:
-                response = asyncio.run(update_grades(st.session_state.grades))
+                # the final upload is the complete list of grades of the exam period
+                response = asyncio.run(
+                    update_grades(st.session_state.grades, replace=True)
+                )
             response_body = json.loads(response.body)
             if response.status_code != 200:
                 st.error(
@@ -34,7 +34,7 @@ def fetch_student_grades(
         params["exam_types"] = exam_types
 
     try:
-        response = asyncio.run(get_student_grades(students=params))
+        response = asyncio.run(get_student_grades(students=params, stream=True))
         response_body = json.loads(response.body)
         if response.status_code == 200:
             grades = response_body.get("grades", [])
@@ -60,7 +60,8 @@ def fetch_reviews(
                     "course_ids": course_ids,
                     "exam_types": exam_types,
                     "years": years,
-                }
+                },
+                stream=True,
             )
         )
         response_body = json.loads(response.body)
@@ -12,8 +12,11 @@ import streamlit as st
 
 from orchestrator.user_management.user_management_ops import (
     register_instructor,
+    register_instructors,
     register_student,
+    register_students,
 )
+from orchestrator.xlsx_parsing.xlsx_parsing_ops import parse_users
 
 with st.container():
     st.header("Users")
@@ -51,7 +54,7 @@ with st.container():
                         "office": office,
                     }
                     response = asyncio.run(register_instructor(instructor))
-                    response_body = json.loads(response.body)
+                    response_body = json.loads(bytes(response.body))
 
                     if response.status_code != 200:
                         st.error(
@@ -70,7 +73,7 @@ with st.container():
                     }
 
                     response = asyncio.run(register_student(student))
-                    response_body = json.loads(response.body)
+                    response_body = json.loads(bytes(response.body))
 
                     if response.status_code != 200:
                         st.error(
@@ -82,3 +85,43 @@ with st.container():
         with col2:
             if st.form_submit_button("Cancel"):
                 st.rerun()
+
+with st.container():
+    st.header("Register users from a registrar file")
+    users_excel = st.file_uploader("Users", type=["xlsx"], key="users_uploader")
+
+    st.info(
+        """
+        One header row and one user per row. A students file has the columns student_id, name, email,
+        password and enrollment_year, an instructors file the columns instructor_id, name, email and
+        password, optionally department, phone and office. The users are registered to your institution.
+        """
+    )
+    if users_excel and st.button("Register users"):
+        response = asyncio.run(parse_users(users_excel))
+        response_body = json.loads(bytes(response.body))
+        if response.status_code != 200:
+            error = response_body.get("error") or response_body["detail"]["error"]
+            st.error(f"Error while parsing users file: {error}")
+        else:
+            users = [
+                {**user, "institution": st.session_state.institution}
+                for user in response_body["result"]["users"]
+            ]
+            if response_body["result"]["format"] == "students":
+                response = asyncio.run(register_students(users))
+            else:
+                response = asyncio.run(register_instructors(users))
+            response_body = json.loads(bytes(response.body))
+
+            if response.status_code != 200:
+                st.error(f"Error while registering users: {response_body['detail']}")
+            else:
+                st.success(response_body["description"])
+                rejected = [
+                    result
+                    for result in response_body["results"]
+                    if result["status"] != "registered"
+                ]
+                if rejected:
+                    st.dataframe(rejected)
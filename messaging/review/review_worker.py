@@ -14,4 +14,6 @@ def on_request(ch, method, props, body) -> None:  # type: ignore
 
 
 if __name__ == "__main__":
-    queue_and_consume(queue_name="review_queue", on_request=on_request)
+    queue_and_consume(
+        queue_name="review_queue", on_request=on_request, handler=send_request
+    )
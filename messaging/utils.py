@@ -1,55 +1,109 @@
 import base64
+import functools
+import gzip
 import json
 import os
+import threading
 import time
-from typing import Any, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
 
 import pika
 import requests
 from fastapi import UploadFile
+from requests.adapters import HTTPAdapter
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
 
-def send_request(body: Any) -> dict:
+# number of messages a worker handles at the same time (1 = sequential worker)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+# unacked messages RabbitMQ hands to the worker, defaults to its concurrency
+WORKER_PREFETCH = int(os.getenv("WORKER_PREFETCH", str(WORKER_CONCURRENCY)))
+
+# records per reply message when a streamed (ndjson) response is forwarded
+STREAM_CHUNK_RECORDS = int(os.getenv("STREAM_CHUNK_RECORDS", "1000"))
+
+# backend (scheme://host:port) -> keep-alive session
+sessions: Dict[str, requests.Session] = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(endpoint: str) -> requests.Session:
+    """
+    Returns the pooled keep-alive session of the backend serving the endpoint,
+    so that consecutive messages reuse TCP connections instead of opening one
+    per request.
+    """
+    parts = urlsplit(endpoint)
+    backend = f"{parts.scheme}://{parts.netloc}"
+
+    with sessions_lock:
+        session = sessions.get(backend)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=max(WORKER_CONCURRENCY, 1)
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            sessions[backend] = session
+
+    return session
+
+
+def resolve_endpoint(body_dict: dict) -> str:
+    hostname = os.getenv("RESPONSIBLE_HOST", "localhost")
+    if hostname != "localhost":
+        body_dict["endpoint"] = (
+            body_dict["endpoint"]
+            .replace("localhost", hostname)
+            .replace("127.0.0.1", hostname)
+        )
+    print(
+        f" [.] Sending request to {body_dict['endpoint']} with method {body_dict['method']}"
+    )
+    return str(body_dict["endpoint"])
+
+
+def send_request(body: Any) -> Union[dict, Iterator[dict]]:
+    """
+    Forwards the request to the backend and returns the response_data to reply with.
+    For a load with "stream": true answered with ndjson, the response is not read
+    here: an iterator of response_data chunks is returned instead (see stream_response).
+    """
     try:
         body_dict = json.loads(body)
-        hostname = os.getenv("RESPONSIBLE_HOST", "localhost")
-        if hostname != "localhost":
-            body_dict["endpoint"] = (
-                body_dict["endpoint"]
-                .replace("localhost", hostname)
-                .replace("127.0.0.1", hostname)
-            )
-        print(
-            f" [.] Sending request to {body_dict['endpoint']} with method {body_dict['method']}"
+        endpoint = resolve_endpoint(body_dict)
+
+        method = body_dict["method"]
+        if method not in ("POST", "GET", "PUT"):
+            method = "DELETE"
+
+        stream = bool(body_dict.get("stream"))
+        response = get_session(endpoint).request(
+            method,
+            endpoint,
+            json=body_dict.get("json"),
+            params=body_dict.get("params"),
+            headers=body_dict.get("headers"),
+            stream=stream,
         )
-        if body_dict["method"] == "POST":
-            if "headers" in body_dict:
-                response = requests.post(
-                    body_dict["endpoint"], headers=body_dict["headers"]
-                )
-            if "json" in body_dict:
-                response = requests.post(body_dict["endpoint"], json=body_dict["json"])
-            else:
-                response = requests.post(body_dict["endpoint"])
-        elif body_dict["method"] == "GET":
-            if "params" in body_dict:
-                response = requests.get(
-                    body_dict["endpoint"], params=body_dict["params"]
-                )
-            else:
-                response = requests.get(body_dict["endpoint"])
-        elif body_dict["method"] == "PUT":
-            response = requests.put(body_dict["endpoint"], json=body_dict["json"])
-        else:  # DELETE
-            if "json" not in body_dict:
-                response = requests.delete(body_dict["endpoint"])
-            else:
-                response = requests.delete(
-                    body_dict["endpoint"], json=body_dict["json"]
-                )
 
         print(f" [.] Response status code: {response.status_code}")
 
+        if (
+            stream
+            and response.status_code == 200
+            and response.headers.get("content-type", "").startswith(
+                "application/x-ndjson"
+            )
+        ):
+            return stream_response(response)
+
         try:
             content = response.json()
         except Exception:
@@ -71,13 +125,70 @@ def send_request(body: Any) -> dict:
     return response_data
 
 
-def publish(ch: Any, props: Any, method: Any, response_data: dict) -> None:
+def stream_response(response: requests.Response) -> Iterator[dict]:
+    """
+    Reads an ndjson response line by line and yields it as response_data chunks
+    of STREAM_CHUNK_RECORDS records, so the reply is forwarded while the backend
+    is still sending it. A failure half-way is yielded as a final 500 chunk.
+    """
+    headers = dict(response.headers)
+    records: List[Any] = []
+    try:
+        for line in response.iter_lines():
+            if line:
+                records.append(json.loads(line))
+            if len(records) >= STREAM_CHUNK_RECORDS:
+                yield {"status_code": 200, "headers": headers, "content": records}
+                records = []
+        yield {"status_code": 200, "headers": headers, "content": records}
+    except Exception as e:
+        yield {
+            "status_code": 500,
+            "headers": {},
+            "content": {"error": f"Worker exception: {str(e)}"},
+        }
+    finally:
+        response.close()
+
+
+def stream_messages(chunks: Iterator[dict]) -> Iterator[Tuple[dict, dict]]:
+    """
+    Pairs every chunk of a streamed reply with its message headers:
+    its sequence number and whether it is the last one.
+    """
+    previous = None
+    seq = 0
+    for chunk in chunks:
+        if previous is not None:
+            yield previous, {"x-stream-seq": seq, "x-stream-end": False}
+            seq += 1
+        previous = chunk
+    if previous is not None:
+        yield previous, {"x-stream-seq": seq, "x-stream-end": True}
+
+
+def publish_reply(
+    ch: Any, props: Any, response_data: dict, headers: Optional[dict] = None
+) -> None:
     ch.basic_publish(
         exchange="",
         routing_key=props.reply_to,
-        properties=pika.BasicProperties(correlation_id=props.correlation_id),
+        properties=pika.BasicProperties(
+            correlation_id=props.correlation_id, headers=headers
+        ),
         body=json.dumps(response_data),
     )
+
+
+def publish(
+    ch: Any, props: Any, method: Any, response_data: Union[dict, Iterator[dict]]
+) -> None:
+    if isinstance(response_data, dict):
+        publish_reply(ch, props, response_data)
+    else:
+        # streamed response, one message per chunk
+        for chunk, headers in stream_messages(response_data):
+            publish_reply(ch, props, chunk, headers)
     ch.basic_ack(delivery_tag=method.delivery_tag)
 
 
@@ -105,19 +216,75 @@ def connect_to_rabbitmq(rabbitmq_host: str, queue_name: str) -> Any:
             time.sleep(5)
 
 
-def queue_and_consume(queue_name: str, on_request: Callable) -> None:
+def queue_and_consume(
+    queue_name: str,
+    on_request: Callable,
+    handler: Optional[Callable[[Any], Any]] = None,
+) -> None:
+    """
+    Consumes the queue with on_request, one message at a time.
+    If a handler (body -> response_data) is given and WORKER_CONCURRENCY > 1,
+    the worker runs in concurrent mode instead (see consume_concurrently).
+    """
     rabbitmq_host = os.getenv("RABBITMQ_HOST", "localhost")
 
     connection = connect_to_rabbitmq(rabbitmq_host, queue_name)
 
     channel = connection.channel()
     channel.queue_declare(queue=queue_name, durable=True)
+
+    if handler is not None and WORKER_CONCURRENCY > 1:
+        consume_concurrently(connection, channel, queue_name, handler)
+        return
+
     channel.basic_qos(prefetch_count=1)
     channel.basic_consume(queue=queue_name, on_message_callback=on_request)
     print(" [x] Awaiting requests")
     channel.start_consuming()
 
 
+def consume_concurrently(
+    connection: Any, channel: Any, queue_name: str, handler: Callable[[Any], Any]
+) -> None:
+    """
+    Handles up to WORKER_CONCURRENCY messages at once in a thread pool.
+    The backend call runs on a pool thread, while publishing the reply and
+    acking the message is handed back to the connection thread, since pika
+    channels are not thread safe. Each message is acked as soon as its own
+    reply is published.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=WORKER_CONCURRENCY, thread_name_prefix=f"{queue_name}-worker"
+    )
+
+    def process(ch, method, props, body) -> None:  # type: ignore
+        response_data = handler(body)
+        if isinstance(response_data, dict):
+            connection.add_callback_threadsafe(
+                functools.partial(publish, ch, props, method, response_data)
+            )
+            return
+
+        # streamed response: the backend is read on this thread and
+        # every chunk is published as soon as it is complete
+        for chunk, headers in stream_messages(response_data):
+            connection.add_callback_threadsafe(
+                functools.partial(publish_reply, ch, props, chunk, headers)
+            )
+        connection.add_callback_threadsafe(
+            functools.partial(ch.basic_ack, delivery_tag=method.delivery_tag)
+        )
+
+    def on_request(ch, method, props, body) -> None:  # type: ignore
+        print(" [.] Received request")
+        executor.submit(process, ch, method, props, body)
+
+    channel.basic_qos(prefetch_count=WORKER_PREFETCH)
+    channel.basic_consume(queue=queue_name, on_message_callback=on_request)
+    print(f" [x] Awaiting requests ({WORKER_CONCURRENCY} concurrent)")
+    channel.start_consuming()
+
+
 def encode_file(file: UploadFile):  # type: ignore
     content = file.file.read()
     return {
@@ -137,3 +304,72 @@ def decode_file(body):  # type: ignore
     # Construct proper multipart-form file
     files = {"file": (filename, content_bytes, content_type)}
     return files
+
+
+# seconds after which a partially received file upload is dropped
+# (e.g. the orchestrator timed out and re-published it under a new id)
+UPLOAD_TTL = 300.0
+
+# correlation id -> (arrival of the first chunk, chunk index -> chunk)
+uploads: Dict[str, Tuple[float, Dict[int, bytes]]] = {}
+
+
+class UploadError(Exception):
+    """A file message that cannot be assembled, answered with an error reply."""
+
+
+def is_file_message(props: Any) -> bool:
+    return bool(props.headers) and "x-file-name" in props.headers
+
+
+def assemble_file_message(props: Any, body: bytes) -> Optional[Tuple[dict, dict]]:
+    """
+    Collects the chunks of a binary file message (raw bytes in the body,
+    request and file metadata in the headers).
+
+    :return: (load, files) once the last chunk of the upload has arrived,
+             None while chunks are still missing
+    :raises UploadError: if a chunk was lost or the content cannot be decompressed
+    """
+    headers = props.headers
+    now = time.time()
+
+    for upload_id in [
+        upload_id
+        for upload_id, (started, _) in uploads.items()
+        if now - started > UPLOAD_TTL
+    ]:
+        del uploads[upload_id]
+
+    index = headers["x-chunk-index"]
+    count = headers["x-chunk-count"]
+    _, chunks = uploads.setdefault(props.correlation_id, (now, {}))
+    chunks[index] = body
+    if len(chunks) < count and index < count - 1:
+        return None
+    del uploads[props.correlation_id]
+
+    # the chunks are published in order, so once the last one is in any
+    # missing chunk was lost (its upload is re-published under a new id)
+    if sorted(chunks) != list(range(count)):
+        raise UploadError(
+            f"Upload incomplete: {len(chunks)} of {count} chunks received"
+        )
+    content = b"".join(chunks[i] for i in range(count))
+
+    encoding = headers.get("x-content-encoding", "identity")
+    try:
+        if encoding == "gzip":
+            content = gzip.decompress(content)
+        elif encoding == "zstd":
+            if zstandard is None:
+                raise UploadError("zstd uploads are not supported by this worker")
+            content = zstandard.ZstdDecompressor().decompress(content)
+    except UploadError:
+        raise
+    except Exception as e:
+        raise UploadError(f"Corrupt {encoding} upload: {str(e)}")
+
+    load = json.loads(headers["x-rpc-load"])
+    files = {"file": (headers["x-file-name"], content, headers["x-file-content-type"])}
+    return load, files
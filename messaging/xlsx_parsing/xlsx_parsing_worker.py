@@ -2,32 +2,25 @@ import json
 import os
 import sys
 
-import requests
-
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils import decode_file, publish, queue_and_consume
-
-
-def on_request(ch, method, props, body) -> None:  # type: ignore
-    print(" [.] Received request")
+from utils import (
+    UploadError,
+    assemble_file_message,
+    decode_file,
+    get_session,
+    is_file_message,
+    publish,
+    queue_and_consume,
+    resolve_endpoint,
+)
 
-    body_dict = json.loads(body)
-    hostname = os.getenv("RESPONSIBLE_HOST", "localhost")
-    if hostname != "localhost":
-        body_dict["endpoint"] = (
-            body_dict["endpoint"]
-            .replace("localhost", hostname)
-            .replace("127.0.0.1", hostname)
-        )
-    print(
-        f" [.] Sending request to {body_dict['endpoint']} with method {body_dict['method']}"
-    )
 
-    files = decode_file(body)
+def post_file(load: dict, files: dict) -> dict:
+    endpoint = resolve_endpoint(load)
 
     try:
-        response = requests.post(body_dict["endpoint"], files=files)
+        response = get_session(endpoint).post(endpoint, files=files)
         print(f" [.] Response status code: {response.status_code}")
         response_data = {
             "status_code": response.status_code,
@@ -41,8 +34,38 @@ def on_request(ch, method, props, body) -> None:  # type: ignore
             "content": {"error": f"Worker exception: {str(e)}"},
         }
 
+    return response_data
+
+
+def on_request(ch, method, props, body) -> None:  # type: ignore
+    print(" [.] Received request")
+
+    if is_file_message(props):
+        try:
+            assembled = assemble_file_message(props, body)
+        except UploadError as e:
+            response_data = {
+                "status_code": 400,
+                "headers": {},
+                "content": {"error": str(e)},
+            }
+            publish(ch, props, method, response_data)
+            return
+        if assembled is None:
+            # wait for the remaining chunks of the upload
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        load, files = assembled
+    else:
+        # base64 encoded file inside a json message
+        load = json.loads(body)
+        files = decode_file(body)
+
+    response_data = post_file(load, files)
     publish(ch, props, method, response_data)
 
 
 if __name__ == "__main__":
+    # chunks of an upload have to be reassembled in order by a single
+    # consumer, so this worker always runs sequentially
     queue_and_consume(queue_name="xlsx_parsing_queue", on_request=on_request)
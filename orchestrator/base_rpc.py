@@ -1,11 +1,36 @@
+import asyncio
+import functools
+import gzip
+import importlib
 import json
 import os
+import threading
 import time
 import uuid
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 import pika
 from fastapi.responses import JSONResponse
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+# compression of uploaded files on the wire: identity, gzip or zstd
+FILE_COMPRESSION = os.getenv("RPC_FILE_COMPRESSION", "identity")
+# files larger than this are published as several messages
+FILE_CHUNK_SIZE = int(os.getenv("RPC_FILE_CHUNK_SIZE", str(4 * 1024 * 1024)))
+# replies of GET requests kept to be revalidated with their ETag, 0 disables it
+ETAG_CACHE_SIZE = int(os.getenv("RPC_ETAG_CACHE_SIZE", "256"))
+# longest wait (seconds) between two attempts to reconnect to RabbitMQ
+RECONNECT_MAX_DELAY = float(os.getenv("RPC_RECONNECT_MAX_DELAY", "30"))
+
 
 def connect_to_rabbitmq(rabbitmq_host: str, queue_name: str):  # type: ignore
     while True:
@@ -31,62 +56,710 @@ def connect_to_rabbitmq(rabbitmq_host: str, queue_name: str):  # type: ignore
             time.sleep(5)
 
 
-class RpcClient:
-    queue_name: str
-    max_retries: int = 5
-    timeout: float = 5.0
+def encode_file_message(load: dict) -> List[Tuple[bytes, dict]]:
+    """
+    Binary message format of a load carrying a file (load["file"] holds the
+    filename, content_type and raw content bytes). The optionally compressed
+    bytes travel as the AMQP body, split in chunks of FILE_CHUNK_SIZE, while
+    the rest of the load and the file metadata travel in the headers.
 
-    def __init__(self) -> None:
+    :return: the (body, headers) of every message to publish, in order
+    """
+    file_info = load["file"]
+    content = file_info["content"]
+
+    encoding = FILE_COMPRESSION
+    if encoding == "gzip":
+        content = gzip.compress(content)
+    elif encoding == "zstd" and zstandard is not None:
+        content = zstandard.ZstdCompressor().compress(content)
+    else:
+        encoding = "identity"
+
+    request = {key: value for key, value in load.items() if key != "file"}
+    chunks = [
+        content[start : start + FILE_CHUNK_SIZE]
+        for start in range(0, len(content), FILE_CHUNK_SIZE)
+    ] or [b""]
+
+    return [
+        (
+            chunk,
+            {
+                "x-rpc-load": json.dumps(request),
+                "x-file-name": file_info["filename"],
+                "x-file-content-type": file_info["content_type"],
+                "x-content-encoding": encoding,
+                "x-chunk-index": index,
+                "x-chunk-count": len(chunks),
+            },
+        )
+        for index, chunk in enumerate(chunks)
+    ]
+
+
+def reply_envelope(status_code: int, headers: dict, content: Any) -> str:
+    """JSON body of a reply, in the same shape the messaging workers publish."""
+    return json.dumps(
+        {"status_code": status_code, "headers": headers, "content": content}
+    )
+
+
+class ETagCache:
+    """
+    Replies of GET requests that carried an ETag. The same request is sent again
+    with If-None-Match, and a 304 reply (no body through the broker) is answered
+    with the cached reply, so callers always get the full content.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        # request key -> (etag, [body, headers] of the reply)
+        self.replies: "OrderedDict[str, Tuple[str, list]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, load: dict) -> Optional[str]:
+        if self.max_size == 0 or load.get("method") != "GET" or load.get("stream"):
+            return None
+        return json.dumps(
+            [load["endpoint"], load.get("params"), load.get("headers")],
+            sort_keys=True,
+        )
+
+    def conditional(self, load: dict) -> Tuple[dict, Optional[str]]:
+        """The load to send, with If-None-Match if its reply is cached, and its key."""
+        key = self.key(load)
+        if key is None:
+            return load, None
+        with self.lock:
+            cached = self.replies.get(key)
+        if cached is None:
+            return load, key
+        headers = {**(load.get("headers") or {}), "If-None-Match": cached[0]}
+        return {**load, "headers": headers}, key
+
+    def unconditional(self, load: dict) -> dict:
+        # the load without the If-None-Match conditional() added
+        headers = {
+            name: value
+            for name, value in (load.get("headers") or {}).items()
+            if name != "If-None-Match"
+        }
+        return {**load, "headers": headers}
+
+    def revalidated(self, key: Optional[str], reply: list) -> Optional[list]:
+        """
+        The reply to return for a reply received for the load with key.
+        None for a 304 whose cached reply was evicted meanwhile: the load
+        has to be sent again without If-None-Match (see unconditional).
+        """
+        if key is None:
+            return reply
+
+        response = json.loads(reply[0])
+        with self.lock:
+            if response["status_code"] == 304:
+                if key not in self.replies:
+                    return None
+                self.replies.move_to_end(key)
+                return self.replies[key][1]
+
+            etag = {
+                name.lower(): value for name, value in response["headers"].items()
+            }.get("etag")
+            if response["status_code"] != 200 or etag is None:
+                self.replies.pop(key, None)
+                return reply
+
+            self.replies[key] = (etag, reply)
+            self.replies.move_to_end(key)
+            while len(self.replies) > self.max_size:
+                self.replies.popitem(last=False)
+        return reply
+
+
+class RabbitMQTransport:
+    """
+    Multiplexed transport over RabbitMQ.
+
+    A single connection is owned by a dedicated I/O thread that drains the
+    callback queue. Every request registers a future under its own correlation
+    id, so any number of threads (e.g. Streamlit sessions) can have requests in
+    flight at the same time instead of queueing behind each other.
+    """
+
+    def __init__(self, queue_name: str) -> None:
+        self.queue_name = queue_name
+
+        # correlation id -> future of the request waiting for that reply
+        self.pending: Dict[str, "Future[list]"] = {}
+        self.pending_lock = threading.Lock()
+        # correlation id -> reply being assembled from stream chunks,
+        # and when its last chunk arrived
+        self.streams: Dict[str, dict] = {}
+        self.progress: Dict[str, float] = {}
+        # guards the swap of the connection on a reconnect
+        self.connection_lock = threading.Lock()
+
+        self.connect()
+
+        self.io_thread = threading.Thread(
+            target=self.drain_events,
+            name=f"{self.queue_name}-rpc-io",
+            daemon=True,
+        )
+        self.io_thread.start()
+
+    def connect(self) -> None:
         rabbitmq_host = os.getenv("RABBITMQ_HOST", "localhost")
-        self.connection = connect_to_rabbitmq(rabbitmq_host, "orchestrator-reply-queue")
+        connection = connect_to_rabbitmq(rabbitmq_host, "orchestrator-reply-queue")
 
-        self.channel = self.connection.channel()
+        channel = connection.channel()
 
-        result = self.channel.queue_declare(queue="", exclusive=True)
-        self.callback_queue = result.method.queue
+        result = channel.queue_declare(queue="", exclusive=True)
+        callback_queue = result.method.queue
 
-        self.channel.basic_consume(
-            queue=self.callback_queue,
+        channel.basic_consume(
+            queue=callback_queue,
             on_message_callback=self.on_response,
             auto_ack=True,
         )
 
-        self.response = None
-        self.corr_id = None
+        with self.connection_lock:
+            self.connection = connection
+            self.channel = channel
+            self.callback_queue = callback_queue
+
+    def reconnect(self) -> None:
+        # retried with an exponential backoff, the I/O thread must not die
+        delay = 1.0
+        while True:
+            try:
+                self.connect()
+                return
+            except Exception as e:
+                print(
+                    f" [!] Reconnecting the RPC connection for {self.queue_name} failed: {e}. "
+                    f"Retrying in {delay:.0f} seconds..."
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def drain_events(self) -> None:
+        # pika connections are not thread safe, so this thread is the only one
+        # touching the connection. Publishes are handed over to it through
+        # add_callback_threadsafe.
+        while True:
+            try:
+                self.connection.process_data_events(time_limit=1.0)
+            except Exception as e:
+                # also socket errors outside the AMQP hierarchy and errors
+                # raised by the reply callbacks
+                print(f" [!] RPC connection for {self.queue_name} lost: {e}")
+                try:
+                    self.connection.close()
+                except Exception:
+                    pass
+                # requests published on the old connection will time out and
+                # be re-published by call() on the new one
+                self.reconnect()
 
     def on_response(self, ch, method, props, body) -> None:  # type: ignore
-        if self.corr_id == props.correlation_id:
-            self.response = [body, props.headers]  # type: ignore
+        if props.headers and "x-stream-seq" in props.headers:
+            self.on_stream_chunk(props, body)
+            return
 
-    def call(self, load: dict) -> JSONResponse:
-        attempts = 0
-        self.response = None
+        with self.pending_lock:
+            future = self.pending.pop(props.correlation_id, None)
 
-        while attempts < self.max_retries:
-            self.response = None
-            self.corr_id = str(uuid.uuid4())  # type: ignore
+        # a future cancelled by a timed out awaiter must not be resolved
+        if future is not None and future.set_running_or_notify_cancel():
+            future.set_result([body, props.headers])
+
+    def on_stream_chunk(self, props: Any, body: bytes) -> None:
+        """
+        A streamed reply arrives as several messages (see stream_response in the
+        messaging utils). Their records are appended to a single reply, which
+        resolves the future once the message flagged x-stream-end comes in.
+        """
+        chunk = json.loads(body)
+        corr_id = props.correlation_id
+
+        with self.pending_lock:
+            if corr_id not in self.pending:
+                return
+
+            stream = self.streams.setdefault(
+                corr_id,
+                {"status_code": 200, "headers": chunk["headers"], "content": []},
+            )
+            if chunk["status_code"] == 200:
+                stream["content"].extend(chunk["content"])
+            else:
+                # the backend failed half-way, the error replaces the records
+                stream.update(chunk)
+            self.progress[corr_id] = time.monotonic()
+
+            if not props.headers.get("x-stream-end"):
+                return
+            future = self.pending.pop(corr_id)
+            self.streams.pop(corr_id)
+            self.progress.pop(corr_id)
+
+        if future.set_running_or_notify_cancel():
+            future.set_result(
+                [
+                    reply_envelope(
+                        stream["status_code"], stream["headers"], stream["content"]
+                    ),
+                    props.headers,
+                ]
+            )
+
+    def publish(self, corr_id: str, messages: List[Tuple[Any, Any]]) -> None:
+        # runs on the I/O thread
+        for body, headers in messages:
             self.channel.basic_publish(
                 exchange="",
                 routing_key=self.queue_name,
                 properties=pika.BasicProperties(
                     reply_to=self.callback_queue,
-                    correlation_id=self.corr_id,
+                    correlation_id=corr_id,
                     delivery_mode=pika.DeliveryMode.Persistent,
+                    headers=headers,
                 ),
-                body=json.dumps(load),
+                body=body,
             )
 
-            start_time = time.time()
-            while time.time() - start_time < self.timeout:
-                self.connection.process_data_events(time_limit=1.0)
-                if self.response is not None:
-                    return self.response  # type: ignore
+    def submit(self, load: dict) -> "tuple[str, Future[list]]":
+        if "file" in load:
+            messages: List[Tuple[Any, Any]] = list(encode_file_message(load))
+        else:
+            messages = [(json.dumps(load), None)]
+
+        corr_id = str(uuid.uuid4())
+        future: "Future[list]" = Future()
+
+        with self.pending_lock:
+            self.pending[corr_id] = future
+
+        with self.connection_lock:
+            connection = self.connection
+        try:
+            connection.add_callback_threadsafe(
+                functools.partial(self.publish, corr_id, messages)
+            )
+        except Exception as e:
+            # the connection is being replaced, call() re-publishes on timeout
+            print(f" [!] RPC request for {self.queue_name} not published: {e}")
+        return corr_id, future
+
+    def receiving(self, corr_id: str, window: float) -> bool:
+        """Whether a chunk of the streamed reply arrived in the last window seconds."""
+        return time.monotonic() - self.progress.get(corr_id, float("-inf")) < window
+
+    def discard(self, corr_id: str) -> None:
+        with self.pending_lock:
+            self.pending.pop(corr_id, None)
+            self.streams.pop(corr_id, None)
+            self.progress.pop(corr_id, None)
+
+
+class DirectTransport:
+    """
+    Base of the transports that skip RabbitMQ and the messaging workers and
+    call the backend themselves. The load is translated to an HTTP request the
+    same way the workers do it, and the reply is wrapped in the worker
+    envelope, so callers cannot tell the difference.
+    """
+
+    def __init__(self) -> None:
+        # correlation id -> when the last line of a streamed reply was read
+        self.progress: Dict[str, float] = {}
+
+    def request_kwargs(self, load: dict) -> dict:
+        method = load["method"]
+        if method not in ("POST", "GET", "PUT"):
+            method = "DELETE"
+
+        kwargs: Dict[str, Any] = {"method": method, "url": load["endpoint"]}
+        if "file" in load:
+            file_info = load["file"]
+            kwargs["files"] = {
+                "file": (
+                    file_info["filename"],
+                    file_info["content"],
+                    file_info["content_type"],
+                )
+            }
+        elif "json" in load:
+            kwargs["json"] = load["json"]
+        if "params" in load:
+            kwargs["params"] = load["params"]
+        if "headers" in load:
+            kwargs["headers"] = load["headers"]
+        return kwargs
+
+    def to_reply(self, response: httpx.Response) -> list:
+        try:
+            content = response.json()
+        except Exception:
+            content = response.text
+
+        headers = dict(response.headers)
+        return [reply_envelope(response.status_code, headers, content), headers]
+
+    def is_stream(self, load: dict, response: httpx.Response) -> bool:
+        return (
+            bool(load.get("stream"))
+            and response.status_code == 200
+            and response.headers.get("content-type", "").startswith(
+                "application/x-ndjson"
+            )
+        )
+
+    def stream_reply(self, response: httpx.Response, records: list) -> list:
+        # same reply the RabbitMQ transport assembles from the stream chunks
+        headers = dict(response.headers)
+        return [reply_envelope(response.status_code, headers, records), headers]
+
+    def receiving(self, corr_id: str, window: float) -> bool:
+        return time.monotonic() - self.progress.get(corr_id, float("-inf")) < window
+
+    def discard(self, corr_id: str) -> None:
+        self.progress.pop(corr_id, None)
+
+
+class HttpTransport(DirectTransport):
+    """
+    Calls the backend HTTP endpoints directly through a pooled keep-alive
+    client. Requests run on a thread pool so they still complete futures.
+    The endpoints hold the local address of the service, so like the messaging
+    workers (RESPONSIBLE_HOST) the transport sends them to the host of the
+    service instead, e.g. its compose service name.
+    """
+
+    def __init__(self, host: str = "localhost") -> None:
+        super().__init__()
+        self.host = host
+        max_connections = int(os.getenv("RPC_HTTP_MAX_CONNECTIONS", "32"))
+        self.client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_connections, thread_name_prefix="rpc-http"
+        )
+
+    def request_kwargs(self, load: dict) -> dict:
+        kwargs = super().request_kwargs(load)
+        url = httpx.URL(kwargs["url"])
+        if self.host != "localhost" and url.host in ("localhost", "127.0.0.1"):
+            kwargs["url"] = url.copy_with(host=self.host)
+        return kwargs
+
+    def send(self, load: dict, corr_id: str) -> list:
+        try:
+            if not load.get("stream"):
+                return self.to_reply(self.client.request(**self.request_kwargs(load)))
+
+            with self.client.stream(**self.request_kwargs(load)) as response:
+                if not self.is_stream(load, response):
+                    response.read()
+                    return self.to_reply(response)
+
+                records = []
+                for line in response.iter_lines():
+                    if line:
+                        records.append(json.loads(line))
+                        self.progress[corr_id] = time.monotonic()
+                return self.stream_reply(response, records)
+        except Exception as e:
+            return [
+                reply_envelope(500, {}, {"error": f"Transport exception: {str(e)}"}),
+                {},
+            ]
+        finally:
+            self.progress.pop(corr_id, None)
+
+    def submit(self, load: dict) -> "tuple[str, Future[list]]":
+        corr_id = str(uuid.uuid4())
+        return corr_id, self.executor.submit(self.send, load, corr_id)
+
+
+class AsgiTransport(DirectTransport):
+    """
+    Calls the FastAPI app of the service in-process through ASGI, without any
+    network hop. The app (with its startup handlers, e.g. the db connection)
+    runs on a dedicated event loop thread owned by the transport.
+
+    Only one service per process can run this way: the services all connect
+    the mongoengine "default" alias on startup, so a second app would talk to
+    the database of the first (see RPC_ASGI_SERVICE in RpcClient). The process
+    also needs the requirements of that service installed.
+    """
+
+    def __init__(self, app_path: str) -> None:
+        super().__init__()
+        module_name, app_name = app_path.split(":")
+        self.app = getattr(importlib.import_module(module_name), app_name)
+
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self.loop.run_forever, name=f"{app_path}-asgi", daemon=True
+        ).start()
+        asyncio.run_coroutine_threadsafe(self.start_app(), self.loop).result()
+
+    async def start_app(self) -> None:
+        self.lifespan = self.app.router.lifespan_context(self.app)
+        await self.lifespan.__aenter__()
+
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app), base_url="http://asgi"
+        )
+
+    async def send(self, load: dict, corr_id: str) -> list:
+        try:
+            kwargs = self.request_kwargs(load)
+            # the endpoints hold the address of the service, the path is enough
+            kwargs["url"] = httpx.URL(kwargs["url"]).raw_path.decode()
+            if not load.get("stream"):
+                return self.to_reply(await self.client.request(**kwargs))
+
+            async with self.client.stream(**kwargs) as response:
+                if not self.is_stream(load, response):
+                    await response.aread()
+                    return self.to_reply(response)
+
+                records = []
+                async for line in response.aiter_lines():
+                    if line:
+                        records.append(json.loads(line))
+                        self.progress[corr_id] = time.monotonic()
+                return self.stream_reply(response, records)
+        except Exception as e:
+            return [
+                reply_envelope(500, {}, {"error": f"Transport exception: {str(e)}"}),
+                {},
+            ]
+        finally:
+            self.progress.pop(corr_id, None)
+
+    def submit(self, load: dict) -> "tuple[str, Future[list]]":
+        corr_id = str(uuid.uuid4())
+        future = asyncio.run_coroutine_threadsafe(self.send(load, corr_id), self.loop)
+        return corr_id, future
+
+
+class RpcClient:
+    """
+    RPC client of a backend service.
+
+    By default requests travel through RabbitMQ to the messaging workers.
+    Single-node deployments (and tests) can opt in to a direct transport with
+    RPC_TRANSPORT="http" (pooled HTTP calls to the backend, at the host named
+    by the http_host_env variable of the client) or RPC_TRANSPORT="asgi",
+    removing the broker and the worker from the hot path. With "asgi" the
+    single service named by RPC_ASGI_SERVICE (e.g. "statistics") is called
+    in-process, the others over HTTP. The call() contract is the same for
+    every transport.
+
+    A load with "stream": True asks for an ndjson listing, which is returned
+    as a single reply holding the list of records. While its chunks keep
+    arriving the timeout is extended, so a large listing is not retried.
+
+    Replies of GET requests carrying an ETag are kept (see ETagCache), so the
+    same request is a revalidation that the service answers with an empty 304.
+    """
+
+    queue_name: str
+    # "module:attribute" of the service's FastAPI app, used by the asgi transport
+    asgi_app: str
+    # environment variable holding the host of the service, for the http transport
+    http_host_env: str
+    max_retries: int = 5
+    timeout: float = 5.0
+
+    def __init__(self) -> None:
+        transport = os.getenv("RPC_TRANSPORT", "rabbitmq")
+        if transport == "asgi" and os.getenv("RPC_ASGI_SERVICE") is None:
+            raise ValueError(
+                'RPC_TRANSPORT="asgi" needs RPC_ASGI_SERVICE, the service called in-process'
+            )
+        service = self.queue_name.removesuffix("_queue")
+        if transport == "asgi" and os.getenv("RPC_ASGI_SERVICE") == service:
+            self.transport: Any = AsgiTransport(self.asgi_app)
+        elif transport in ("http", "asgi"):
+            self.transport = HttpTransport(os.getenv(self.http_host_env, "localhost"))
+        else:
+            self.transport = RabbitMQTransport(self.queue_name)
+        self.etags = ETagCache(ETAG_CACHE_SIZE)
+
+    def submit(self, load: dict) -> "tuple[str, Future[list]]":
+        """
+        Sends a request and returns its correlation id together with the
+        future that will hold the [body, headers] of the reply.
+        """
+        return self.transport.submit(load)  # type: ignore
+
+    def discard(self, corr_id: str) -> None:
+        self.transport.discard(corr_id)
+
+    def call(self, load: dict) -> JSONResponse:
+        load, key = self.etags.conditional(load)
+        attempts = 0
+
+        while attempts < self.max_retries:
+            corr_id, future = self.submit(load)
+            while True:
+                try:
+                    reply = self.etags.revalidated(
+                        key, future.result(timeout=self.timeout)
+                    )
+                    if reply is None:
+                        load = self.etags.unconditional(load)
+                        break
+                    return reply  # type: ignore
+                except FutureTimeoutError:
+                    # a streamed reply that is still arriving gets another window
+                    if not self.transport.receiving(corr_id, self.timeout):
+                        break
+            self.discard(corr_id)
 
             attempts += 1
 
+        return self.timeout_response(attempts)
+
+    def call_many(self, loads: List[dict]) -> List[list]:
+        """
+        Scatter-gather variant of call(): every load is published at once and
+        the replies are gathered as they come in. Returns one [body, headers]
+        per load, in the same order. Loads that are still unanswered after
+        max_retries get a 504 reply body, so each item carries its own status.
+        """
+        loads, keys = self.conditional_loads(loads)
+        responses: List[Optional[list]] = [None] * len(loads)
+        remaining = list(range(len(loads)))
+        attempts = 0
+
+        while remaining and attempts < self.max_retries:
+            submitted = {i: self.submit(loads[i]) for i in remaining}
+            futures.wait(
+                [future for _, future in submitted.values()], timeout=self.timeout
+            )
+
+            for i, (corr_id, future) in submitted.items():
+                if future.done():
+                    responses[i] = self.etags.revalidated(keys[i], future.result())
+                    if responses[i] is None:
+                        loads[i] = self.etags.unconditional(loads[i])
+                else:
+                    self.discard(corr_id)
+
+            remaining = [i for i in remaining if responses[i] is None]
+            attempts += 1
+
+        for i in remaining:
+            responses[i] = self.timeout_reply(attempts)
+
+        return responses  # type: ignore
+
+    def conditional_loads(
+        self, loads: List[dict]
+    ) -> Tuple[List[dict], List[Optional[str]]]:
+        conditional = [self.etags.conditional(load) for load in loads]
+        return [load for load, _ in conditional], [key for _, key in conditional]
+
+    def timeout_reply(self, attempts: int) -> list:
+        # same envelope the messaging workers publish
+        body = {
+            "status_code": 504,
+            "headers": {},
+            "content": {
+                "error": f"RPC request timed out after {attempts}/{self.max_retries} retries"
+            },
+        }
+        return [json.dumps(body), {}]
+
+    def timeout_response(self, attempts: int) -> JSONResponse:
         return JSONResponse(
             content={
                 "error": f"RPC request timed out after {attempts}/{self.max_retries} retries"
             },
             status_code=504,
         )
+
+
+class AsyncRpcClient(RpcClient):
+    """
+    asyncio flavour of RpcClient: acall(load) and acall_many(loads) have the
+    contract of call and call_many.
+
+    Replies are still delivered by the I/O thread, but acall() awaits its future
+    instead of blocking on it, so one event loop can overlap many RPCs. The
+    futures are bridged with asyncio.wrap_future, which keeps working when
+    every request runs in a fresh loop (asyncio.run in the Streamlit pages).
+    """
+
+    async def acall(self, load: dict) -> JSONResponse:
+        load, key = self.etags.conditional(load)
+        attempts = 0
+
+        while attempts < self.max_retries:
+            corr_id, future = self.submit(load)
+            waiter = asyncio.wrap_future(future)
+            while True:
+                try:
+                    # shielded, so a timeout does not cancel a streamed reply
+                    # that is still arriving
+                    reply = self.etags.revalidated(
+                        key,
+                        await asyncio.wait_for(
+                            asyncio.shield(waiter), timeout=self.timeout
+                        ),
+                    )
+                    if reply is None:
+                        load = self.etags.unconditional(load)
+                        break
+                    return reply  # type: ignore
+                except asyncio.TimeoutError:
+                    if not self.transport.receiving(corr_id, self.timeout):
+                        break
+            waiter.cancel()
+            self.discard(corr_id)
+
+            attempts += 1
+
+        return self.timeout_response(attempts)
+
+    async def acall_many(self, loads: List[dict]) -> List[list]:
+        loads, keys = self.conditional_loads(loads)
+        responses: List[Optional[list]] = [None] * len(loads)
+        remaining = list(range(len(loads)))
+        attempts = 0
+
+        while remaining and attempts < self.max_retries:
+            submitted = {i: self.submit(loads[i]) for i in remaining}
+            waiters = {
+                i: asyncio.wrap_future(future) for i, (_, future) in submitted.items()
+            }
+            await asyncio.wait(waiters.values(), timeout=self.timeout)
+
+            for i, waiter in waiters.items():
+                if waiter.done():
+                    responses[i] = self.etags.revalidated(keys[i], waiter.result())
+                    if responses[i] is None:
+                        loads[i] = self.etags.unconditional(loads[i])
+                else:
+                    waiter.cancel()
+                    self.discard(submitted[i][0])
+
+            remaining = [i for i in remaining if responses[i] is None]
+            attempts += 1
+
+        for i in remaining:
+            responses[i] = self.timeout_reply(attempts)
+
+        return responses  # type: ignore
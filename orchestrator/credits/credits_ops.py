@@ -7,8 +7,8 @@ from .credits_rpc_server import credits_rpc_client
 BASE_URL = "http://127.0.0.1:8002"
 
 
-def RPC_RESPONSE(load: dict) -> JSONResponse:
-    response_data, _ = credits_rpc_client.call(load)
+async def RPC_RESPONSE(load: dict) -> JSONResponse:
+    response_data, _ = await credits_rpc_client.acall(load)
     print(" [x] Received response")
 
     response = json.loads(response_data)
@@ -27,7 +27,7 @@ async def add_credits(credits: dict) -> JSONResponse:
         "json": credits,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def remove_credits(credits: dict) -> JSONResponse:
@@ -39,7 +39,7 @@ async def remove_credits(credits: dict) -> JSONResponse:
         "json": credits,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def get_credits(institution: str) -> JSONResponse:
@@ -51,4 +51,4 @@ async def get_credits(institution: str) -> JSONResponse:
         "endpoint": f"{BASE_URL}/credits/get_credits?institution={institution}",
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
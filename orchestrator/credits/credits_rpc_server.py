@@ -3,11 +3,14 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from base_rpc import RpcClient
+from base_rpc import AsyncRpcClient
 
 
-class CreditsRpcClient(RpcClient):
+class CreditsRpcClient(AsyncRpcClient):
     queue_name = "credits_queue"
+    # the credits service imports itself as the top level "credits" package
+    asgi_app = "credits.app:app"
+    http_host_env = "CREDITS_HOST"
 
 
 credits_rpc_client = CreditsRpcClient()
@@ -1,4 +1,5 @@
 import json
+from typing import Any, Dict
 
 from fastapi.responses import JSONResponse
 
@@ -7,8 +8,8 @@ from .review_rpc_server import review_rpc_client
 BASE_URL = "http://127.0.0.1:8005"
 
 
-def RPC_RESPONSE(load: dict) -> JSONResponse:
-    response_data, _ = review_rpc_client.call(load)
+async def RPC_RESPONSE(load: dict) -> JSONResponse:
+    response_data, _ = await review_rpc_client.acall(load)
     print(" [x] Received response")
 
     response = json.loads(response_data)
@@ -27,20 +28,41 @@ async def submit_review(review: dict) -> JSONResponse:
         "json": review,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
-async def get_reviews(query: dict) -> JSONResponse:
+async def get_reviews(query: dict, stream: bool = False) -> JSONResponse:
 
     print(" [x] Fetching reviews")
 
-    load = {
+    load: Dict[str, Any] = {
         "method": "GET",
         "endpoint": f"{BASE_URL}/review/get_reviews",
         "params": query,
     }
 
-    return RPC_RESPONSE(load)
+    if not stream:
+        return await RPC_RESPONSE(load)
+
+    # the reviews are streamed as ndjson and returned in the json listing shape
+    load["params"] = {**query, "format": "ndjson"}
+    load["stream"] = True
+    response_data, _ = await review_rpc_client.acall(load)
+    print(" [x] Received streamed response")
+
+    response = json.loads(response_data)
+    if response["status_code"] != 200 or not isinstance(response["content"], list):
+        return JSONResponse(
+            content=response["content"], status_code=response["status_code"]
+        )
+
+    return JSONResponse(
+        content={
+            "description": "Reviews extracted successfully",
+            "reviews": response["content"],
+        },
+        status_code=200,
+    )
 
 
 async def reply_to_review(reply: dict) -> JSONResponse:
@@ -52,4 +74,4 @@ async def reply_to_review(reply: dict) -> JSONResponse:
         "json": reply,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
@@ -3,11 +3,13 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from base_rpc import RpcClient
+from base_rpc import AsyncRpcClient
 
 
-class ReviewRpcClient(RpcClient):
+class ReviewRpcClient(AsyncRpcClient):
     queue_name = "review_queue"
+    asgi_app = "review.review.app:app"
+    http_host_env = "REVIEW_HOST"
 
 
 review_rpc_client = ReviewRpcClient()
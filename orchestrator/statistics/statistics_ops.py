@@ -1,4 +1,8 @@
+import asyncio
 import json
+import time
+import uuid
+from typing import Optional
 
 from fastapi.responses import JSONResponse
 
@@ -7,8 +11,8 @@ from .statistics_rpc_server import statistics_rpc_client
 BASE_URL = "http://127.0.0.1:8004"
 
 
-def RPC_RESPONSE(load: dict) -> JSONResponse:
-    response_data, _ = statistics_rpc_client.call(load)
+async def RPC_RESPONSE(load: dict) -> JSONResponse:
+    response_data, _ = await statistics_rpc_client.acall(load)
     print(" [x] Received response")
 
     response = json.loads(response_data)
@@ -18,19 +22,113 @@ def RPC_RESPONSE(load: dict) -> JSONResponse:
     )
 
 
-async def add_grades(grades: list[dict]) -> JSONResponse:
+async def STREAM_RESPONSE(load: dict, description: str) -> JSONResponse:
+    """
+    RPC_RESPONSE of a grades listing fetched as ndjson: the load is sent with
+    "stream": True and the streamed records are returned in the same shape
+    as the json listing.
+    """
+    response_data, _ = await statistics_rpc_client.acall({**load, "stream": True})
+    print(" [x] Received streamed response")
+
+    response = json.loads(response_data)
+    content = response["content"]
+    if response["status_code"] != 200 or not isinstance(content, list):
+        return JSONResponse(content=content, status_code=response["status_code"])
+
+    # a full page ends with a {"next_cursor": ...} line
+    next_cursor = None
+    if content and list(content[-1]) == ["next_cursor"]:
+        next_cursor = content.pop()["next_cursor"]
+
+    return JSONResponse(
+        content={
+            "description": description,
+            "grades": content,
+            "next_cursor": next_cursor,
+        },
+        status_code=200,
+    )
+
+
+async def add_grades(
+    grades: list[dict], idempotency_key: Optional[str] = None
+) -> JSONResponse:
     print(" [x] Sending grades for submission")
 
-    load = {
+    load: dict = {
         "method": "POST",
         "endpoint": f"{BASE_URL}/grades/add_grades",
         "json": grades,
     }
+    if idempotency_key is not None:
+        # with the key the upload is recorded as an ingestion job, so a retry
+        # returns the outcome of the first attempt instead of a duplicate error
+        load["headers"] = {"Idempotency-Key": idempotency_key}
+
+    return await RPC_RESPONSE(load)
+
+
+async def submit_ingestion_job(
+    grades: list[dict], idempotency_key: Optional[str] = None
+) -> JSONResponse:
+    print(" [x] Submitting grades ingestion job")
+
+    load = {
+        "method": "POST",
+        "endpoint": f"{BASE_URL}/grades/ingestion_jobs",
+        "json": grades,
+        "headers": {"Idempotency-Key": idempotency_key or str(uuid.uuid4())},
+    }
+
+    return await RPC_RESPONSE(load)
+
+
+async def get_ingestion_job(job_id: str) -> JSONResponse:
+    load = {
+        "method": "GET",
+        "endpoint": f"{BASE_URL}/grades/ingestion_jobs/{job_id}",
+    }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
-async def get_student_grades(students: dict) -> JSONResponse:
+async def add_grades_in_background(
+    grades: list[dict], poll_interval: float = 1.0, timeout: float = 600.0
+) -> JSONResponse:
+    """
+    Same outcome as add_grades, but the upload is processed as an ingestion job,
+    so large uploads do not run into the rpc timeout. The job is polled until done.
+
+    :return: 200 {"description"} on success, otherwise the error as {"detail"}
+    """
+    response = await submit_ingestion_job(grades)
+    response_body = json.loads(bytes(response.body))
+    if response.status_code not in (200, 202):
+        return response
+
+    job = response_body["job"]
+    deadline = time.monotonic() + timeout
+    while job["status"] in ("pending", "running"):
+        if time.monotonic() > deadline:
+            return JSONResponse(
+                content={
+                    "detail": f"Grades are still being processed (job {job['job_id']})"
+                },
+                status_code=504,
+            )
+        await asyncio.sleep(poll_interval)
+        response = await get_ingestion_job(job["job_id"])
+        if response.status_code != 200:
+            return response
+        job = json.loads(bytes(response.body))["job"]
+
+    if job["status"] == "failed":
+        return JSONResponse(content={"detail": job["error"]}, status_code=400)
+    return JSONResponse(content={"description": job["description"]}, status_code=200)
+
+
+async def get_student_grades(students: dict, stream: bool = False) -> JSONResponse:
     print(" [x] Fetching student grades")
 
     load = {
@@ -39,19 +137,44 @@ async def get_student_grades(students: dict) -> JSONResponse:
         "params": students,
     }
 
-    return RPC_RESPONSE(load)
+    if stream:
+        load["params"] = {**students, "format": "ndjson"}
+        return await STREAM_RESPONSE(load, "Grades extracted successfully")
+    return await RPC_RESPONSE(load)
+
+
+async def get_course_grades(courses: dict, stream: bool = False) -> JSONResponse:
+    print(" [x] Fetching course grades")
+
+    load = {
+        "method": "GET",
+        "endpoint": f"{BASE_URL}/grades/get_course_grades",
+        "params": courses,
+    }
+
+    if stream:
+        load["params"] = {**courses, "format": "ndjson"}
+        return await STREAM_RESPONSE(load, "Grades extracted successfully")
+    return await RPC_RESPONSE(load)
 
 
-async def update_grades(updated_grades: list[dict]) -> JSONResponse:
+async def update_grades(
+    updated_grades: list[dict], replace: bool = False
+) -> JSONResponse:
+    """
+    :param replace: the grades are the complete FINAL upload, so students missing
+                    from it are deleted and newly graded students are inserted
+    """
     print(" [x] updating student grades")
 
     load = {
         "method": "PUT",
         "endpoint": f"{BASE_URL}/grades/update_grades",
         "json": updated_grades,
+        "params": {"replace": replace},
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def delete_grades(deleted_grades: list[dict]) -> JSONResponse:
@@ -63,7 +186,7 @@ async def delete_grades(deleted_grades: list[dict]) -> JSONResponse:
         "json": deleted_grades,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def add_course(course: dict) -> JSONResponse:
@@ -75,7 +198,7 @@ async def add_course(course: dict) -> JSONResponse:
         "json": course,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def delete_course(course_id: str) -> JSONResponse:
@@ -86,7 +209,7 @@ async def delete_course(course_id: str) -> JSONResponse:
         "endpoint": f"{BASE_URL}/courses/delete_course/{course_id}",
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def get_course_stats(
@@ -99,7 +222,76 @@ async def get_course_stats(
         "endpoint": f"{BASE_URL}/course_stats/get_course_stats?course_id={course_id}&exam_year={exam_year}&exam_type={exam_type}",
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
+
+
+async def get_time_series(filters: dict) -> JSONResponse:
+    """
+    :param filters: "course_ids" and/or "institution", optionally "exam_types",
+                    "from_year", "to_year" and "by_exam_type"
+    """
+    print(" [x] fetching grades time series")
+
+    load = {
+        "method": "GET",
+        "endpoint": f"{BASE_URL}/analytics/time_series",
+        "params": filters,
+    }
+
+    return await RPC_RESPONSE(load)
+
+
+async def get_comparison(filters: dict) -> JSONResponse:
+    """
+    :param filters: "course_ids" and/or "institution", optionally "exam_types",
+                    "from_year" and "to_year"
+    """
+    print(" [x] fetching courses comparison")
+
+    load = {
+        "method": "GET",
+        "endpoint": f"{BASE_URL}/analytics/comparison",
+        "params": filters,
+    }
+
+    return await RPC_RESPONSE(load)
+
+
+async def get_course_stats_many(periods: list[dict]) -> JSONResponse:
+    """
+    Batch version of get_course_stats. All requests are published at once and
+    the replies are gathered together, so N exam periods cost about one
+    round-trip instead of N.
+
+    :param periods: dicts with "course_id", "exam_year" and "exam_type" keys
+    :return: {"results": [...]} with one entry per period (same order), holding
+             the period keys plus its own "status_code" and "content"
+    """
+    print(f" [x] fetching course statistics for {len(periods)} periods")
+
+    loads = [
+        {
+            "method": "GET",
+            "endpoint": f"{BASE_URL}/course_stats/get_course_stats?course_id={period['course_id']}&exam_year={period['exam_year']}&exam_type={period['exam_type']}",
+        }
+        for period in periods
+    ]
+
+    replies = await statistics_rpc_client.acall_many(loads)
+    print(" [x] Received responses")
+
+    results = []
+    for period, (response_data, _) in zip(periods, replies):
+        response = json.loads(response_data)
+        results.append(
+            {
+                **period,
+                "status_code": response["status_code"],
+                "content": response["content"],
+            }
+        )
+
+    return JSONResponse(content={"results": results}, status_code=200)
 
 
 async def enroll_students(
@@ -116,7 +308,7 @@ async def enroll_students(
         },
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def finalize_course(
@@ -131,7 +323,7 @@ async def finalize_course(
         "endpoint": f"{BASE_URL}/courses/finalize_course/course_id={course_id}&exam_type={exam_type}&exam_year={exam_year}",
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def initialize_course_grades(
@@ -144,7 +336,7 @@ async def initialize_course_grades(
         "endpoint": f"{BASE_URL}/courses/initialize_course_grades/course_id={course_id}&exam_type={exam_type}&exam_year={exam_year}",
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 # similat to the above, but just get the status_of_grades
@@ -158,4 +350,4 @@ async def get_status_of_grades(
         "endpoint": f"{BASE_URL}/courses/status_of_grades/course_id={course_id}&exam_type={exam_type}&exam_year={exam_year}",
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
@@ -3,11 +3,13 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from base_rpc import RpcClient
+from base_rpc import AsyncRpcClient
 
 
-class StatisticsRpcClient(RpcClient):
+class StatisticsRpcClient(AsyncRpcClient):
     queue_name = "statistics_queue"
+    asgi_app = "statistics.statistics.app:app"
+    http_host_env = "STATISTICS_HOST"
 
 
 statistics_rpc_client = StatisticsRpcClient()
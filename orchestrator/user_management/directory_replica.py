@@ -0,0 +1,56 @@
+import threading
+from typing import Optional
+
+# the id field of the entries of each kind of the directory
+ID_FIELDS = {"instructor": "instructor_id", "student": "student_id"}
+
+
+class DirectoryReplica:
+    """
+    In process replica of the instructor and student directories of the
+    institutions, kept up to date with the directory_changes feed of the user
+    management service: a lookup only fetches the changes made since the
+    version the replica holds, and the whole directory when it is reset.
+    """
+
+    def __init__(self) -> None:
+        # institution -> version
+        self.versions: dict[str, int] = {}
+        # institution -> kind -> user id -> entry
+        self.entries: dict[str, dict[str, dict[str, dict]]] = {}
+        self.lock = threading.Lock()
+
+    def version(self, institution: str) -> int:
+        # -1 asks the service for the whole directory
+        with self.lock:
+            return self.versions.get(institution, -1)
+
+    def apply(self, institution: str, feed: dict) -> None:
+        with self.lock:
+            if feed["reset"]:
+                self.entries[institution] = {
+                    kind: {entry[id_field]: entry for entry in feed[f"{kind}s"]}
+                    for kind, id_field in ID_FIELDS.items()
+                }
+            elif institution not in self.entries:
+                return
+            elif feed["version"] < self.versions[institution]:
+                # a concurrent lookup already applied newer changes
+                return
+            else:
+                directory = self.entries[institution]
+                for change in feed["changes"]:
+                    if change["entry"] is None:
+                        directory[change["kind"]].pop(change["id"], None)
+                    else:
+                        directory[change["kind"]][change["id"]] = change["entry"]
+            self.versions[institution] = feed["version"]
+
+    def directory(self, institution: str, kind: str) -> Optional[list[dict]]:
+        with self.lock:
+            if institution not in self.entries:
+                return None
+            return list(self.entries[institution][kind].values())
+
+
+directory_replica = DirectoryReplica()
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+# same key and max age the user management service signs its tokens with
+SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
+TOKEN_MAX_AGE = int(os.getenv("TOKEN_MAX_AGE", str(7 * 24 * 3600)))
+# seconds a token checked by the service is trusted without asking it again
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+
+
+class TokenValidator:
+    """
+    Validates the session tokens in process, in front of the check_access RPC.
+
+    A token with an invalid or expired signature is rejected without a round
+    trip, once the service accepting a validly signed token has shown that both
+    use the same SECRET_KEY. Until then such tokens are still checked with the
+    service, so a misconfigured key does not lock every user out. The role of a
+    token the service accepted is cached for AUTH_CACHE_TTL seconds. Logging
+    out pushes the token to the revocation list, so it is rejected at once by
+    this process, while the cache TTL bounds how long a session ended through
+    another process is still accepted here. Logging out of all sessions also
+    drops the cached roles of the user's other tokens.
+    """
+
+    def __init__(self, secret_key: str, max_age: int, ttl: float) -> None:
+        self.serializer = URLSafeTimedSerializer(secret_key)
+        self.max_age = max_age
+        self.ttl = ttl
+        # token -> (username, role, expiry time)
+        self.roles: dict[str, tuple[str, str, float]] = {}
+        # token -> time its signature expires anyway, when it can be dropped
+        self.revoked: dict[str, float] = {}
+        # whether the service accepted a token signed with this key
+        self.key_confirmed = False
+        self.lock = threading.Lock()
+
+    def payload(self, token: str) -> Optional[Any]:
+        try:
+            return self.serializer.loads(token, max_age=self.max_age)
+        except BadSignature:
+            return None
+
+    def rejects(self, token: str) -> bool:
+        # True if the token is known to be invalid without asking the service
+        with self.lock:
+            if token in self.revoked:
+                return True
+            key_confirmed = self.key_confirmed
+        return key_confirmed and self.payload(token) is None
+
+    def cached_role(self, token: str) -> Optional[str]:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.roles.get(token)
+            if entry is None:
+                return None
+            _, role, expires_at = entry
+            if expires_at <= now:
+                del self.roles[token]
+                return None
+            return role
+
+    def remember(self, token: str, role: str) -> None:
+        payload = self.payload(token)
+        username = payload.get("username", "") if isinstance(payload, dict) else ""
+        if payload is None:
+            print(" [!] The service accepted a token not signed with SECRET_KEY")
+        now = time.monotonic()
+        with self.lock:
+            if token in self.revoked:
+                return
+            if payload is not None:
+                self.key_confirmed = True
+            # expired entries are dropped as new ones come in
+            self.roles = {
+                cached: entry for cached, entry in self.roles.items() if entry[2] > now
+            }
+            self.roles[token] = (username, role, now + self.ttl)
+
+    def revoke(self, token: str) -> None:
+        now = time.monotonic()
+        with self.lock:
+            self.roles.pop(token, None)
+            self.revoked = {
+                revoked: expires_at
+                for revoked, expires_at in self.revoked.items()
+                if expires_at > now
+            }
+            self.revoked[token] = now + self.max_age
+
+    def forget_user(self, username: str) -> None:
+        # the other sessions of the user are checked with the service again
+        with self.lock:
+            self.roles = {
+                cached: entry
+                for cached, entry in self.roles.items()
+                if entry[0] != username
+            }
+
+
+token_validator = TokenValidator(SECRET_KEY, TOKEN_MAX_AGE, AUTH_CACHE_TTL)
@@ -2,13 +2,17 @@ import json
 
 from fastapi.responses import JSONResponse
 
+from .directory_replica import directory_replica
+from .token_validation import token_validator
 from .user_management_rpc_server import user_management_rpc_server
 
 BASE_URL = "http://127.0.0.1:8001"
+# users per bulk registration request, so each one answers well within the rpc timeout
+REGISTRATION_BATCH_SIZE = 200
 
 
-def RPC_RESPONSE(load: dict) -> JSONResponse:
-    response_data, _ = user_management_rpc_server.call(load)
+async def RPC_RESPONSE(load: dict) -> JSONResponse:
+    response_data, _ = await user_management_rpc_server.acall(load)
     print(" [x] Received response")
 
     response = json.loads(response_data)
@@ -27,7 +31,48 @@ async def register_instructor(instructor: dict) -> JSONResponse:
         "json": instructor,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
+
+
+async def register_users(users: list[dict], endpoint: str) -> JSONResponse:
+    """
+    Sends a bulk registration in batches of REGISTRATION_BATCH_SIZE and merges
+    the per row results, numbering the rows over the whole list.
+    """
+    results: list[dict] = []
+    for start in range(0, len(users), REGISTRATION_BATCH_SIZE):
+        load = {
+            "method": "POST",
+            "endpoint": f"{BASE_URL}/register/{endpoint}",
+            "json": users[start : start + REGISTRATION_BATCH_SIZE],
+        }
+        response = await RPC_RESPONSE(load)
+        if response.status_code != 200:
+            return response
+        results.extend(
+            {**result, "row": start + result["row"]}
+            for result in json.loads(bytes(response.body))["results"]
+        )
+
+    registered = sum(result["status"] == "registered" for result in results)
+    return JSONResponse(
+        content={
+            "description": f"Registered {registered} of {len(results)} users",
+            "registered": registered,
+            "results": results,
+        },
+        status_code=200,
+    )
+
+
+async def register_instructors(instructors: list[dict]) -> JSONResponse:
+    print(f" [x] Registering {len(instructors)} instructors")
+    return await register_users(instructors, "register_instructors")
+
+
+async def register_students(students: list[dict]) -> JSONResponse:
+    print(f" [x] Registering {len(students)} students")
+    return await register_users(students, "register_students")
 
 
 async def remove_instructor(instructor: dict) -> JSONResponse:
@@ -39,7 +84,7 @@ async def remove_instructor(instructor: dict) -> JSONResponse:
         "json": instructor,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def update_instructor(updated_instructor: dict) -> JSONResponse:
@@ -51,7 +96,7 @@ async def update_instructor(updated_instructor: dict) -> JSONResponse:
         "params": updated_instructor,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def register_student(student: dict) -> JSONResponse:
@@ -63,7 +108,7 @@ async def register_student(student: dict) -> JSONResponse:
         "json": student,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def remove_student(removed_student: dict) -> JSONResponse:
@@ -75,7 +120,7 @@ async def remove_student(removed_student: dict) -> JSONResponse:
         "json": removed_student,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def update_student(updated_student: dict) -> JSONResponse:
@@ -87,7 +132,7 @@ async def update_student(updated_student: dict) -> JSONResponse:
         "params": updated_student,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def login(credentials: dict) -> JSONResponse:
@@ -99,11 +144,12 @@ async def login(credentials: dict) -> JSONResponse:
         "json": credentials,
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
 
 
 async def logout(token: str) -> JSONResponse:
     print(" [x] Logging out")
+    token_validator.revoke(token)
 
     load = {
         "method": "POST",
@@ -111,26 +157,86 @@ async def logout(token: str) -> JSONResponse:
         "headers": {"Authorization": f"Bearer {token}"},
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
+
+
+async def logout_all(token: str) -> JSONResponse:
+    print(" [x] Logging out of all sessions")
+    payload = token_validator.payload(token)
+    token_validator.revoke(token)
+    if isinstance(payload, dict):
+        token_validator.forget_user(payload["username"])
+
+    load = {
+        "method": "POST",
+        "endpoint": f"{BASE_URL}/login/logout_all",
+        "headers": {"Authorization": f"Bearer {token}"},
+    }
+
+    return await RPC_RESPONSE(load)
 
 
 async def check_access(token: str) -> JSONResponse:
+    # the revocation list, the signature and the cached role are checked
+    # in process, the service is only asked on a cache miss
+    if token_validator.rejects(token):
+        return JSONResponse(content={"detail": "Invalid token"}, status_code=401)
+
+    role = token_validator.cached_role(token)
+    if role is not None:
+        return JSONResponse(content={"privilege": role}, status_code=200)
+
     print(" [x] Checking logged in user privileges")
 
     load = {
         "method": "POST",
-        "endpoint": f"{BASE_URL}/login/check_access?token={token}",
+        "endpoint": f"{BASE_URL}/login/check_access",
+        "params": {"token": token},
     }
 
-    return RPC_RESPONSE(load)
+    response = await RPC_RESPONSE(load)
+    if response.status_code == 200:
+        token_validator.remember(token, json.loads(bytes(response.body))["privilege"])
+    return response
 
 
-async def fetch_instructors(institution: str) -> JSONResponse:
-    print(" [x] Fetching instructors")
+async def fetch_directory_changes(institution: str, since: int) -> JSONResponse:
+    print(" [x] Fetching directory changes")
 
     load = {
         "method": "GET",
-        "endpoint": f"{BASE_URL}/register/fetch_instructors/{institution}",
+        "endpoint": f"{BASE_URL}/register/directory_changes/{institution}",
+        "params": {"since": since},
     }
 
-    return RPC_RESPONSE(load)
+    return await RPC_RESPONSE(load)
+
+
+async def fetch_directory(institution: str, kind: str) -> JSONResponse:
+    # the directory replica is brought up to date with the changes since its
+    # version, so a lookup only transfers what changed
+    response = await fetch_directory_changes(
+        institution, directory_replica.version(institution)
+    )
+    if response.status_code != 200:
+        return response
+    directory_replica.apply(institution, json.loads(bytes(response.body)))
+
+    return JSONResponse(
+        content={
+            "description": f"{kind.capitalize()}s fetched successfully",
+            "version": directory_replica.version(institution),
+            f"{kind}s": directory_replica.directory(institution, kind),
+        },
+        status_code=200,
+    )
+
+
+async def fetch_instructors(institution: str) -> JSONResponse:
+    print(" [x] Fetching instructors")
+    return await fetch_directory(institution, "instructor")
+
+
+async def fetch_students(institution: str) -> JSONResponse:
+    print(" [x] Fetching students")
+    return await fetch_directory(institution, "student")
@@ -3,11 +3,13 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from base_rpc import RpcClient
+from base_rpc import AsyncRpcClient
 
 
-class UserManagementRpcClient(RpcClient):
+class UserManagementRpcClient(AsyncRpcClient):
     queue_name = "user_management_queue"
+    asgi_app = "user_management.user_management.app:app"
+    http_host_env = "USER_MANAGEMENT_HOST"
 
 
 user_management_rpc_server = UserManagementRpcClient()
@@ -1,4 +1,3 @@
-import base64
 import json
 import os
 import sys
@@ -14,34 +13,24 @@ BASE_URL = "http://127.0.0.1:8003"
 
 
 def encode_file(file: Any) -> dict:
-    content = file.read()
+    # raw bytes, sent as a binary message body (see base_rpc.encode_file_message)
     return {
         "filename": file.name,
-        "content": base64.b64encode(content).decode(),
+        "content": file.read(),
         "content_type": file.type,
     }
 
 
-def decode_file(body: Any) -> dict:
-    file_info = json.loads(body)
-    filename = file_info["json"]["filename"]
-    content_type = file_info["json"]["content_type"]
-    content_bytes = base64.b64decode(file_info["json"]["content"])
-
-    files = {"file": (filename, content_bytes, content_type)}
-    return files
-
-
 async def parse_grades(file: Any) -> JSONResponse:
-    encoded_file: Dict[str, str] = encode_file(file)
+    encoded_file: Dict[str, Any] = encode_file(file)
     print(f" [x] Sending file: {encoded_file['filename']}")
     load = {
         "method": "POST",
         "endpoint": f"{BASE_URL}/xlsx_parsing/parse_grades",
-        "json": encoded_file,
+        "file": encoded_file,
     }
 
-    response_data, _ = xlsx_parsing_rpc_client.call(load)
+    response_data, _ = await xlsx_parsing_rpc_client.acall(load)
     print(" [x] Received response")
 
     # Decode the JSON string received from worker
@@ -54,16 +43,37 @@ async def parse_grades(file: Any) -> JSONResponse:
 
 
 async def parse_enrolled_students(file: Any) -> JSONResponse:
-    encoded_file: Dict[str, str] = encode_file(file)
+    encoded_file: Dict[str, Any] = encode_file(file)
     print(f" [x] Sending file: {encoded_file['filename']}")
 
     load = {
         "method": "POST",
         "endpoint": f"{BASE_URL}/xlsx_parsing/parse_enrolled_students",
-        "json": encoded_file,
+        "file": encoded_file,
+    }
+
+    response_data, _ = await xlsx_parsing_rpc_client.acall(load)
+    print("[x] Received response")
+
+    response = json.loads(response_data)
+
+    return JSONResponse(
+        content=response["content"],
+        status_code=response["status_code"],
+    )
+
+
+async def parse_users(file: Any) -> JSONResponse:
+    encoded_file: Dict[str, Any] = encode_file(file)
+    print(f" [x] Sending file: {encoded_file['filename']}")
+
+    load = {
+        "method": "POST",
+        "endpoint": f"{BASE_URL}/xlsx_parsing/parse_users",
+        "file": encoded_file,
     }
 
-    response_data, _ = xlsx_parsing_rpc_client.call(load)
+    response_data, _ = await xlsx_parsing_rpc_client.acall(load)
     print("[x] Received response")
 
     response = json.loads(response_data)
@@ -3,11 +3,13 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from base_rpc import RpcClient
+from base_rpc import AsyncRpcClient
 
 
-class XlsxParsingRpcClient(RpcClient):
+class XlsxParsingRpcClient(AsyncRpcClient):
     queue_name = "xlsx_parsing_queue"
+    asgi_app = "xlsx_parsing.xlsx_parsing.app:app"
+    http_host_env = "XLSX_PARSING_HOST"
 
 
 xlsx_parsing_rpc_client = XlsxParsingRpcClient()
@@ -17,6 +17,9 @@ class Review(Document):
     reply_text = StringField()  # Optional by default in MongoEngine
     is_replied = BooleanField(default=False)
     created_at = DateTimeField(default=datetime.utcnow)
+    # incremented by every write, the ETag of get_reviews is built from it
+    version = IntField(default=0)
+    updated_at = DateTimeField(default=datetime.utcnow)
 
     meta = {
         "indexes": [
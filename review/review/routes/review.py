@@ -1,7 +1,10 @@
+import hashlib
+import json
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 # Import with explicit type hints
 from ..models.review import Review, ReviewCreate, ReviewReply, ReviewResponse
@@ -60,11 +63,16 @@ async def get_reviews(
     exam_types: Optional[list[str]] = Query(default=None),
     years: Optional[list[int]] = Query(default=None),
     is_replied: Optional[bool] = Query(default=None),
-) -> JSONResponse:
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    # with format="ndjson" the reviews are streamed from the database cursor, one per line
+    # the ETag of a json response is built from the ids and versions of the matching reviews,
+    # so a request with a matching If-None-Match header gets a 304 before the reviews are read
 
     try:
         query: Dict[str, Any] = {}
-        reviews: List[ReviewResponse] = []
+        reviews: List[Dict[str, Any]] = []
 
         if student_ids is not None:
             query["student_id__in"] = student_ids
@@ -77,31 +85,63 @@ async def get_reviews(
         if is_replied is not None:
             query["is_replied"] = is_replied
 
-        for single_review in Review.objects(**query):
-            reviews.append(
-                ReviewResponse(
-                    student_id=single_review.student_id,
-                    course_id=single_review.course_id,
-                    exam_type=single_review.exam_type,
-                    year=single_review.year,
-                    review_text=single_review.review_text,
-                    reply_text=single_review.reply_text,
-                    is_replied=single_review.is_replied,
-                    created_at=single_review.created_at.isoformat(),
-                ).dict()
+        if format == "ndjson":
+            return StreamingResponse(
+                (
+                    json.dumps(review_content(single_review)) + "\n"
+                    for single_review in Review.objects(**query)
+                ),
+                media_type="application/x-ndjson",
             )
+
+        if if_none_match is not None:
+            etag = reviews_etag(
+                Review.objects(**query).only("id", "version").as_pymongo()
+            )
+            if if_none_match == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+
+        matching_reviews = list(Review.objects(**query))
+        for single_review in matching_reviews:
+            reviews.append(review_content(single_review))
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "description": "Reviews extracted successfully",
                 "reviews": reviews,
             },
+            headers={
+                "ETag": reviews_etag(
+                    {"_id": r.id, "version": r.version} for r in matching_reviews
+                )
+            },
         )
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def reviews_etag(versions: Any) -> str:
+    # hash of the (id, version) of every review of a response
+    digest = hashlib.sha1()
+    for review in sorted((str(r["_id"]), r.get("version", 0)) for r in versions):
+        digest.update(f"{review[0]}:{review[1]};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def review_content(single_review: Review) -> Dict[str, Any]:
+    return ReviewResponse(
+        student_id=single_review.student_id,
+        course_id=single_review.course_id,
+        exam_type=single_review.exam_type,
+        year=single_review.year,
+        review_text=single_review.review_text,
+        reply_text=single_review.reply_text,
+        is_replied=single_review.is_replied,
+        created_at=single_review.created_at.isoformat(),
+    ).dict()
+
+
 # --------------------------------------------------
 # Update Review Reply
 # --------------------------------------------------
@@ -123,6 +163,8 @@ async def update_reply(reply: ReviewReply) -> JSONResponse:
 
         review.reply_text = reply.reply_text
         review.is_replied = True
+        review.version += 1
+        review.updated_at = datetime.utcnow()
         review.save()
 
         return JSONResponse(
@@ -1,3 +1,4 @@
+import json
 import unittest
 
 import mongomock
@@ -183,6 +184,19 @@ class GetReviews(unittest.TestCase):
         self.assertEqual(response.json()["reviews"][1]["year"], 2025)
         self.assertEqual(response.json()["reviews"][1]["student_id"], "student2")
 
+        # streamed as ndjson
+        response = client.get(
+            "/review/get_reviews",
+            params={"course_ids": ["course2"], "format": "ndjson"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        reviews = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(
+            [(review["student_id"], review["year"]) for review in reviews],
+            [("student2", 2023), ("student2", 2025)],
+        )
+
 
 class ReplyReview(unittest.TestCase):
     def setUp(self) -> None:
@@ -228,6 +242,43 @@ class ReplyReview(unittest.TestCase):
             },
         )
 
+    def test_get_reviews_etag(self) -> None:
+        client.post(
+            "/review/submit_review",
+            json=ReviewCreate(
+                student_id="student1",
+                course_id="course1",
+                exam_type="exam1",
+                year=2023,
+                review_text="Great course!",
+            ).dict(),
+        )
+        response = client.get("/review/get_reviews?course_ids=course1")
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "/review/get_reviews?course_ids=course1", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # a reply changes the version of the review
+        client.put(
+            "/review/reply",
+            json=ReviewReply(
+                student_id="student1",
+                course_id="course1",
+                exam_type="exam1",
+                year=2023,
+                reply_text="Thank you for your feedback!",
+            ).dict(),
+        )
+        response = client.get(
+            "/review/get_reviews?course_ids=course1", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["reviews"][0]["is_replied"])
+
     def test_reply_review_not_found(self) -> None:
         # Attempt to reply to a non-existent review
         response = client.put(
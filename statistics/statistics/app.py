@@ -1,7 +1,15 @@
-from statistics.statistics.database.db import initialize_db
+import asyncio
+from statistics.statistics.database.db import build_indexes, initialize_db
+from statistics.statistics.routes.analytics import router as AnalyticsRouter
+from statistics.statistics.routes.course_stats import (
+    STATS_RECONCILE_INTERVAL,
+    reconcile_periodically,
+)
 from statistics.statistics.routes.course_stats import router as CourseStats
 from statistics.statistics.routes.courses import router as CourseRouter
 from statistics.statistics.routes.grades import router as GradeRouter
+from statistics.statistics.routes.ingestion import resume_ingestion_jobs
+from statistics.statistics.routes.ingestion import router as IngestionRouter
 
 from fastapi import FastAPI
 
@@ -11,6 +19,12 @@ app = FastAPI()
 @app.on_event("startup")  # type: ignore
 async def start_database() -> None:
     initialize_db()
+    # the query indexes are built in the background, see database/db.py
+    asyncio.get_running_loop().run_in_executor(None, build_indexes)
+    # resume the uploads interrupted by a restart, without delaying the startup
+    asyncio.get_running_loop().run_in_executor(None, resume_ingestion_jobs)
+    if STATS_RECONCILE_INTERVAL > 0:
+        asyncio.create_task(reconcile_periodically(STATS_RECONCILE_INTERVAL))
 
 
 @app.get("/", tags=["Root"])  # type: ignore
@@ -19,5 +33,7 @@ async def read_root() -> dict:
 
 
 app.include_router(GradeRouter, tags=["Grades"], prefix="/grades")
+app.include_router(IngestionRouter, tags=["Ingestion"], prefix="/grades")
 app.include_router(CourseRouter, tags=["Courses"], prefix="/courses")
 app.include_router(CourseStats, tags=["CourseStatistics"], prefix="/course_stats")
+app.include_router(AnalyticsRouter, tags=["Analytics"], prefix="/analytics")
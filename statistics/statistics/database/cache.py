@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import orjson
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# entries kept by the in-process cache
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "1024"))
+# seconds the statistics of a period that is not finalized stay cached
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+# optional cache shared by the replicas of the service, e.g. redis://cache:6379/0
+STATS_CACHE_URL = os.getenv("STATS_CACHE_URL")
+# seconds the statistics of a finalized period stay in the shared cache
+STATS_CACHE_FINAL_TTL = float(os.getenv("STATS_CACHE_FINAL_TTL", "86400"))
+
+
+class LRUCache:
+    """
+    Thread safe in-process LRU cache. Every entry has its own TTL in seconds,
+    None for an entry that only leaves the cache when evicted or deleted.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        # key -> (value, expiry time or None)
+        self.entries: OrderedDict[str, Tuple[Any, Optional[float]]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class LocalBackend:
+    """
+    Stand-in for the shared cache (same get/set/delete of bytes as RedisBackend),
+    kept in the process, for the tests.
+    """
+
+    def __init__(self) -> None:
+        self.cache = LRUCache(max_size=STATS_CACHE_SIZE)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self.cache.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class RedisBackend:
+    def __init__(self, url: str) -> None:
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)  # type: ignore
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self.client.set(key, value, ex=None if ttl is None else int(ttl))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+
+class StatsCache:
+    """
+    Read-through cache of the get_course_stats responses, keyed by exam period.
+    The in-process LRU sits in front of an optional shared backend.
+
+    The write routes invalidate the period they change. The statistics of a
+    finalized period do not change anymore, so they are cached without TTL, or
+    STATS_CACHE_FINAL_TTL with a shared backend, since invalidations reach the
+    other replicas only through it. The entries of the other periods expire
+    after STATS_CACHE_TTL, bounding how stale another replica's copy can get.
+    """
+
+    def __init__(self, shared: Optional[Any] = None) -> None:
+        self.local = LRUCache(max_size=STATS_CACHE_SIZE)
+        self.shared = shared
+        # key -> invalidation count at its last invalidation, so a response
+        # read from the database before an invalidation is not cached after it.
+        # Bounded like the LRU: a dropped key gets the generation of the most
+        # recently dropped one, which is at least its own.
+        self.generations: OrderedDict[str, int] = OrderedDict()
+        self.invalidations = 0
+        self.dropped_generation = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "StatsCache":
+        if STATS_CACHE_URL is None:
+            return cls()
+        if redis is None:
+            print(
+                "STATS_CACHE_URL is set but redis is not installed, using no shared cache"
+            )
+            return cls()
+        return cls(RedisBackend(STATS_CACHE_URL))
+
+    @staticmethod
+    def key(course_id: str, exam_type: str, year: int) -> str:
+        return f"course_stats:{course_id}:{exam_type}:{year}"
+
+    def generation(self, course_id: str, exam_type: str, year: int) -> int:
+        key = self.key(course_id, exam_type, year)
+        with self.lock:
+            return self.generations.get(key, self.dropped_generation)
+
+    def get(self, course_id: str, exam_type: str, year: int) -> Optional[dict]:
+        """The cached {"content": ..., "etag": ...} of the period, if any."""
+        key = self.key(course_id, exam_type, year)
+        entry = self.local.get(key)
+        if entry is not None or self.shared is None:
+            return entry
+
+        cached = self.shared.get(key)
+        if cached is None:
+            return None
+        shared_entry: dict = orjson.loads(cached)
+        self.local.set(key, shared_entry, STATS_CACHE_TTL)
+        return shared_entry
+
+    def set(
+        self,
+        course_id: str,
+        exam_type: str,
+        year: int,
+        entry: dict,
+        finalized: bool,
+        generation: int,
+    ) -> None:
+        """
+        Caches the entry, unless the period was invalidated since generation
+        (see the generation method) was read.
+        """
+        key = self.key(course_id, exam_type, year)
+        with self.lock:
+            if self.generations.get(key, self.dropped_generation) != generation:
+                return
+            if self.shared is None:
+                self.local.set(key, entry, None if finalized else STATS_CACHE_TTL)
+                return
+            self.local.set(key, entry, STATS_CACHE_TTL)
+        self.shared.set(
+            key,
+            orjson.dumps(entry),
+            STATS_CACHE_FINAL_TTL if finalized else STATS_CACHE_TTL,
+        )
+
+    def invalidate(self, course_id: str, exam_type: str, year: int) -> None:
+        key = self.key(course_id, exam_type, year)
+        with self.lock:
+            self.invalidations += 1
+            self.generations[key] = self.invalidations
+            self.generations.move_to_end(key)
+            while len(self.generations) > STATS_CACHE_SIZE:
+                _, self.dropped_generation = self.generations.popitem(last=False)
+            self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generations.clear()
+            self.dropped_generation = self.invalidations
+            self.local.clear()
+
+
+def make_etag(content: Any) -> str:
+    return '"' + hashlib.sha1(orjson.dumps(content)).hexdigest() + '"'
+
+
+def version_etag(document: Any) -> str:
+    # ETag of a response that only depends on a versioned document
+    return f'"{document.id}-{document.version}"'
+
+
+stats_cache = StatsCache.from_env()
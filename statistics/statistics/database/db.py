@@ -1,8 +1,55 @@
 import os
+from statistics.statistics.models.models import (
+    Course,
+    CourseStatistics,
+    Grades,
+    IngestionJob,
+)
+from typing import Any
 
 import mongoengine
+from mongoengine import Document
+
+# documents whose indexes (declared in their meta) are built by this module,
+# their auto_create_index is off so no request waits for an index build
+INDEXED_DOCUMENTS: list[type[Document]] = [
+    Grades,
+    CourseStatistics,
+    Course,
+    IngestionJob,
+]
 
 
 def initialize_db() -> None:
     mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     mongoengine.connect(db="statistics", host=mongo_uri, alias="default")
+    # the unique indexes enforce the invariants of the writes, so they exist
+    # before the first request (a no-op once they are built)
+    create_indexes(unique=True)
+
+
+def create_indexes(unique: bool) -> None:
+    """
+    Creates the unique or the other indexes of INDEXED_DOCUMENTS.
+    Indexes that already exist with the same spec are left as they are.
+    """
+    for document in INDEXED_DOCUMENTS:
+        collection = document._get_collection()
+        for index_spec in document._meta["index_specs"]:
+            spec: dict[str, Any] = dict(index_spec)
+            if spec.get("unique", False) != unique:
+                continue
+            fields = spec.pop("fields")
+            spec.pop("cls", None)
+            collection.create_index(fields, background=True, **spec)
+
+
+def build_indexes() -> None:
+    # run at startup in a worker thread, the queries fall back to the
+    # existing indexes until the new ones are built
+    try:
+        create_indexes(unique=False)
+    except Exception as e:
+        print(f"Building the statistics indexes failed: {str(e)}")
+    else:
+        print("Statistics indexes are built")
@@ -0,0 +1,159 @@
+"""
+Query plan report of the statistics routes, run against the database of MONGO_URI:
+
+    python -m statistics.statistics.database.explain
+
+Every query shape of the routes is explained with values sampled from the
+database, printing the stages and indexes of its winning plan. The exit status
+is 1 if a query scans a whole collection, so a missing index shows up.
+"""
+
+import sys
+from statistics.statistics.database.db import initialize_db
+from statistics.statistics.models.models import (
+    Course,
+    CourseStatistics,
+    Grades,
+    IngestionJob,
+)
+from statistics.statistics.routes.analytics import grades_match, group_metrics
+from typing import Any, Callable, Optional
+
+from mongoengine import Document
+
+
+def explain_aggregate(document: type[Document], pipeline: list[dict]) -> dict:
+    collection = document._get_collection()
+    return collection.database.command(  # type: ignore
+        "explain",
+        {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}},
+        verbosity="queryPlanner",
+    )
+
+
+def winning_plan(explained: Any) -> Optional[dict]:
+    # the plan is nested differently for finds and (pushed down) aggregations
+    if isinstance(explained, dict):
+        if "winningPlan" in explained:
+            return explained["winningPlan"]  # type: ignore
+        explained = list(explained.values())
+    if isinstance(explained, list):
+        for value in explained:
+            plan = winning_plan(value)
+            if plan is not None:
+                return plan
+    return None
+
+
+def plan_stages(plan: Any) -> tuple[list[str], list[str]]:
+    """The stages and the index names of a plan, outermost first."""
+    stages: list[str] = []
+    indexes: list[str] = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        if "indexName" in plan:
+            indexes.append(plan["indexName"])
+        plan = list(plan.values())
+    if isinstance(plan, list):
+        for value in plan:
+            child_stages, child_indexes = plan_stages(value)
+            stages.extend(child_stages)
+            indexes.extend(child_indexes)
+    return stages, indexes
+
+
+def query_shapes(grade: dict, course: dict) -> dict[str, Callable[[], dict]]:
+    """
+    The queries of the routes, keyed by route. Keep them in sync with the
+    routes when a filter or a sort changes.
+    """
+    period = {
+        "course_id": grade["course_id"],
+        "exam_type": grade["exam_type"],
+        "year": grade["year"],
+    }
+    return {
+        "grades.get_student_grades": lambda: Grades.objects(
+            student_id__in=[grade["student_id"]],
+            exam_type__in=[grade["exam_type"]],
+            year__in=[grade["year"]],
+        )
+        .order_by("student_id", "id")
+        .explain(),
+        "grades.get_course_grades (courses)": lambda: Course.objects(
+            course_id__in=[course["course_id"]],
+            instructors__in=course["instructors"][:1],
+            semester__in=[course["semester"]],
+        ).explain(),
+        "grades.get_course_grades": lambda: Grades.objects(
+            course_id__in=[grade["course_id"]], year__in=[grade["year"]]
+        )
+        .order_by("course_id", "id")
+        .explain(),
+        "grades.update_grades": lambda: Grades.objects(**period).explain(),
+        "courses.get_course": lambda: Course.objects(
+            course_id=course["course_id"]
+        ).explain(),
+        "course_stats.get_course_stats": lambda: CourseStatistics.objects(
+            **period
+        ).explain(),
+        "course_stats.reconcile_course_stats": lambda: CourseStatistics.objects(
+            course_id=grade["course_id"]
+        ).explain(),
+        "course_stats.compute_course_stats": lambda: explain_aggregate(
+            Grades,
+            [{"$match": period}, {"$group": {"_id": "$grade", "count": {"$sum": 1}}}],
+        ),
+        "analytics.grades_match (institution)": lambda: Course.objects(
+            institution=course["institution"]
+        ).explain(),
+        "analytics.get_time_series": lambda: explain_aggregate(
+            Grades,
+            [
+                grades_match(
+                    [grade["course_id"]], None, None, grade["year"], grade["year"]
+                ),
+                {
+                    "$group": {
+                        "_id": {"course_id": "$course_id", "year": "$year"},
+                        **group_metrics(),
+                    }
+                },
+            ],
+        ),
+        "ingestion.ingest_grades": lambda: Grades.objects(
+            student_id__in=[grade["student_id"]]
+        ).explain(),
+        "ingestion.resume_ingestion_jobs": lambda: IngestionJob.objects(
+            status__in=["pending", "running"], grades__exists=True
+        ).explain(),
+    }
+
+
+def main() -> int:
+    initialize_db()
+
+    grade = Grades.objects.as_pymongo().first()
+    course = None
+    if grade is not None:
+        course = Course.objects(course_id=grade["course_id"]).as_pymongo().first()
+    if grade is None or course is None:
+        print("No grades to sample the query values from")
+        return 0
+
+    collection_scans = []
+    for route, explain in query_shapes(grade, course).items():
+        stages, indexes = plan_stages(winning_plan(explain()))
+        print(f"{route:<40} {' <- '.join(stages):<40} {', '.join(indexes) or '-'}")
+        if "COLLSCAN" in stages:
+            collection_scans.append(route)
+
+    if collection_scans:
+        print(f"Collection scans in: {', '.join(collection_scans)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,17 @@
+import os
 from datetime import datetime
 from typing import Optional
 
 from mongoengine import (
     BooleanField,
+    DateTimeField,
+    DictField,
     Document,
     FloatField,
     IntField,
     ListField,
     MapField,
+    ObjectIdField,
     ReferenceField,
     StringField,
 )
@@ -30,7 +34,15 @@ class Grades(Document):
                 "fields": ["student_id", "course_id", "exam_type", "year"],
                 "unique": True,
             },
-        ]
+            # grades of a course / exam period, without going through Course.grades
+            {"fields": ["course_id", "exam_type", "year"]},
+            # covers the analytics pipelines (match on course and years, group on grade)
+            {"fields": ["course_id", "year", "exam_type", "grade"]},
+            # grades of students over years / exam types (get_student_grades)
+            {"fields": ["student_id", "year", "exam_type"]},
+        ],
+        # built by database/db.py, not on the first query
+        "auto_create_index": False,
     }
 
     class Config:
@@ -72,6 +84,11 @@ class CourseStatistics(Document):
     question_grades_dist = ListField(
         MapField(field=IntField()), required=True
     )  # list[i] -> distribution for i-th question
+    # str(i) -> sum of i-th question grade * grade, for the question correlations
+    question_total_sums = MapField(field=FloatField(), required=False)
+    # incremented by every write, the summary holds the version it was computed for
+    version = IntField(default=0)
+    summary = DictField(required=False)
 
     meta = {
         "indexes": [
@@ -79,7 +96,8 @@ class CourseStatistics(Document):
                 "fields": ["course_id", "exam_type", "year"],
                 "unique": True,
             },
-        ]
+        ],
+        "auto_create_index": False,
     }
 
     class Config:
@@ -104,6 +122,27 @@ class CourseStatistics(Document):
         }
 
 
+def encode_bucket(value: float) -> str:
+    """
+    Key of a grade in the grades_dist / question_grades_dist maps.
+    MongoDB reads a "." in a field name as a nested field, so "6.0" is stored
+    as "6_0", which lets the counters be updated in place with $inc.
+    """
+    return str(value).replace(".", "_")
+
+
+def decode_dist(dist: dict) -> dict:
+    """
+    Turns a stored distribution back to {"6.0": count}. Keys stored before
+    encode_bucket was introduced are merged in and empty buckets are dropped.
+    """
+    decoded: dict = {}
+    for key, count in dist.items():
+        grade = key.replace("_", ".")
+        decoded[grade] = decoded.get(grade, 0) + count
+    return {grade: count for grade, count in decoded.items() if count > 0}
+
+
 class Course(Document):
     course_id = StringField(required=True, unique=True)
     institution = StringField(required=True)
@@ -114,6 +153,18 @@ class Course(Document):
     current_registered_students = ListField(StringField(unique=True), required=False)
     grades = ListField(ReferenceField(Grades), required=False)
     finalized = MapField(field=BooleanField(required=False))
+    # incremented by every write of the course or its grades, see version_etag
+    version = IntField(default=0)
+
+    meta = {
+        "indexes": [
+            # courses of an institution (analytics)
+            {"fields": ["institution", "course_id"]},
+            # courses filtered by instructor and semester (get_course_grades)
+            {"fields": ["instructors", "semester"]},
+        ],
+        "auto_create_index": False,
+    }
 
     class Config:
         json_schema_extra = {
@@ -158,3 +209,59 @@ class CourseGradesData(BaseModel):
 class EnrollmentModel(BaseModel):
     course_id: str
     current_registered_students: list[str]
+
+
+# seconds a finished ingestion job (and its idempotency key) is kept
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+
+class IngestionJob(Document):
+    job_id = StringField(required=True, unique=True)
+    idempotency_key = StringField(unique=True, sparse=True)
+    status = StringField(
+        required=True, choices=["pending", "running", "succeeded", "failed"]
+    )
+    course_id = StringField(required=True)
+    exam_type = StringField(required=True)
+    year = IntField(required=True)
+    num_grades = IntField(required=True)
+    # staged upload, cleared once the job is done
+    grades = ListField(DictField(), required=False)
+    # ids the grades are inserted with, so a partial write can be rolled back
+    grade_ids = ListField(ObjectIdField(), required=False)
+    description = StringField(required=False)
+    error = StringField(required=False)
+    created_at = DateTimeField(required=True)
+    updated_at = DateTimeField(required=True)
+
+    meta = {
+        "indexes": [
+            # only the unfinished jobs, which still hold their staged grades
+            {
+                "fields": ["status"],
+                "partialFilterExpression": {"grades": {"$exists": True}},
+            },
+            # finished jobs are deleted by MongoDB's TTL monitor
+            {
+                "fields": ["updated_at"],
+                "expireAfterSeconds": JOB_RETENTION,
+                "partialFilterExpression": {"status": {"$in": ["succeeded", "failed"]}},
+            },
+        ],
+        "auto_create_index": False,
+    }
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "4f1c0e4a9b3d4d1e8f0a2b3c4d5e6f70",
+                "idempotency_key": "b9e2a4c6-0d3f-4c5e-9a1b-2c3d4e5f6a7b",
+                "status": "succeeded",
+                "course_id": "NTU_CS101",
+                "exam_type": "Winter",
+                "year": 2024,
+                "num_grades": 600,
+                "description": "Grades added successfully",
+                "error": None,
+            }
+        }
@@ -0,0 +1,199 @@
+from statistics.statistics.models.models import Course, Grades
+from statistics.statistics.routes.course_stats import PASS_GRADE
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from starlette.status import HTTP_200_OK
+
+router = APIRouter()
+
+# lower bounds of the grade buckets: [0, 1), [1, 2), ..., [9, 10) and 10
+GRADE_BUCKETS = list(range(0, 12))
+
+
+def grades_match(
+    course_ids: Optional[list[str]],
+    institution: Optional[str],
+    exam_types: Optional[list[str]],
+    from_year: Optional[int],
+    to_year: Optional[int],
+) -> dict:
+    """
+    $match stage of the grades of the selected courses and exam periods.
+    The courses of an institution are resolved with one query on Course,
+    as the grades do not hold the institution.
+    """
+    if course_ids is None and institution is None:
+        raise HTTPException(
+            status_code=400, detail="Pass course_ids and/or an institution"
+        )
+
+    if institution is not None:
+        courses = Course.objects(institution=institution)
+        if course_ids is not None:
+            courses = courses.filter(course_id__in=course_ids)
+        course_ids = list(courses.scalar("course_id"))
+
+    match: dict = {"course_id": {"$in": course_ids}}
+    if exam_types is not None:
+        match["exam_type"] = {"$in": exam_types}
+    if from_year is not None or to_year is not None:
+        match["year"] = {}
+        if from_year is not None:
+            match["year"]["$gte"] = from_year
+        if to_year is not None:
+            match["year"]["$lte"] = to_year
+
+    return {"$match": match}
+
+
+def group_metrics() -> dict:
+    # metrics of every $group of grades
+    return {
+        "count": {"$sum": 1},
+        "mean": {"$avg": "$grade"},
+        "min": {"$min": "$grade"},
+        "max": {"$max": "$grade"},
+        "passed": {"$sum": {"$cond": [{"$gte": ["$grade", PASS_GRADE]}, 1, 0]}},
+    }
+
+
+def metrics_content(group: dict) -> dict:
+    return {
+        "count": group["count"],
+        "mean": group["mean"],
+        "min": group["min"],
+        "max": group["max"],
+        "pass_rate": group["passed"] / group["count"],
+    }
+
+
+@router.get(
+    "/time_series", response_description="Time series extracted successfully"
+)  # type: ignore
+async def get_time_series(
+    course_ids: Optional[list[str]] = Query(None),
+    institution: Optional[str] = None,
+    exam_types: Optional[list[str]] = Query(None),
+    from_year: Optional[int] = None,
+    to_year: Optional[int] = None,
+    by_exam_type: bool = True,
+) -> JSONResponse:
+    """
+    Returns the count, mean, min, max and pass rate of the grades of every course per exam period,
+    ordered by course and year, e.g. the trend of a course over the last 10 years
+    or of all the courses of an institution. Computed with a single aggregation pipeline.
+
+    :param course_ids: The course id's
+    :type course_ids: Optional[list[str]]
+    :param institution: All the courses of the institution (or the passed ones of it)
+    :type institution: Optional[str]
+    :param exam_types: Only these exam types
+    :type exam_types: Optional[list[str]]
+    :param from_year: First year, inclusive
+    :type from_year: Optional[int]
+    :param to_year: Last year, inclusive
+    :type to_year: Optional[int]
+    :param by_exam_type: If False, the exam types of a year are merged into one point
+    :type by_exam_type: bool
+    """
+    match = grades_match(course_ids, institution, exam_types, from_year, to_year)
+    key = {"course_id": "$course_id", "year": "$year"}
+    if by_exam_type:
+        key["exam_type"] = "$exam_type"
+
+    try:
+        groups = Grades.objects.aggregate(
+            [
+                match,
+                {"$group": {"_id": key, **group_metrics()}},
+                {"$sort": {"_id.course_id": 1, "_id.year": 1, "_id.exam_type": 1}},
+            ]
+        )
+        series = [{**group["_id"], **metrics_content(group)} for group in groups]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return JSONResponse(
+        status_code=HTTP_200_OK,
+        content={"description": "Time series extracted successfully", "series": series},
+    )
+
+
+@router.get(
+    "/comparison", response_description="Comparison extracted successfully"
+)  # type: ignore
+async def get_comparison(
+    course_ids: Optional[list[str]] = Query(None),
+    institution: Optional[str] = None,
+    exam_types: Optional[list[str]] = Query(None),
+    from_year: Optional[int] = None,
+    to_year: Optional[int] = None,
+) -> JSONResponse:
+    """
+    Compares the selected courses over the selected exam periods: the count, mean, min, max and
+    pass rate of the grades of every course, and the distribution of all their grades together
+    (one bucket per grade unit, see GRADE_BUCKETS), each computed with a single aggregation pipeline.
+
+    :param course_ids: The course id's
+    :type course_ids: Optional[list[str]]
+    :param institution: All the courses of the institution (or the passed ones of it)
+    :type institution: Optional[str]
+    :param exam_types: Only these exam types
+    :type exam_types: Optional[list[str]]
+    :param from_year: First year, inclusive
+    :type from_year: Optional[int]
+    :param to_year: Last year, inclusive
+    :type to_year: Optional[int]
+    """
+    match = grades_match(course_ids, institution, exam_types, from_year, to_year)
+
+    try:
+        courses = [
+            {"course_id": group["_id"], **metrics_content(group)}
+            for group in Grades.objects.aggregate(
+                [
+                    match,
+                    {"$group": {"_id": "$course_id", **group_metrics()}},
+                    {"$sort": {"_id": 1}},
+                ]
+            )
+        ]
+
+        counts = {
+            bucket["_id"]: bucket["count"]
+            for bucket in Grades.objects.aggregate(
+                [
+                    match,
+                    {
+                        "$bucket": {
+                            "groupBy": "$grade",
+                            "boundaries": GRADE_BUCKETS,
+                            # grades outside the boundaries, which $bucket
+                            # would fail the whole aggregation on
+                            "default": "other",
+                            "output": {"count": {"$sum": 1}},
+                        }
+                    },
+                ]
+            )
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # empty buckets are not returned by $bucket
+    distribution = [
+        {"grade_from": grade_from, "count": counts.get(grade_from, 0)}
+        for grade_from in GRADE_BUCKETS[:-1]
+    ]
+
+    return JSONResponse(
+        status_code=HTTP_200_OK,
+        content={
+            "description": "Comparison extracted successfully",
+            "courses": courses,
+            "distribution": distribution,
+            "out_of_range": counts.get("other", 0),
+        },
+    )
@@ -1,22 +1,369 @@
-from statistics.statistics.models.models import CourseStatistics
+import asyncio
+import os
+from collections import Counter, defaultdict
+from statistics.statistics.database.cache import make_etag, stats_cache
+from statistics.statistics.models.models import (
+    Course,
+    CourseStatistics,
+    Grades,
+    decode_dist,
+    encode_bucket,
+)
+from typing import Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+import numpy as np
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse, Response
+from pymongo import ReturnDocument
 from starlette.status import HTTP_200_OK
 
 router = APIRouter()
 
+# seconds between two reconciliations of the course statistics, 0 disables them
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "0"))
+
+
+class StatsDelta:
+    """
+    Changes to the distributions of an exam period, as counts per bucket.
+    A grade is added with delta 1 and removed with delta -1, so an update
+    is the removal of the old grade and the addition of the new one.
+    The question grade * grade sums (see summarize) change the same way.
+    """
+
+    def __init__(self) -> None:
+        self.grades_dist: Counter = Counter()
+        self.question_grades_dist: list[Counter] = []
+        self.question_total_sums: defaultdict[str, float] = defaultdict(float)
+
+    def question(self, q: int) -> Counter:
+        while len(self.question_grades_dist) <= q:
+            self.question_grades_dist.append(Counter())
+        return self.question_grades_dist[q]
+
+    def count(self, grade: float, question_grades: list[float], delta: int) -> None:
+        self.grades_dist[encode_bucket(grade)] += delta
+        for q, question_grade in enumerate(question_grades):
+            self.question(q)[encode_bucket(question_grade)] += delta
+            self.question_total_sums[str(q)] += delta * question_grade * grade
+
+    def dists(self) -> Tuple[dict, list[dict]]:
+        # the counts as the grades_dist and question_grades_dist of a CourseStatistics
+        return {key: n for key, n in self.grades_dist.items() if n != 0}, [
+            {key: n for key, n in dist.items() if n != 0}
+            for dist in self.question_grades_dist
+        ]
+
+    def apply(self, course_stats: CourseStatistics) -> None:
+        """
+        Writes the changes to the stored statistics as a single atomic $inc,
+        so concurrent writes of the same exam period never overwrite each other.
+        The summary is then recomputed from the updated statistics.
+        """
+        collection = CourseStatistics._get_collection()
+
+        # a question that is not in the stored statistics gets an empty
+        # distribution first, pushed only if no concurrent write added it
+        for q in range(
+            len(course_stats.question_grades_dist), len(self.question_grades_dist)
+        ):
+            collection.update_one(
+                {
+                    "_id": course_stats.id,
+                    f"question_grades_dist.{q}": {"$exists": False},
+                },
+                {"$push": {"question_grades_dist": {}}},
+            )
+
+        grades_dist, question_grades_dist = self.dists()
+        inc = {f"grades_dist.{key}": n for key, n in grades_dist.items()}
+        for q, dist in enumerate(question_grades_dist):
+            inc.update(
+                {f"question_grades_dist.{q}.{key}": n for key, n in dist.items()}
+            )
+        inc.update(
+            {
+                f"question_total_sums.{q}": total
+                for q, total in self.question_total_sums.items()
+                if total != 0
+            }
+        )
+        # the sums can change while the histograms net to zero
+        if not inc:
+            return
+        inc["version"] = 1
+
+        stored = collection.find_one_and_update(
+            {"_id": course_stats.id},
+            {"$inc": inc},
+            return_document=ReturnDocument.AFTER,
+        )
+        save_summary(stored)
+
+
+# quantiles of the grades in the summary
+QUANTILES = {"p10": 0.1, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+# lowest passing grade
+PASS_GRADE = 5.0
+
+
+def histogram(dist: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """The grades of a stored distribution and their counts, sorted by grade."""
+    decoded = decode_dist(dist)
+    grades = np.array([float(grade) for grade in decoded])
+    counts = np.array(list(decoded.values()), dtype=np.int64)
+    order = np.argsort(grades)
+    return grades[order], counts[order]
+
+
+def quantiles(grades: np.ndarray, counts: np.ndarray, qs: list[float]) -> np.ndarray:
+    """
+    Quantiles of the grades a histogram stands for, the same as np.quantile
+    (linear interpolation) of the individual grades, without expanding them.
+    """
+    positions = np.asarray(qs) * (counts.sum() - 1)
+    # index after the last grade of every bucket, in the sorted grades
+    ends = np.cumsum(counts)
+    lower = grades[np.searchsorted(ends, np.floor(positions), side="right")]
+    upper = grades[np.searchsorted(ends, np.ceil(positions), side="right")]
+    return np.asarray(lower + (upper - lower) * (positions - np.floor(positions)))
+
+
+def summarize(
+    grades_dist: dict, question_grades_dist: list[dict], question_total_sums: dict
+) -> dict:
+    """
+    Summary metrics of an exam period, computed with numpy over the histograms:
+    count, mean, variance, median, quantiles and pass rate of the grades, and the
+    mean of every question with its (Pearson) correlation with the grade.
+    """
+    grades, counts = histogram(grades_dist)
+    count = int(counts.sum())
+    questions: list[dict] = [
+        {"mean": None, "correlation": None} for _ in question_grades_dist
+    ]
+    if count == 0:
+        return {
+            "count": 0,
+            "mean": None,
+            "variance": None,
+            "median": None,
+            "quantiles": {key: None for key in QUANTILES},
+            "pass_rate": None,
+            "questions": questions,
+        }
+
+    mean = np.dot(grades, counts) / count
+    variance = np.dot((grades - mean) ** 2, counts) / count
+    grade_quantiles = quantiles(grades, counts, list(QUANTILES.values()))
+
+    for q, dist in enumerate(question_grades_dist):
+        question_grades, question_counts = histogram(dist)
+        if question_counts.sum() == 0:
+            continue
+        question_mean = np.dot(question_grades, question_counts) / question_counts.sum()
+        questions[q]["mean"] = float(question_mean)
+
+        question_variance = (
+            np.dot((question_grades - question_mean) ** 2, question_counts)
+            / question_counts.sum()
+        )
+        total = question_total_sums.get(str(q))
+        # only defined when every grade has the question
+        if (
+            total is not None
+            and question_counts.sum() == count
+            and question_variance > 0
+            and variance > 0
+        ):
+            covariance = total / count - question_mean * mean
+            correlation = covariance / np.sqrt(question_variance * variance)
+            questions[q]["correlation"] = float(np.clip(correlation, -1.0, 1.0))
+
+    return {
+        "count": count,
+        "mean": float(mean),
+        "variance": float(variance),
+        "median": float(grade_quantiles[list(QUANTILES).index("p50")]),
+        "quantiles": dict(zip(QUANTILES, grade_quantiles.tolist())),
+        "pass_rate": float(counts[grades >= PASS_GRADE].sum() / count),
+        "questions": questions,
+    }
+
+
+def stored_summary(stored: dict) -> dict:
+    # the summary of a raw CourseStatistics document
+    return summarize(
+        stored["grades_dist"],
+        stored["question_grades_dist"],
+        stored.get("question_total_sums", {}),
+    )
+
+
+def save_summary(stored: dict) -> None:
+    """
+    Stores the summary of a raw CourseStatistics document, unless a concurrent
+    write has changed the statistics since (its own summary is then the newer one).
+    """
+    version = stored.get("version", 0)
+    CourseStatistics._get_collection().update_one(
+        {"_id": stored["_id"], "version": stored.get("version")},
+        {"$set": {"summary": {**stored_summary(stored), "version": version}}},
+    )
+
+
+def compute_course_stats(course_id: str, exam_type: str, year: int) -> StatsDelta:
+    """
+    Recomputes the distributions of an exam period from its grades,
+    grouped server side with an aggregation pipeline.
+    """
+    match = {"$match": {"course_id": course_id, "exam_type": exam_type, "year": year}}
+    unwind = {
+        "$unwind": {
+            "path": "$question_grades",
+            "includeArrayIndex": "question",
+        }
+    }
+    stats = StatsDelta()
+
+    for bucket in Grades.objects.aggregate(
+        [match, {"$group": {"_id": "$grade", "count": {"$sum": 1}}}]
+    ):
+        stats.grades_dist[encode_bucket(bucket["_id"])] += bucket["count"]
+
+    for bucket in Grades.objects.aggregate(
+        [
+            match,
+            unwind,
+            {
+                "$group": {
+                    "_id": {"question": "$question", "grade": "$question_grades"},
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+    ):
+        question = stats.question(bucket["_id"]["question"])
+        question[encode_bucket(bucket["_id"]["grade"])] += bucket["count"]
+
+    for bucket in Grades.objects.aggregate(
+        [
+            match,
+            unwind,
+            {
+                "$group": {
+                    "_id": "$question",
+                    "total": {"$sum": {"$multiply": ["$question_grades", "$grade"]}},
+                }
+            },
+        ]
+    ):
+        stats.question_total_sums[str(bucket["_id"])] += bucket["total"]
+
+    return stats
+
+
+def reconcile_course_stats(
+    course_id: Optional[str] = None,
+    exam_type: Optional[str] = None,
+    year: Optional[int] = None,
+) -> list[dict]:
+    """
+    Recomputes the statistics of every matching exam period from Grades and
+    fixes the ones that drifted, e.g. after a write that failed half-way.
+    Statistics stored without question_total_sums or summary get them here.
+
+    :return: the exam periods whose statistics were fixed
+    """
+    filters = {
+        key: value
+        for key, value in [
+            ("course_id", course_id),
+            ("exam_type", exam_type),
+            ("year", year),
+        ]
+        if value is not None
+    }
+    reconciled = []
+    for stored in CourseStatistics.objects(**filters).as_pymongo():
+        period = {
+            "course_id": stored["course_id"],
+            "exam_type": stored["exam_type"],
+            "year": stored["year"],
+        }
+        stats = compute_course_stats(**period)
+        grades_dist, question_grades_dist = stats.dists()
+        question_total_sums = dict(stats.question_total_sums)
+        stored_sums = stored.get("question_total_sums", {})
+        if (
+            decode_dist(stored["grades_dist"]) == decode_dist(grades_dist)
+            and [decode_dist(dist) for dist in stored["question_grades_dist"]]
+            == [decode_dist(dist) for dist in question_grades_dist]
+            and stored_sums.keys() == question_total_sums.keys()
+            and all(
+                np.isclose(stored_sums[q], total)
+                for q, total in question_total_sums.items()
+            )
+            and stored.get("summary", {}).get("version") == stored.get("version")
+        ):
+            continue
+
+        # compare-and-set on the version: the statistics are kept if a write
+        # changed them after they were read, the next reconciliation checks them again
+        version = stored.get("version", 0) + 1
+        result = CourseStatistics._get_collection().update_one(
+            {"_id": stored["_id"], "version": stored.get("version")},
+            {
+                "$set": {
+                    "grades_dist": grades_dist,
+                    "question_grades_dist": question_grades_dist,
+                    "question_total_sums": question_total_sums,
+                    "version": version,
+                    "summary": {
+                        **summarize(
+                            grades_dist, question_grades_dist, question_total_sums
+                        ),
+                        "version": version,
+                    },
+                }
+            },
+        )
+        if result.modified_count:
+            stats_cache.invalidate(**period)
+            reconciled.append(period)
+
+    return reconciled
+
+
+async def reconcile_periodically(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reconciled = await loop.run_in_executor(None, reconcile_course_stats)
+            if reconciled:
+                print(f"Reconciled course statistics: {reconciled}")
+        except Exception as e:
+            print(f"Course statistics reconciliation failed: {e}")
+
 
 @router.get(
     "/get_course_stats",
     response_description="Course statistics extracted successfully",
 )  # type: ignore
 async def get_course_stats(
-    course_id: str, exam_year: int, exam_type: str
-) -> JSONResponse:
+    course_id: str,
+    exam_year: int,
+    exam_type: str,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
     Extract distribution plots for a specific exam period of a course
-    returns both the course grades distributions as well as individual question grades distributions
+    returns both the course grades distributions as well as individual question grades distributions,
+    and their summary metrics (see summarize)
+
+    The responses are cached (see StatsCache) and carry an ETag: a request with a matching
+    If-None-Match header gets a 304 Not Modified without a body.
 
     :param course_id: The course id
     :type course_id: str
@@ -24,7 +371,33 @@ async def get_course_stats(
     :type exam_year: int
     :param exam_type: Winter, Spring or Retake(more can be used, depending on modeling)
     :type exam_type: str
+    :param if_none_match: The ETag of a previous response
+    :type if_none_match: Optional[str]
     """
+    entry = stats_cache.get(course_id, exam_type, exam_year)
+    if entry is None:
+        generation = stats_cache.generation(course_id, exam_type, exam_year)
+        content = read_course_stats(course_id, exam_year, exam_type)
+        entry = {"content": content, "etag": make_etag(content)}
+
+        course = Course.objects(course_id=course_id).only("finalized").first()
+        finalized = course is not None and bool(
+            course.finalized.get(f"{exam_type}-{exam_year}")
+        )
+        stats_cache.set(course_id, exam_type, exam_year, entry, finalized, generation)
+
+    if if_none_match == entry["etag"]:
+        return Response(status_code=304, headers={"ETag": entry["etag"]})
+
+    return JSONResponse(
+        status_code=HTTP_200_OK,
+        content=entry["content"],
+        headers={"ETag": entry["etag"]},
+    )
+
+
+def read_course_stats(course_id: str, exam_year: int, exam_type: str) -> dict:
+    # the get_course_stats content, read from the database
     try:
         grades_stats = CourseStatistics.objects(
             course_id=course_id,
@@ -38,15 +411,57 @@ async def get_course_stats(
                 detail=f"Could not find any stats for course: {course_id}, year: {exam_year} and exam type: {exam_type}",
             )
 
-        return JSONResponse(
-            status_code=HTTP_200_OK,
-            content={
-                "description": "Course statistics extracted successfully",
-                "grades_dist": grades_stats.grades_dist,
-                "question_grades_dist": grades_stats.question_grades_dist,
-            },
-        )
+        # the stored summary, unless a write has not stored its own yet
+        stored = grades_stats.to_mongo().to_dict()
+        summary = stored.get("summary", {})
+        if summary.get("version") != stored.get("version"):
+            summary = stored_summary(stored)
+        summary.pop("version", None)
+
+        return {
+            "description": "Course statistics extracted successfully",
+            "grades_dist": decode_dist(grades_stats.grades_dist),
+            "question_grades_dist": [
+                decode_dist(dist) for dist in grades_stats.question_grades_dist
+            ],
+            "summary": summary,
+        }
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/reconcile_course_stats",
+    response_description="Course statistics reconciled successfully",
+)  # type: ignore
+async def reconcile(
+    course_id: Optional[str] = None,
+    exam_type: Optional[str] = None,
+    year: Optional[int] = None,
+) -> JSONResponse:
+    """
+    Recomputes the course statistics from the saved grades and fixes the ones that are out of sync.
+    All the exam periods are checked unless filtered by course id, exam type and/or year.
+    The same reconciliation runs every STATS_RECONCILE_INTERVAL seconds, if set.
+
+    :param course_id: The course id
+    :type course_id: Optional[str]
+    :param exam_type: The exam type
+    :type exam_type: Optional[str]
+    :param year: The exam year
+    :type year: Optional[int]
+    """
+    try:
+        reconciled = reconcile_course_stats(course_id, exam_type, year)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return JSONResponse(
+        status_code=HTTP_200_OK,
+        content={
+            "description": f"Reconciled {len(reconciled)} course statistics",
+            "reconciled": reconciled,
+        },
+    )
@@ -1,12 +1,14 @@
+from statistics.statistics.database.cache import stats_cache, version_etag
 from statistics.statistics.models.models import (
     Course,
     CourseModel,
     EnrollmentModel,
     Grades,
 )
+from typing import Optional
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import JSONResponse, Response
 
 router = APIRouter()
 
@@ -67,6 +69,7 @@ async def enroll_students(enroll: EnrollmentModel) -> JSONResponse:
 
         course = Course.objects(course_id=enroll.course_id).first()
         course.current_registered_students = enroll.current_registered_students
+        course.version += 1
 
         course.save()
 
@@ -127,7 +130,10 @@ async def finalize_course(
             )
 
         course.finalized[f"{exam_type}-{exam_year}"] = True
+        course.version += 1
         course.save()
+        # re-cached as a finalized period on the next read
+        stats_cache.invalidate(course_id, exam_type, exam_year)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -159,7 +165,9 @@ async def initialize_course_grades(
             )
 
         course.finalized[f"{exam_type}-{exam_year}"] = False
+        course.version += 1
         course.save()
+        stats_cache.invalidate(course_id, exam_type, exam_year)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -177,36 +185,49 @@ async def initialize_course_grades(
     response_description="Course finalized successfully",
 )  # type: ignore
 async def get_status_of_grades(
-    course_id: str, exam_type: str, exam_year: int
-) -> JSONResponse:
+    course_id: str,
+    exam_type: str,
+    exam_year: int,
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
     Returns "UNKNOWN" if there are no existing grades in the DB for the (course_id, exam_type, exam_year) tuple,
             "INITIAL" if grades exist but the (course_id, exam_type, exam_year) is not finalized (initial grades exist),
     and     "FINAL" if (course_id, exam_type, exam_year) finalized (final grades exist).
+    The ETag is the version of the course: a request with a matching If-None-Match header gets a 304.
     """
     try:
-        course = Course.objects(course_id=course_id).first()
+        course = (
+            Course.objects(course_id=course_id).only("version", "finalized").first()
+        )
 
         if course is None:
             raise HTTPException(
                 status_code=400, detail=f"Can't find course: {course_id}"
             )
 
+        etag = version_etag(course)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
         if f"{exam_type}-{exam_year}" not in course.finalized:
             return JSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={"grades_status": "UNKNOWN"},
+                headers={"ETag": etag},
             )
 
         if course.finalized[f"{exam_type}-{exam_year}"]:
             return JSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={"grades_status": "FINAL"},
+                headers={"ETag": etag},
             )
         else:
             return JSONResponse(
                 status_code=status.HTTP_200_OK,
                 content={"grades_status": "INITIAL"},
+                headers={"ETag": etag},
             )
 
     except HTTPException as http_exc:
@@ -1,3 +1,4 @@
+from statistics.statistics.database.cache import make_etag, stats_cache
 from statistics.statistics.models.models import (
     Course,
     CourseStatistics,
@@ -5,17 +6,75 @@ from statistics.statistics.models.models import (
     GradesModel,
     GradesModelOps,
 )
-from typing import Optional
-
-from fastapi import APIRouter, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+from statistics.statistics.routes.course_stats import StatsDelta
+from statistics.statistics.routes.ingestion import (
+    create_ingestion_job,
+    ingest_grades,
+    job_content,
+    run_ingestion_job,
+)
+from typing import Iterable, Iterator, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from mongoengine import Q
+from pymongo import DeleteOne, InsertOne, UpdateOne
 from starlette.status import HTTP_200_OK
 
 router = APIRouter()
 
+# the fields of a grade returned to the clients (see GradesModel)
+GRADE_FIELDS = [
+    "student_id",
+    "name",
+    "course_id",
+    "exam_type",
+    "year",
+    "grade",
+    "question_grades",
+    "grade_weights",
+]
+
+
+def encode_cursor(key: str, object_id: ObjectId) -> str:
+    # position after the last returned grade: its sort key and its id
+    return f"{key}:{object_id}"
+
+
+def after_cursor(cursor: str, field: str = "student_id") -> Q:
+    """
+    Query for the grades after the cursor, in (field, id) order.
+    """
+    key, _, object_id = cursor.rpartition(":")
+    if not ObjectId.is_valid(object_id):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+    return Q(**{f"{field}__gt": key}) | Q(**{field: key, "id__gt": ObjectId(object_id)})
+
+
+def stream_grades(
+    grades: Iterable[dict], limit: Optional[int], cursor_field: str
+) -> Iterator[bytes]:
+    # one grade per line, read lazily from the database cursor
+    count = 0
+    last_grade = None
+    for grade in grades:
+        count += 1
+        last_grade = grade
+        yield orjson.dumps({key: grade.get(key) for key in GRADE_FIELDS}) + b"\n"
+
+    if last_grade is not None and limit is not None and count == limit:
+        next_cursor = encode_cursor(last_grade[cursor_field], last_grade["_id"])
+        yield orjson.dumps({"next_cursor": next_cursor}) + b"\n"
+
 
 @router.post("/add_grades", response_description="Grades added successfully")  # type: ignore
-async def add_grades(passed_grades: list[GradesModel]) -> JSONResponse:
+async def add_grades(
+    passed_grades: list[GradesModel],
+    idempotency_key: Optional[str] = Header(None),
+) -> JSONResponse:
     """
     Add grades to the database - INITIAL POST GRADES
     Used for initial post grades for (student, course, exam type, year) combinations.
@@ -24,128 +83,68 @@ async def add_grades(passed_grades: list[GradesModel]) -> JSONResponse:
     the course.finalized field will be set to False for the given exam type and year,
     so that the status_of_grades will be set to INITIAL for the course
 
+    If an Idempotency-Key header is passed, the upload is recorded as an ingestion job,
+    so a retried request with the same key returns the outcome of the first one
+    instead of failing with "Tried to post already existing grades".
+
     :param passed_grades: A list of grades
     :type passed_grades: List[BaseModel](see models.py)
+    :param idempotency_key: Optional key identifying the upload
+    :type idempotency_key: Optional[str]
     """
-
-    try:
-        grades_dist: dict = {}
-        question_grades_dist: list[dict] = [
-            {} for i in range(len(passed_grades[0].question_grades))
-        ]
-
-        # check the course exists and is not finalized for the given exam type and year
-        check_course = Course.objects(course_id=passed_grades[0].course_id).first()
-        if check_course is None:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Course: {passed_grades[0].course_id} doesn't exist. Make sure your representative add the course first.",
-            )
-        if (
-            f"{passed_grades[0].exam_type}-{passed_grades[0].year}"
-            in check_course.finalized
-        ):
-            if check_course.finalized[
-                f"{passed_grades[0].exam_type}-{passed_grades[0].year}"
-            ]:  # check_course.finalized[{examp_type}-{year}] == True
-                # this means that the course has been finalized for the given exam type and year
-                # final grades have been posted
-                # and we should neither add / post them again, nor update them
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Final grades already posted for course: {passed_grades[0].course_id}, exam type: {passed_grades[0].exam_type} and year: {passed_grades[0].year}. You cannot add grades anymore.",
-                )
-            else:  # check_course.finalized[{examp_type}-{year}] == False
-                # this means that the initial grades have been posted
-                # and we should not post them again, but update them instead
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Initial grades already posted for: {passed_grades[0].course_id}, exam type: {passed_grades[0].exam_type} and year: {passed_grades[0].year}. You should use the update_grades endpoint.",
-                )
-
-        for grade in passed_grades:
-
-            if grade.student_id not in check_course.current_registered_students:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Student {grade.student_id} doesn't exist in this course",
-                )
-
-            if (
-                len(
-                    Grades.objects(
-                        student_id=grade.student_id,
-                        course_id=grade.course_id,
-                        exam_type=grade.exam_type,
-                        year=grade.year,
-                    )
-                )
-                > 0
-            ):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Tried to post already existing grades: [{grade.student_id}, {grade.course_id}, {grade.exam_type}, {grade.year}]",
-                )
-
-            new_grade = Grades(
-                student_id=grade.student_id,
-                name=grade.name,
-                course_id=grade.course_id,
-                exam_type=grade.exam_type,
-                year=grade.year,
-                grade=grade.grade,
-                question_grades=grade.question_grades,
-                grade_weights=grade.grade_weights,
-            )
-            new_grade.save()
-
-            check_course.grades.append(new_grade)
-            check_course.save()
-
-            # compute course statistics
-            if str(grade.grade) not in grades_dist:
-                grades_dist[str(grade.grade)] = 1
-            else:
-                grades_dist[str(grade.grade)] += 1
-
-            for q, question_grade in enumerate(grade.question_grades):
-                if str(question_grade) not in question_grades_dist[q]:
-                    question_grades_dist[q][str(question_grade)] = 1
-                else:
-                    question_grades_dist[q][str(question_grade)] += 1
-
-        # save the course statistics
-        course_stats = CourseStatistics(
-            course_id=passed_grades[0].course_id,
-            exam_type=passed_grades[0].exam_type,
-            year=passed_grades[0].year,
-            grades_dist=grades_dist,
-            question_grades_dist=question_grades_dist,
-        )
-        course_stats.save()
-
-        # mark the course as not finalized for the given exam type and year (INITIAL POST GRADES)
-        check_course.finalized[
-            f"{passed_grades[0].exam_type}-{passed_grades[0].year}"
-        ] = False
-        check_course.save()
+    if idempotency_key is None:
+        try:
+            ingest_grades(passed_grades)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={"description": "Grades added successfully"},
         )
+
+    try:
+        job, created = create_ingestion_job(passed_grades, idempotency_key)
+        if created:
+            run_ingestion_job(job.job_id)
+            job.reload()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    if job.status == "failed":
+        raise HTTPException(status_code=400, detail=job.error)
+    if job.status == "succeeded":
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={"description": job.description},
+        )
+    # the first request with this key is still being processed
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "description": "Grades are still being processed",
+            "job": job_content(job),
+        },
+    )
+
 
 @router.get("/get_student_grades", response_description="Grades extracted successfully")  # type: ignore
 async def get_student_grades(
     student_ids: list[str] = Query(...),
     years: Optional[list[int]] = Query(None),
     exam_types: Optional[list[str]] = Query(None),
-) -> JSONResponse:
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
-    Returns a list of grade statistics for the passed Students information
+    Returns a list of grade statistics for the passed Students information.
+    All the students are fetched with a single query. A single json page keeps
+    the order of student_ids; paginated and ndjson responses are ordered by
+    student id, which the cursor relies on.
+    The grades span many courses, so the ETag of a json response is a hash of its content:
+    a request with a matching If-None-Match header gets a 304 without the grades.
 
      :param student_ids: A list of student id's
      :type student_ids: list[str]
@@ -153,6 +152,15 @@ async def get_student_grades(
      :type years: Optional[list[int]]
      :param exam_types: A list of exam types(like "Winter", "Summer", "Re-take", depends on your use case)
      :type exam_types: Optional[list[str]]
+     :param limit: Maximum number of grades to return, all of them if not passed
+     :type limit: Optional[int]
+     :param cursor: The next_cursor of the previous page
+     :type cursor: Optional[str]
+     :param format: "json" or "ndjson". With "ndjson" the grades are streamed one per line,
+     followed by a {"next_cursor": ...} line if the page is full
+     :type format: str
+     :param if_none_match: The ETag of a previous response
+     :type if_none_match: Optional[str]
     """
     if len(student_ids) != len(set(student_ids)):
         raise HTTPException(status_code=422, detail="Found duplicate student id's")
@@ -161,35 +169,55 @@ async def get_student_grades(
     if exam_types and len(exam_types) != len(set(exam_types)):
         raise HTTPException(status_code=422, detail="Found duplicate exam types")
 
-    try:
-        returned_grades = []
-        for student in student_ids:
-            grade_query = {"student_id": student}
-            if exam_types:
-                grade_query["exam_type__in"] = exam_types  # type: ignore
-            if years:
-                grade_query["year__in"] = years  # type: ignore
-
-            for grade in Grades.objects(**grade_query).order_by("student_id"):
-                returned_grades.append(
-                    GradesModel(
-                        student_id=grade.student_id,
-                        name=grade.name,
-                        course_id=grade.course_id,
-                        exam_type=grade.exam_type,
-                        year=grade.year,
-                        grade=grade.grade,
-                        question_grades=grade.question_grades,
-                        grade_weights=grade.grade_weights,
-                    ).dict()
-                )
+    grade_query: dict = {"student_id__in": student_ids}
+    if exam_types:
+        grade_query["exam_type__in"] = exam_types
+    if years:
+        grade_query["year__in"] = years
 
-        return JSONResponse(
+    grades = Grades.objects(**grade_query)
+    if cursor is not None:
+        grades = grades.filter(after_cursor(cursor))
+
+    grades = grades.only(*GRADE_FIELDS).order_by("student_id", "id")
+    if limit is not None:
+        grades = grades.limit(limit)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_grades(grades.as_pymongo(), limit, cursor_field="student_id"),
+            media_type="application/x-ndjson",
+        )
+
+    try:
+        # raw documents, serialized by orjson without building a model per grade
+        returned_grades = list(grades.as_pymongo())
+        if limit is None and cursor is None:
+            # stable, so the grades of a student stay in id order
+            position = {student_id: i for i, student_id in enumerate(student_ids)}
+            returned_grades.sort(key=lambda grade: position[grade["student_id"]])
+
+        next_cursor = None
+        if limit is not None and len(returned_grades) == limit:
+            next_cursor = encode_cursor(
+                returned_grades[-1]["student_id"], returned_grades[-1]["_id"]
+            )
+        for grade in returned_grades:
+            del grade["_id"]
+
+        content = {
+            "description": "Grades extracted successfully",
+            "grades": returned_grades,
+            "next_cursor": next_cursor,
+        }
+        etag = make_etag(content)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
-            content={
-                "description": "Grades extracted successfully",
-                "grades": returned_grades,
-            },
+            content=content,
+            headers={"ETag": etag},
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -200,9 +228,16 @@ async def get_course_grades(
     course_ids: list[str] = Query(...),
     instructors: Optional[list[str]] = Query(None),
     semester: Optional[list[int]] = Query(None),
-) -> JSONResponse:
+    exam_types: Optional[list[str]] = Query(None),
+    years: Optional[list[int]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+) -> Response:
     """
-    Returns a list of grade statistics for the passed courses information
+    Returns a list of grade statistics for the passed courses information.
+    The grades are read directly by course id (not through Course.grades),
+    ordered by course id.
 
     :param course_ids: A list of course id's
     :type course_ids: list[str]
@@ -210,36 +245,67 @@ async def get_course_grades(
     :type instructors: Optional[list[str]]
     :param semester: A list of semesters
     :type semester: Optional[list[int]]
+    :param exam_types: A list of exam types
+    :type exam_types: Optional[list[str]]
+    :param years: A list of years
+    :type years: Optional[list[int]]
+    :param limit: Maximum number of grades to return, all of them if not passed
+    :type limit: Optional[int]
+    :param cursor: The next_cursor of the previous page
+    :type cursor: Optional[str]
+    :param format: "json" or "ndjson". With "ndjson" the grades are streamed one per line,
+    followed by a {"next_cursor": ...} line if the page is full
+    :type format: str
     """
+    course_query: dict = {"course_id__in": course_ids}
+    if instructors:
+        course_query["instructors__in"] = instructors
+    if semester:
+        course_query["semester__in"] = semester
+
     try:
-        returned_grades = []
-        for course in course_ids:
-            grade_query = {"course_id": course}
-            if instructors:
-                grade_query["instructors__in"] = instructors  # type: ignore
-
-            if semester:
-                grade_query["semester__in"] = semester  # type: ignore
-            for course in Course.objects(**grade_query).order_by("course_id"):
-                for grade in course.grades:  # type: ignore
-                    returned_grades.append(
-                        GradesModel(
-                            student_id=grade.student_id,
-                            name=grade.name,
-                            course_id=grade.course_id,
-                            exam_type=grade.exam_type,
-                            year=grade.year,
-                            grade=grade.grade,
-                            question_grades=grade.question_grades,
-                            grade_weights=grade.grade_weights,
-                        ).dict()
-                    )
+        # only the ids of the matching courses, their grade references are never loaded
+        matching_course_ids = list(Course.objects(**course_query).scalar("course_id"))
 
-        return JSONResponse(
+        grade_query: dict = {"course_id__in": matching_course_ids}
+        if exam_types:
+            grade_query["exam_type__in"] = exam_types
+        if years:
+            grade_query["year__in"] = years
+
+        grades = Grades.objects(**grade_query)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if cursor is not None:
+        grades = grades.filter(after_cursor(cursor, field="course_id"))
+    grades = grades.only(*GRADE_FIELDS).order_by("course_id", "id")
+    if limit is not None:
+        grades = grades.limit(limit)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_grades(grades.as_pymongo(), limit, cursor_field="course_id"),
+            media_type="application/x-ndjson",
+        )
+
+    try:
+        returned_grades = list(grades.as_pymongo())
+
+        next_cursor = None
+        if limit is not None and len(returned_grades) == limit:
+            next_cursor = encode_cursor(
+                returned_grades[-1]["course_id"], returned_grades[-1]["_id"]
+            )
+        for grade in returned_grades:
+            del grade["_id"]
+
+        return ORJSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "description": "Grades extracted successfully",
                 "grades": returned_grades,
+                "next_cursor": next_cursor,
             },
         )
 
@@ -248,107 +314,159 @@ async def get_course_grades(
 
 
 @router.put("/update_grades", response_description="Grades updated successfully")  # type: ignore
-async def update_grades(updated_grades: list[GradesModel]) -> JSONResponse:
+async def update_grades(
+    updated_grades: list[GradesModel], replace: bool = False
+) -> JSONResponse:
     """
     Updates the passed students grades - used for FINAL POST GRADES.
 
+    The saved grades of the exam period are fetched with one query and diffed in memory
+    against the passed ones. The changes are written with a single bulk_write and the
+    course statistics are adjusted with a single $inc of the distribution deltas (see StatsDelta).
+
     :param updated_grades: A list of the grades to be updated. This endpoint searches for the same student's grades
     for the same course and exam_type and year combination, and if it finds a match, it updates it with the passed grade
     :type updated_grades: BaseModel(see models.py)
+    :param replace: If True, the passed grades are the complete FINAL upload: grades of registered students
+    that were not posted before are inserted and saved grades that are not in the upload are deleted
+    :type replace: bool
     """
-    # CAUTION:
-    # this will not update properly the grades if the student ids in the grades saved before
-    # are not the same as the ones in the passed updated_grades.
-    # e.g. When saved grades refet to student_id's : # ["123", "456"]
-    # and the passed updated_grades refer to student_id's: ["123", "789"]
-    # then the grade for student_id "123" will be updated,
-    # then the grade for student_id "456" will not be updated and will remain the same.
-    # (I suppose we want to delete the grade for student_id "456")
-    # and the new value for student_id "789" will not be added
-    # (possible TODO): if we want to be absolutely compatible with FINAL POST GRADES,
-    # we should  delete the saved grades and insert the new ones
-    # or just delete the ones that are not in the passed updated_grades and update the others / insert.
-
     try:
+        course_id = updated_grades[0].course_id
+        exam_type = updated_grades[0].exam_type
+        year = updated_grades[0].year
+
         course_stats = CourseStatistics.objects(
-            course_id=updated_grades[0].course_id,
-            year=updated_grades[0].year,
-            exam_type=updated_grades[0].exam_type,
+            course_id=course_id,
+            year=year,
+            exam_type=exam_type,
         ).first()
 
         if course_stats is None:
             raise HTTPException(
                 status_code=400,
-                detail=f"There are not any grades for course: {updated_grades[0].course_id}, year: {updated_grades[0].year} and exam_type: {updated_grades[0].exam_type}",
+                detail=f"There are not any grades for course: {course_id}, year: {year} and exam_type: {exam_type}",
             )
-        grades_dist = course_stats.grades_dist
-        question_grades_dist = course_stats.question_grades_dist
 
         # check the course exists and is not finalized for the given exam type and year
-        check_course = Course.objects(course_id=updated_grades[0].course_id).first()
+        check_course = Course.objects(course_id=course_id).first()
         if check_course is None:
             raise HTTPException(
                 status_code=400,
-                detail=f"Course: {updated_grades[0].course_id} doesn't exist. Make sure your representative add the course first.",
+                detail=f"Course: {course_id} doesn't exist. Make sure your representative add the course first.",
             )
 
         # you can make a call to this endpoint after INITIAL POST GRADES
         # and you can update the grades as many times as you want
         # frontend should not allow this endpoint to be called after FINAL POST GRADES
 
+        # all the saved grades of the exam period, keyed by student
+        saved_grades = {
+            grade["student_id"]: grade
+            for grade in Grades.objects(
+                course_id=course_id, exam_type=exam_type, year=year
+            )
+            .only("id", "student_id", "grade", "question_grades")
+            .as_pymongo()
+        }
+        registered_students = set(check_course.current_registered_students)
+
+        requests: list = []
+        stats = StatsDelta()
+        inserted_ids: list[ObjectId] = []
+        deleted_ids: list[ObjectId] = []
         total_updated_grades = 0
-        for grade in updated_grades:
-            curr_grade_obj = Grades.objects(
-                student_id=grade.student_id,
-                course_id=grade.course_id,
-                exam_type=grade.exam_type,
-                year=grade.year,
-            ).first()
-
-            if curr_grade_obj:
-                # change grades
-                grades_dist[str(curr_grade_obj.grade)] -= 1
-                if grades_dist[str(curr_grade_obj.grade)] == 0:
-                    del grades_dist[str(curr_grade_obj.grade)]
-
-                curr_grade_obj.grade = grade.grade
-
-                if str(grade.grade) not in grades_dist:
-                    grades_dist[str(grade.grade)] = 1
-                else:
-                    grades_dist[str(grade.grade)] += 1
-
-                # change question grades
-                for q, question_grade in enumerate(curr_grade_obj.question_grades):
-                    question_grades_dist[q][str(question_grade)] -= 1
-                    if question_grades_dist[q][str(question_grade)] == 0:
-                        del question_grades_dist[q][str(question_grade)]
+        total_inserted_grades = 0
 
-                curr_grade_obj.question_grades = grade.question_grades
+        uploaded_students = set()
+        for grade in updated_grades:
+            if (grade.course_id, grade.exam_type, grade.year) != (
+                course_id,
+                exam_type,
+                year,
+            ):
+                continue  # not a grade of this exam period, counted as failed
 
-                for q, question_grade in enumerate(grade.question_grades):
-                    if str(question_grade) not in question_grades_dist[q]:
-                        question_grades_dist[q][str(question_grade)] = 1
-                    else:
-                        question_grades_dist[q][str(question_grade)] += 1
+            uploaded_students.add(grade.student_id)
+            curr_grade = saved_grades.get(grade.student_id)
 
-                curr_grade_obj.save()
+            if curr_grade is not None:
                 total_updated_grades += 1
-
-        course_stats.update(
-            grades_dist=grades_dist, question_grades_dist=question_grades_dist
+                if (
+                    curr_grade["grade"] == grade.grade
+                    and curr_grade["question_grades"] == grade.question_grades
+                ):
+                    continue  # nothing changed
+
+                stats.count(curr_grade["grade"], curr_grade["question_grades"], -1)
+                stats.count(grade.grade, grade.question_grades, 1)
+                requests.append(
+                    UpdateOne(
+                        {"_id": curr_grade["_id"]},
+                        {
+                            "$set": {
+                                "grade": grade.grade,
+                                "question_grades": grade.question_grades,
+                            }
+                        },
+                    )
+                )
+                # a duplicate row in the upload is diffed against this one
+                saved_grades[grade.student_id] = {
+                    **curr_grade,
+                    "grade": grade.grade,
+                    "question_grades": grade.question_grades,
+                }
+
+            elif replace and grade.student_id in registered_students:
+                new_grade = Grades(
+                    id=ObjectId(),
+                    student_id=grade.student_id,
+                    name=grade.name,
+                    course_id=grade.course_id,
+                    exam_type=grade.exam_type,
+                    year=grade.year,
+                    grade=grade.grade,
+                    question_grades=grade.question_grades,
+                    grade_weights=grade.grade_weights,
+                )
+                stats.count(grade.grade, grade.question_grades, 1)
+                requests.append(InsertOne(new_grade.to_mongo()))
+                inserted_ids.append(new_grade.id)
+                saved_grades[grade.student_id] = new_grade.to_mongo().to_dict()
+                total_inserted_grades += 1
+
+        if replace:
+            for student_id, curr_grade in saved_grades.items():
+                if student_id not in uploaded_students:
+                    stats.count(curr_grade["grade"], curr_grade["question_grades"], -1)
+                    requests.append(DeleteOne({"_id": curr_grade["_id"]}))
+                    deleted_ids.append(curr_grade["_id"])
+
+        if requests:
+            Grades._get_collection().bulk_write(requests, ordered=False)
+
+        # one atomic $inc of the distribution deltas
+        stats.apply(course_stats)
+
+        # keep the grade references of the course in sync
+        if deleted_ids:
+            Course.objects(id=check_course.id).update_one(pull_all__grades=deleted_ids)
+        # mark the course as finalized for the given exam type and year
+        Course.objects(id=check_course.id).update_one(
+            push_all__grades=inserted_ids,
+            inc__version=1,
+            **{f"set__finalized__{exam_type}-{year}": True},
         )
+        stats_cache.invalidate(course_id, exam_type, year)
 
-        check_course.finalized[
-            f"{updated_grades[0].exam_type}-{updated_grades[0].year}"
-        ] = True  # mark the course as finalized for the given exam type and year
-        check_course.save()
+        description = f"Updated {total_updated_grades} grades. Failed to update {len(updated_grades) - total_updated_grades - total_inserted_grades}"
+        if replace:
+            description += f". Inserted {total_inserted_grades} and deleted {len(deleted_ids)} grades"
 
         return JSONResponse(
             status_code=HTTP_200_OK,
-            content={
-                "description": f"Updated {total_updated_grades} grades. Failed to update {len(updated_grades) - total_updated_grades}"
-            },
+            content={"description": description},
         )
 
     except HTTPException as http_exc:
@@ -359,8 +477,17 @@ async def update_grades(updated_grades: list[GradesModel]) -> JSONResponse:
 
 @router.delete("/delete_grades", response_description="Grades deleted successfully")  # type: ignore
 async def delete_grades(to_delete_grades: list[GradesModelOps]) -> JSONResponse:
+    """
+    Deletes the passed grades. The course statistics of their exam periods
+    are adjusted with a $inc of the removed grades.
+
+    :param to_delete_grades: The (student, course, exam type, year) of the grades to be deleted
+    :type to_delete_grades: List[BaseModel](see models.py)
+    """
     try:
         total_deleted_grades = 0
+        # (course_id, exam_type, year) -> changes to its statistics
+        stats: dict = {}
         for grade in to_delete_grades:
             curr_grade_obj = Grades.objects(
                 student_id=grade.student_id,
@@ -372,6 +499,18 @@ async def delete_grades(to_delete_grades: list[GradesModelOps]) -> JSONResponse:
             if curr_grade_obj:
                 curr_grade_obj.delete()
                 total_deleted_grades += 1
+                stats.setdefault(
+                    (grade.course_id, grade.exam_type, grade.year), StatsDelta()
+                ).count(curr_grade_obj.grade, curr_grade_obj.question_grades, -1)
+
+        for (course_id, exam_type, year), delta in stats.items():
+            course_stats = CourseStatistics.objects(
+                course_id=course_id, exam_type=exam_type, year=year
+            ).first()
+            if course_stats is not None:
+                delta.apply(course_stats)
+            Course.objects(course_id=course_id).update_one(inc__version=1)
+            stats_cache.invalidate(course_id, exam_type, year)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -0,0 +1,357 @@
+from datetime import datetime
+from statistics.statistics.database.cache import stats_cache
+from statistics.statistics.models.models import (
+    Course,
+    CourseStatistics,
+    Grades,
+    GradesModel,
+    IngestionJob,
+)
+from statistics.statistics.routes.course_stats import StatsDelta, summarize
+from typing import Optional, Tuple
+from uuid import uuid4
+
+from bson import ObjectId
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, status
+from fastapi.responses import JSONResponse
+from mongoengine import NotUniqueError
+from starlette.status import HTTP_200_OK
+
+router = APIRouter()
+
+
+def ingest_grades(
+    passed_grades: list[GradesModel], grade_ids: Optional[list[ObjectId]] = None
+) -> None:
+    """
+    Validates and writes an INITIAL POST GRADES upload (see add_grades).
+    The grades are written first, then the course statistics and last the course
+    itself. A standalone MongoDB has no multi-document transactions, so if a step
+    fails the previous ones are undone with rollback_grades.
+
+    :param passed_grades: A list of grades
+    :type passed_grades: List[BaseModel](see models.py)
+    :param grade_ids: The ids to insert the grades with (one per grade)
+    :type grade_ids: Optional[list[ObjectId]]
+    """
+    # one distribution per question of the exam
+    stats = StatsDelta()
+    stats.question(len(passed_grades[0].question_grades) - 1)
+
+    # check the course exists and is not finalized for the given exam type and year
+    check_course = Course.objects(course_id=passed_grades[0].course_id).first()
+    if check_course is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Course: {passed_grades[0].course_id} doesn't exist. Make sure your representative add the course first.",
+        )
+    if (
+        f"{passed_grades[0].exam_type}-{passed_grades[0].year}"
+        in check_course.finalized
+    ):
+        if check_course.finalized[
+            f"{passed_grades[0].exam_type}-{passed_grades[0].year}"
+        ]:  # check_course.finalized[{examp_type}-{year}] == True
+            # this means that the course has been finalized for the given exam type and year
+            # final grades have been posted
+            # and we should neither add / post them again, nor update them
+            raise HTTPException(
+                status_code=400,
+                detail=f"Final grades already posted for course: {passed_grades[0].course_id}, exam type: {passed_grades[0].exam_type} and year: {passed_grades[0].year}. You cannot add grades anymore.",
+            )
+        else:  # check_course.finalized[{examp_type}-{year}] == False
+            # this means that the initial grades have been posted
+            # and we should not post them again, but update them instead
+            raise HTTPException(
+                status_code=400,
+                detail=f"Initial grades already posted for: {passed_grades[0].course_id}, exam type: {passed_grades[0].exam_type} and year: {passed_grades[0].year}. You should use the update_grades endpoint.",
+            )
+
+    # validate the whole upload before writing anything:
+    # enrollment against a set built once, duplicates with a single $in query
+    registered_students = set(check_course.current_registered_students)
+    existing_grades = set(
+        Grades.objects(
+            student_id__in=[grade.student_id for grade in passed_grades]
+        ).scalar("student_id", "course_id", "exam_type", "year")
+    )
+
+    if grade_ids is None:
+        grade_ids = [ObjectId() for _ in passed_grades]
+
+    new_grades = []
+    for grade, grade_id in zip(passed_grades, grade_ids):
+
+        if grade.student_id not in registered_students:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Student {grade.student_id} doesn't exist in this course",
+            )
+
+        grade_key = (grade.student_id, grade.course_id, grade.exam_type, grade.year)
+        if grade_key in existing_grades:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tried to post already existing grades: [{grade.student_id}, {grade.course_id}, {grade.exam_type}, {grade.year}]",
+            )
+        existing_grades.add(grade_key)
+
+        new_grades.append(
+            Grades(
+                id=grade_id,
+                student_id=grade.student_id,
+                name=grade.name,
+                course_id=grade.course_id,
+                exam_type=grade.exam_type,
+                year=grade.year,
+                grade=grade.grade,
+                question_grades=grade.question_grades,
+                grade_weights=grade.grade_weights,
+            )
+        )
+
+        # compute course statistics
+        stats.count(grade.grade, grade.question_grades, 1)
+
+    stats_saved = False
+    try:
+        # one insert_many for the grades
+        Grades.objects.insert(new_grades, load_bulk=False)
+
+        # save the course statistics
+        grades_dist, question_grades_dist = stats.dists()
+        course_stats = CourseStatistics(
+            course_id=passed_grades[0].course_id,
+            exam_type=passed_grades[0].exam_type,
+            year=passed_grades[0].year,
+            grades_dist=grades_dist,
+            question_grades_dist=question_grades_dist,
+            question_total_sums=stats.question_total_sums,
+            summary={
+                **summarize(
+                    grades_dist, question_grades_dist, stats.question_total_sums
+                ),
+                "version": 0,
+            },
+        )
+        course_stats.save()
+        stats_saved = True
+
+        # one $push $each of the grade references, which also
+        # marks the course as not finalized for the given exam type and year (INITIAL POST GRADES)
+        # this is the last write: once it succeeds the upload is complete
+        Course.objects(id=check_course.id).update_one(
+            push_all__grades=new_grades,
+            inc__version=1,
+            **{
+                f"set__finalized__{passed_grades[0].exam_type}-{passed_grades[0].year}": False
+            },
+        )
+        stats_cache.invalidate(
+            passed_grades[0].course_id,
+            passed_grades[0].exam_type,
+            passed_grades[0].year,
+        )
+    except Exception:
+        rollback_grades(
+            grade_ids,
+            passed_grades[0].course_id,
+            passed_grades[0].exam_type,
+            passed_grades[0].year,
+            delete_stats=stats_saved,
+        )
+        raise
+
+
+def rollback_grades(
+    grade_ids: list[ObjectId],
+    course_id: str,
+    exam_type: str,
+    year: int,
+    delete_stats: bool = True,
+) -> None:
+    """
+    Undoes a partially applied ingest_grades, i.e. one that did not reach the
+    final course update. Safe to call more than once.
+    """
+    Grades.objects(id__in=grade_ids).delete()
+    if delete_stats:
+        CourseStatistics.objects(
+            course_id=course_id, exam_type=exam_type, year=year
+        ).delete()
+        stats_cache.invalidate(course_id, exam_type, year)
+
+
+def job_content(job: IngestionJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "idempotency_key": job.idempotency_key,
+        "status": job.status,
+        "course_id": job.course_id,
+        "exam_type": job.exam_type,
+        "year": job.year,
+        "num_grades": job.num_grades,
+        "description": job.description,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+
+def create_ingestion_job(
+    passed_grades: list[GradesModel], idempotency_key: Optional[str] = None
+) -> Tuple[IngestionJob, bool]:
+    """
+    Stages an upload as a pending ingestion job.
+    If a job with the same idempotency key exists, that one is returned instead.
+
+    :return: the job and whether it was created by this call
+    """
+    if idempotency_key is not None:
+        job = IngestionJob.objects(idempotency_key=idempotency_key).first()
+        if job is not None:
+            return job, False
+
+    now = datetime.now()
+    job = IngestionJob(
+        job_id=uuid4().hex,
+        idempotency_key=idempotency_key,
+        status="pending",
+        course_id=passed_grades[0].course_id,
+        exam_type=passed_grades[0].exam_type,
+        year=passed_grades[0].year,
+        num_grades=len(passed_grades),
+        grades=[grade.dict() for grade in passed_grades],
+        grade_ids=[ObjectId() for _ in passed_grades],
+        created_at=now,
+        updated_at=now,
+    )
+    try:
+        job.save()
+    except NotUniqueError:
+        # a concurrent request with the same key won the race
+        return IngestionJob.objects(idempotency_key=idempotency_key).first(), False
+
+    return job, True
+
+
+def run_ingestion_job(job_id: str) -> None:
+    """
+    Processes a staged ingestion job. A job left "running" (e.g. the service
+    restarted half-way) is resumed: if the upload did not complete, its partial
+    writes are rolled back and it is processed again.
+    """
+    job = IngestionJob.objects(job_id=job_id).first()
+    if job is None or job.status in ["succeeded", "failed"]:
+        return
+
+    if job.status == "running":
+        course = Course.objects(course_id=job.course_id).first()
+        if course is not None and f"{job.exam_type}-{job.year}" in course.finalized:
+            # the final course update went through before the interruption
+            job.update(
+                set__status="succeeded",
+                set__description="Grades added successfully",
+                unset__grades=True,
+                set__updated_at=datetime.now(),
+            )
+            return
+        rollback_grades(job.grade_ids, job.course_id, job.exam_type, job.year)
+
+    job.update(set__status="running", set__updated_at=datetime.now())
+    try:
+        ingest_grades(
+            [GradesModel(**grade) for grade in job.grades], grade_ids=job.grade_ids
+        )
+    except Exception as e:
+        job.update(
+            set__status="failed",
+            set__error=str(e),
+            unset__grades=True,
+            set__updated_at=datetime.now(),
+        )
+        return
+
+    job.update(
+        set__status="succeeded",
+        set__description="Grades added successfully",
+        unset__grades=True,
+        set__updated_at=datetime.now(),
+    )
+
+
+def resume_ingestion_jobs() -> None:
+    # pick up the jobs that were accepted or running when the service stopped,
+    # grades__exists matches the partial index of the unfinished jobs
+    for job_id in IngestionJob.objects(
+        status__in=["pending", "running"], grades__exists=True
+    ).scalar("job_id"):
+        run_ingestion_job(job_id)
+
+
+@router.post(
+    "/ingestion_jobs",
+    response_description="Ingestion job accepted",
+    status_code=status.HTTP_202_ACCEPTED,
+)  # type: ignore
+async def submit_ingestion_job(
+    passed_grades: list[GradesModel],
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None),
+) -> JSONResponse:
+    """
+    Accepts an INITIAL POST GRADES upload (same payload as add_grades) and processes
+    it in the background. Poll get_ingestion_job with the returned job id for the outcome.
+    Retrying with the same Idempotency-Key header returns the existing job.
+
+    :param passed_grades: A list of grades
+    :type passed_grades: List[BaseModel](see models.py)
+    :param idempotency_key: Optional key identifying the upload
+    :type idempotency_key: Optional[str]
+    """
+    try:
+        job, created = create_ingestion_job(passed_grades, idempotency_key)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not created:
+        return JSONResponse(
+            status_code=HTTP_200_OK,
+            content={
+                "description": "Ingestion job already submitted",
+                "job": job_content(job),
+            },
+        )
+
+    background_tasks.add_task(run_ingestion_job, job.job_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"description": "Ingestion job accepted", "job": job_content(job)},
+    )
+
+
+@router.get(
+    "/ingestion_jobs/{job_id}",
+    response_description="Ingestion job extracted successfully",
+)  # type: ignore
+async def get_ingestion_job(job_id: str) -> JSONResponse:
+    """
+    Returns the status of an ingestion job: pending, running, succeeded or failed.
+    A failed job carries the same error add_grades would have returned.
+
+    :param job_id: The job id returned by submit_ingestion_job
+    :type job_id: str
+    """
+    job = IngestionJob.objects(job_id=job_id).first()
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"Ingestion job: {job_id} doesn't exist"
+        )
+
+    return JSONResponse(
+        status_code=HTTP_200_OK,
+        content={
+            "description": "Ingestion job extracted successfully",
+            "job": job_content(job),
+        },
+    )
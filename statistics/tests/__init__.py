@@ -0,0 +1,13 @@
+from typing import Any
+
+import mongomock.collection
+
+# pymongo's UpdateOne passes a sort to bulk_write, which mongomock does not take
+mongomock_add_update: Any = mongomock.collection.BulkOperationBuilder.add_update
+
+
+def add_update(self: Any, *args: Any, sort: Any = None, **kwargs: Any) -> Any:
+    return mongomock_add_update(self, *args, **kwargs)
+
+
+setattr(mongomock.collection.BulkOperationBuilder, "add_update", add_update)
@@ -0,0 +1,142 @@
+import unittest
+from statistics.statistics.app import app
+from statistics.statistics.models.models import Grades
+
+import mongomock
+from fastapi.testclient import TestClient
+from mongoengine import connect, disconnect
+
+client = TestClient(app)
+
+
+def course(course_id: str, institution: str) -> dict:
+    return {
+        "course_id": course_id,
+        "institution": institution,
+        "instructors": ["I213213"],
+        "name": course_id,
+        "semester": 1,
+        "ects": 6,
+        "current_registered_students": ["0000001", "0000002"],
+        "grades": [],
+        "finalized": {},
+    }
+
+
+def grades(course_id: str, year: int, values: list[float]) -> list[dict]:
+    return [
+        {
+            "student_id": student_id,
+            "name": "aaa",
+            "course_id": course_id,
+            "exam_type": "Winter",
+            "year": year,
+            "grade": grade,
+            "question_grades": [grade],
+            "grade_weights": [1.0],
+        }
+        for student_id, grade in zip(["0000001", "0000002"], values)
+    ]
+
+
+class Analytics(unittest.TestCase):
+    def setUp(self) -> None:
+        disconnect()
+        connect(
+            "mongoenginetest",
+            host="mongodb://localhost",
+            mongo_client_class=mongomock.MongoClient,
+        )
+        for course_id, institution in [
+            ("NTU_CS101", "NTU"),
+            ("NTU_CS102", "NTU"),
+            ("AUTH_CS101", "AUTH"),
+        ]:
+            response = client.post(
+                "/courses/add_course", json=course(course_id, institution)
+            )
+            self.assertEqual(response.status_code, 200)
+
+        for course_id, year, values in [
+            ("NTU_CS101", 2022, [4.0, 6.0]),
+            ("NTU_CS101", 2023, [7.0, 9.0]),
+            ("NTU_CS102", 2023, [10.0, 2.5]),
+            ("AUTH_CS101", 2023, [5.0, 5.0]),
+        ]:
+            response = client.post(
+                "/grades/add_grades", json=grades(course_id, year, values)
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def tearDown(self) -> None:
+        disconnect()
+
+    def test_time_series(self) -> None:
+        response = client.get(
+            "/analytics/time_series?course_ids=NTU_CS101&from_year=2020"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["series"],
+            [
+                {
+                    "course_id": "NTU_CS101",
+                    "year": 2022,
+                    "exam_type": "Winter",
+                    "count": 2,
+                    "mean": 5.0,
+                    "min": 4.0,
+                    "max": 6.0,
+                    "pass_rate": 0.5,
+                },
+                {
+                    "course_id": "NTU_CS101",
+                    "year": 2023,
+                    "exam_type": "Winter",
+                    "count": 2,
+                    "mean": 8.0,
+                    "min": 7.0,
+                    "max": 9.0,
+                    "pass_rate": 1.0,
+                },
+            ],
+        )
+
+        # all the courses of an institution, one point per year
+        response = client.get(
+            "/analytics/time_series?institution=NTU&from_year=2023&by_exam_type=false"
+        )
+        self.assertEqual(
+            [
+                (point["course_id"], point["year"])
+                for point in response.json()["series"]
+            ],
+            [("NTU_CS101", 2023), ("NTU_CS102", 2023)],
+        )
+
+    def test_comparison(self) -> None:
+        response = client.get("/analytics/comparison?institution=NTU")
+        self.assertEqual(response.status_code, 200)
+        courses = response.json()["courses"]
+        self.assertEqual([c["course_id"] for c in courses], ["NTU_CS101", "NTU_CS102"])
+        self.assertEqual(courses[0]["count"], 4)
+        self.assertEqual(courses[0]["pass_rate"], 0.75)
+
+        distribution = response.json()["distribution"]
+        self.assertEqual(len(distribution), 11)
+        self.assertEqual(
+            {b["grade_from"]: b["count"] for b in distribution if b["count"]},
+            {2: 1, 4: 1, 6: 1, 7: 1, 9: 1, 10: 1},
+        )
+
+    def test_comparison_out_of_range(self) -> None:
+        Grades.objects(course_id="NTU_CS102", grade=10.0).update_one(set__grade=12.5)
+
+        response = client.get("/analytics/comparison?institution=NTU")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["out_of_range"], 1)
+        self.assertEqual(sum(b["count"] for b in response.json()["distribution"]), 5)
+
+    def test_no_courses(self) -> None:
+        response = client.get("/analytics/comparison")
+        self.assertEqual(response.status_code, 400)
@@ -1,5 +1,9 @@
 import unittest
+from unittest import mock
 from statistics.statistics.app import app
+from statistics.statistics.database.cache import LocalBackend, StatsCache, stats_cache
+from statistics.statistics.models.models import CourseStatistics, Grades
+from statistics.statistics.routes.course_stats import StatsDelta
 
 import mongomock
 from fastapi.testclient import TestClient
@@ -17,6 +21,7 @@ class GetCourseStats(unittest.TestCase):
             host="mongodb://localhost",
             mongo_client_class=mongomock.MongoClient,
         )
+        stats_cache.clear()
 
     def tearDown(self) -> None:
         disconnect()
@@ -107,6 +112,17 @@ class GetCourseStats(unittest.TestCase):
         self.assertEqual(question_grades_dist[0]["9.0"], 3)
         self.assertEqual(question_grades_dist[0]["10.0"], 1)
 
+        # grades 6.0, 9.0, 9.0 and 9.5
+        summary = response["summary"]
+        self.assertEqual(summary["count"], 4)
+        self.assertAlmostEqual(summary["mean"], 8.375)
+        self.assertAlmostEqual(summary["variance"], 1.921875)
+        self.assertAlmostEqual(summary["median"], 9.0)
+        self.assertAlmostEqual(summary["quantiles"]["p25"], 8.25)
+        self.assertAlmostEqual(summary["pass_rate"], 1.0)
+        self.assertAlmostEqual(summary["questions"][0]["mean"], 9.25)
+        self.assertAlmostEqual(summary["questions"][1]["correlation"], 0.9891, places=4)
+
         updated_grades = [
             {
                 "student_id": "0000002",
@@ -169,3 +185,187 @@ class GetCourseStats(unittest.TestCase):
         self.assertEqual(question_grades_dist[3]["4.2"], 1)
         self.assertEqual(question_grades_dist[3]["4.0"], 1)
         self.assertEqual(question_grades_dist[3]["9.0"], 2)
+
+        # the summary follows the update: grades 5.0, 7.0, 8.5 and 9.0
+        summary = response["summary"]
+        self.assertAlmostEqual(summary["mean"], 7.375)
+        self.assertAlmostEqual(summary["median"], 7.75)
+        self.assertAlmostEqual(summary["pass_rate"], 1.0)
+        self.assertEqual(
+            CourseStatistics.objects().first().summary["version"],
+            CourseStatistics.objects().first().version,
+        )
+
+    def test_reconcile_course_stats(self) -> None:
+        course = {
+            "course_id": "NTU_CS101",
+            "institution": "National Technical University of Athens",
+            "instructors": ["I213213"],
+            "name": "Introduction to Computer Science",
+            "semester": 3,
+            "ects": 6,
+            "current_registered_students": ["0000001", "0000002"],
+            "grades": [],
+            "finalized": {},
+        }
+        response = client.post("/courses/add_course", json=course)
+        self.assertEqual(response.status_code, 200)
+
+        grades = [
+            {
+                "student_id": student_id,
+                "name": "aaa",
+                "course_id": "NTU_CS101",
+                "exam_type": "Winter",
+                "year": 2024,
+                "grade": grade,
+                "question_grades": [grade, 5.0],
+                "grade_weights": [1.0, 1.0],
+            }
+            for student_id, grade in [("0000001", 6.0), ("0000002", 9.5)]
+        ]
+        response = client.post("/grades/add_grades", json=grades)
+        self.assertEqual(response.status_code, 200)
+
+        # nothing to fix
+        response = client.post("/course_stats/reconcile_course_stats")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["reconciled"], [])
+
+        # a grade changed without going through the statistics
+        Grades.objects(student_id="0000001").update_one(
+            set__grade=7.0, set__question_grades=[7.0, 5.0]
+        )
+        CourseStatistics.objects(course_id="NTU_CS101").update_one(
+            set__grades_dist={"6_0": 1, "9_5": 1, "1_0": 0}
+        )
+
+        response = client.post(
+            "/course_stats/reconcile_course_stats?course_id=NTU_CS101"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["reconciled"],
+            [{"course_id": "NTU_CS101", "exam_type": "Winter", "year": 2024}],
+        )
+
+        response = client.get(
+            "/course_stats/get_course_stats?course_id=NTU_CS101&exam_year=2024&exam_type=Winter"
+        )
+        self.assertEqual(response.json()["grades_dist"], {"7.0": 1, "9.5": 1})
+        self.assertEqual(
+            response.json()["question_grades_dist"],
+            [{"7.0": 1, "9.5": 1}, {"5.0": 2}],
+        )
+
+    def test_stats_delta_sums_only(self) -> None:
+        course_stats = CourseStatistics(
+            course_id="NTU_CS101",
+            exam_type="Winter",
+            year=2024,
+            grades_dist={"6_0": 1, "8_0": 1},
+            question_grades_dist=[{"6_0": 1, "8_0": 1}],
+            question_total_sums={"0": 6.0 * 6.0 + 8.0 * 8.0},
+        ).save()
+
+        # the two students swap their question grades, the histograms stay the same
+        delta = StatsDelta()
+        delta.count(6.0, [6.0], -1)
+        delta.count(8.0, [8.0], -1)
+        delta.count(6.0, [8.0], 1)
+        delta.count(8.0, [6.0], 1)
+        delta.apply(course_stats)
+
+        course_stats.reload()
+        self.assertAlmostEqual(course_stats.question_total_sums["0"], 2 * 6.0 * 8.0)
+        self.assertEqual(course_stats.version, 1)
+
+    def test_course_stats_cache(self) -> None:
+        course = {
+            "course_id": "NTU_CS101",
+            "institution": "National Technical University of Athens",
+            "instructors": ["I213213"],
+            "name": "Introduction to Computer Science",
+            "semester": 3,
+            "ects": 6,
+            "current_registered_students": ["0000001"],
+            "grades": [],
+            "finalized": {},
+        }
+        response = client.post("/courses/add_course", json=course)
+        self.assertEqual(response.status_code, 200)
+
+        grades = [
+            {
+                "student_id": "0000001",
+                "name": "aaa",
+                "course_id": "NTU_CS101",
+                "exam_type": "Winter",
+                "year": 2024,
+                "grade": 6.0,
+                "question_grades": [6.0],
+                "grade_weights": [1.0],
+            }
+        ]
+        response = client.post("/grades/add_grades", json=grades)
+        self.assertEqual(response.status_code, 200)
+
+        url = "/course_stats/get_course_stats?course_id=NTU_CS101&exam_year=2024&exam_type=Winter"
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+
+        # served from the cache, validated with the ETag
+        CourseStatistics.objects(course_id="NTU_CS101").update_one(
+            set__grades_dist={"1_0": 1}
+        )
+        response = client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        # the final upload invalidates the period
+        response = client.put(
+            "/grades/update_grades", json=[{**grades[0], "grade": 8.0}]
+        )
+        self.assertEqual(response.status_code, 200)
+        response = client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json()["grades_dist"], {"1.0": 1, "8.0": 1})
+
+        # the period is finalized, so it is cached without expiry
+        key = StatsCache.key("NTU_CS101", "Winter", 2024)
+        self.assertIsNone(stats_cache.local.entries[key][1])
+
+    def test_shared_cache(self) -> None:
+        shared = LocalBackend()
+        replica_1, replica_2 = StatsCache(shared), StatsCache(shared)
+        entry = {"content": {"grades_dist": {"6.0": 1}}, "etag": '"1"'}
+
+        replica_1.set("NTU_CS101", "Winter", 2024, entry, True, generation=0)
+        self.assertEqual(replica_2.get("NTU_CS101", "Winter", 2024), entry)
+
+        # a response read before an invalidation is not cached
+        generation = replica_1.generation("NTU_CS101", "Winter", 2024)
+        replica_1.invalidate("NTU_CS101", "Winter", 2024)
+        replica_1.set("NTU_CS101", "Winter", 2024, entry, True, generation)
+        self.assertIsNone(shared.get(StatsCache.key("NTU_CS101", "Winter", 2024)))
+        self.assertIsNone(replica_1.get("NTU_CS101", "Winter", 2024))
+
+    def test_generations_bounded(self) -> None:
+        cache = StatsCache()
+        entry = {"content": {"grades_dist": {"6.0": 1}}, "etag": '"1"'}
+
+        generation = cache.generation("NTU_CS101", "Winter", 2024)
+        with mock.patch("statistics.statistics.database.cache.STATS_CACHE_SIZE", 2):
+            for year in (2024, 2025, 2026):
+                cache.invalidate("NTU_CS101", "Winter", year)
+        self.assertEqual(len(cache.generations), 2)
+
+        # the invalidation is not forgotten with its generation
+        cache.set("NTU_CS101", "Winter", 2024, entry, True, generation)
+        self.assertIsNone(cache.get("NTU_CS101", "Winter", 2024))
+
+        generation = cache.generation("NTU_CS101", "Winter", 2024)
+        cache.set("NTU_CS101", "Winter", 2024, entry, True, generation)
+        self.assertEqual(cache.get("NTU_CS101", "Winter", 2024), entry)
@@ -271,6 +271,13 @@ class GetGradesStatus(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("grades_status", response.json())
         self.assertEqual(response.json()["grades_status"], "UNKNOWN")
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "/courses/status_of_grades/course_id=NTU_CS101&exam_type=Winter&exam_year=2024",
+            headers={"If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 304)
 
         # INTITIAL POST GRADES - just initialize the course grades
         response = client.get(
@@ -285,6 +292,7 @@ class GetGradesStatus(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("grades_status", response.json())
         self.assertEqual(response.json()["grades_status"], "INITIAL")
+        self.assertNotEqual(response.headers["ETag"], etag)
 
         # FINAL POST GRADES - just finalize the course
         response = client.get(
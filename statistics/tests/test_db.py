@@ -0,0 +1,61 @@
+import unittest
+from statistics.statistics.database.db import create_indexes
+from statistics.statistics.database.explain import plan_stages, winning_plan
+from statistics.statistics.models.models import Grades, IngestionJob
+
+import mongomock
+from mongoengine import connect, disconnect
+
+
+class Indexes(unittest.TestCase):
+    def setUp(self) -> None:
+        disconnect()
+        connect(
+            "mongoenginetest",
+            host="mongodb://localhost",
+            mongo_client_class=mongomock.MongoClient,
+        )
+
+    def tearDown(self) -> None:
+        disconnect()
+
+    def test_create_indexes(self) -> None:
+        create_indexes(unique=True)
+        indexes = Grades._get_collection().index_information()
+        self.assertIn("student_id_1_course_id_1_exam_type_1_year_1", indexes)
+        self.assertNotIn("student_id_1_year_1_exam_type_1", indexes)
+
+        create_indexes(unique=False)
+        indexes = Grades._get_collection().index_information()
+        self.assertIn("student_id_1_year_1_exam_type_1", indexes)
+        self.assertIn("status_1", IngestionJob._get_collection().index_information())
+
+        # a second build (e.g. a restart) leaves the indexes as they are
+        create_indexes(unique=False)
+        self.assertEqual(
+            Grades._get_collection().index_information().keys(), indexes.keys()
+        )
+
+    def test_plan_stages(self) -> None:
+        explained = {
+            "stages": [
+                {
+                    "$cursor": {
+                        "queryPlanner": {
+                            "winningPlan": {
+                                "stage": "FETCH",
+                                "inputStage": {
+                                    "stage": "IXSCAN",
+                                    "indexName": "course_id_1_exam_type_1_year_1",
+                                },
+                            },
+                            "rejectedPlans": [{"stage": "COLLSCAN"}],
+                        }
+                    }
+                }
+            ]
+        }
+        self.assertEqual(
+            plan_stages(winning_plan(explained)),
+            (["FETCH", "IXSCAN"], ["course_id_1_exam_type_1_year_1"]),
+        )
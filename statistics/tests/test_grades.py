@@ -1,6 +1,12 @@
+import json
 import unittest
 from statistics.statistics.app import app
-from statistics.statistics.models.models import Course, Grades
+from statistics.statistics.models.models import (
+    Course,
+    CourseStatistics,
+    Grades,
+    decode_dist,
+)
 
 import mongomock
 from fastapi.testclient import TestClient
@@ -76,6 +82,21 @@ class AddGrades(unittest.TestCase):
         self.assertEqual(saved_grades.student_id, "0000002")
         self.assertEqual(saved_grades.course_id, "NTU_CS101")
 
+        saved_course = Course.objects(course_id="NTU_CS101").first()
+        self.assertEqual(
+            [grade.student_id for grade in saved_course.grades],
+            ["0000002", "0000001", "0000003"],
+        )
+        self.assertEqual(saved_course.finalized, {"Winter-2024": False})
+
+        course_stats = CourseStatistics.objects(course_id="NTU_CS101").first()
+        self.assertEqual(
+            decode_dist(course_stats.grades_dist), {"6.0": 1, "9.5": 1, "9.0": 1}
+        )
+        self.assertEqual(
+            decode_dist(course_stats.question_grades_dist[0]), {"9.0": 2, "10.0": 1}
+        )
+
     def test_add_grades_duplicate_error(self) -> None:
         course = {
             "course_id": "NTU_CS101",
@@ -130,6 +151,9 @@ class AddGrades(unittest.TestCase):
             response.json()["detail"],
             "400: Tried to post already existing grades: [0000001, NTU_CS101, Winter, 2024]",
         )
+        # the upload is validated before anything is written
+        self.assertEqual(Grades.objects.count(), 0)
+        self.assertEqual(len(Course.objects(course_id="NTU_CS101").first().grades), 0)
 
     def test_add_grades_non_existing_student_error(self) -> None:
         course = {
@@ -285,6 +309,19 @@ class GetStudentGrades(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()["grades"], [grades[1], grades[0]])
 
+        response = client.get(
+            "/grades/get_student_grades",
+            params=params,
+            headers={"If-None-Match": response.headers["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # a single page keeps the requested order
+        params["student_ids"] = ["0000002", "0000001"]
+        response = client.get("/grades/get_student_grades", params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["grades"], [grades[0], grades[1]])
+
         params = {
             "student_ids": ["0000001", "0000003"],
             "years": [2025],
@@ -294,6 +331,31 @@ class GetStudentGrades(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.json()["grades"]), 0)
 
+        # pages of one grade
+        params = {"student_ids": ["0000003", "0000001", "0000002"], "limit": 1}
+        returned_grades = []
+        while True:
+            response = client.get("/grades/get_student_grades", params=params)
+            self.assertEqual(response.status_code, 200)
+            returned_grades += response.json()["grades"]
+            if response.json()["next_cursor"] is None:
+                break
+            params["cursor"] = response.json()["next_cursor"]
+        self.assertEqual(returned_grades, [grades[1], grades[0], grades[2]])
+
+        # streamed as ndjson
+        params = {"student_ids": ["0000002", "0000001"], "format": "ndjson"}
+        response = client.get("/grades/get_student_grades", params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [json.loads(line) for line in response.text.splitlines()],
+            [grades[1], grades[0]],
+        )
+
+        params["cursor"] = "invalid"
+        response = client.get("/grades/get_student_grades", params=params)
+        self.assertEqual(response.status_code, 422)
+
     def test_get_student_grades_error(self) -> None:
         params = {
             "student_ids": ["0000001", "0000001"],
@@ -379,6 +441,23 @@ class GetCourseGrades(unittest.TestCase):
         self.assertEqual(len(response_data["grades"]), 2)
         self.assertEqual(response_data["grades"][0]["course_id"], "NTU_CS101")
 
+        params = {"course_ids": ["NTU_CS101"], "years": [2025]}
+        response = client.get("/grades/get_course_grades", params=params)
+        self.assertEqual(len(response.json()["grades"]), 0)
+
+        # streamed as ndjson, one grade per page
+        params = {"course_ids": ["NTU_CS101"], "format": "ndjson", "limit": 1}
+        response = client.get("/grades/get_course_grades", params=params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(lines[0]["student_id"], "0000001")
+
+        params["cursor"] = lines[1]["next_cursor"]
+        response = client.get("/grades/get_course_grades", params=params)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(lines[0]["student_id"], "0000002")
+
     def test_get_course_grades_error_cases(self) -> None:
         params: dict = {"course_ids": []}
         response = client.get("/grades/get_course_grades", params=params)
@@ -504,6 +583,15 @@ class UpdateGrades(unittest.TestCase):
             [10.0, 10.0, 6.0, 7.0],
         )
 
+        response = client.get(
+            "/course_stats/get_course_stats",
+            params={"course_id": "NTU_CS101", "exam_year": 2024, "exam_type": "Winter"},
+        )
+        self.assertEqual(response.json()["grades_dist"], {"8.0": 2, "9.0": 1})
+        self.assertEqual(
+            response.json()["question_grades_dist"][0], {"10.0": 2, "9.0": 1}
+        )
+
         updated_grades = [
             {
                 "student_id": "not_existing",
@@ -518,6 +606,66 @@ class UpdateGrades(unittest.TestCase):
         response = client.put("/grades/update_grades", json=updated_grades)
         self.assertEqual(response.status_code, 400)
 
+    def test_update_replace(self) -> None:
+        course = {
+            "course_id": "NTU_CS101",
+            "institution": "Institution name",
+            "instructors": ["Instructor id 1", "Instructor id 2"],
+            "name": "Introduction to Computer Science",
+            "semester": 1,
+            "ects": 6,
+            "current_registered_students": ["0000001", "0000002", "0000003"],
+            "grades": [],
+            "finalized": {},
+        }
+        response = client.post("/courses/add_course", json=course)
+        self.assertEqual(response.status_code, 200)
+
+        def grade(student_id: str, value: float) -> dict:
+            return {
+                "student_id": student_id,
+                "name": "abc",
+                "course_id": "NTU_CS101",
+                "exam_type": "Winter",
+                "year": 2024,
+                "grade": value,
+                "question_grades": [value, value],
+                "grade_weights": [5.0, 5.0],
+            }
+
+        response = client.post(
+            "/grades/add_grades", json=[grade("0000001", 5.0), grade("0000002", 6.0)]
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # 0000001 dropped out and 0000003 was graded between the two uploads
+        response = client.put(
+            "/grades/update_grades",
+            params={"replace": True},
+            json=[grade("0000002", 7.5), grade("0000003", 9.0)],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["description"],
+            "Updated 1 grades. Failed to update 0. Inserted 1 and deleted 1 grades",
+        )
+        self.assertEqual(
+            sorted(Grades.objects.scalar("student_id")), ["0000002", "0000003"]
+        )
+
+        saved_course = Course.objects(course_id="NTU_CS101").first()
+        self.assertEqual(
+            sorted(grade.student_id for grade in saved_course.grades),
+            ["0000002", "0000003"],
+        )
+        self.assertEqual(saved_course.finalized, {"Winter-2024": True})
+
+        course_stats = CourseStatistics.objects(course_id="NTU_CS101").first()
+        self.assertEqual(decode_dist(course_stats.grades_dist), {"7.5": 1, "9.0": 1})
+        self.assertEqual(
+            decode_dist(course_stats.question_grades_dist[1]), {"7.5": 1, "9.0": 1}
+        )
+
     def test_update_error(self) -> None:
         updated_grades = [
             {
@@ -642,6 +790,11 @@ class DeleteGrades(unittest.TestCase):
             response.json()["description"], "Deleted 1 grades. Failed to delete 0"
         )
 
+        # the course statistics no longer count the deleted grade
+        course_stats = CourseStatistics.objects(course_id="NTU_CS101").first()
+        self.assertEqual(decode_dist(course_stats.grades_dist), {"9.5": 1, "9.0": 1})
+        self.assertEqual(decode_dist(course_stats.question_grades_dist[1]), {"9.0": 2})
+
     def test_delete_grades_error(self) -> None:
         grades_to_delete = [
             {
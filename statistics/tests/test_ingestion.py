@@ -0,0 +1,180 @@
+import unittest
+from datetime import datetime
+from statistics.statistics.app import app
+from statistics.statistics.database.db import build_indexes, create_indexes
+from statistics.statistics.models.models import (
+    Course,
+    CourseStatistics,
+    Grades,
+    GradesModel,
+    IngestionJob,
+    decode_dist,
+)
+from statistics.statistics.routes.ingestion import (
+    create_ingestion_job,
+    run_ingestion_job,
+)
+from typing import Optional
+
+import mongomock
+from fastapi.testclient import TestClient
+from mongoengine import NotUniqueError, connect, disconnect
+
+client = TestClient(app)
+
+course = {
+    "course_id": "NTU_CS101",
+    "institution": "Institution name",
+    "instructors": ["Instructor id 1", "Instructor id 2"],
+    "name": "Introduction to Computer Science",
+    "semester": 1,
+    "ects": 6,
+    "current_registered_students": ["0000001", "0000002", "0000003"],
+    "grades": [],
+    "finalized": {},
+}
+
+grades = [
+    {
+        "student_id": student_id,
+        "name": "abc",
+        "course_id": "NTU_CS101",
+        "exam_type": "Winter",
+        "year": 2024,
+        "grade": grade,
+        "question_grades": [grade, grade],
+        "grade_weights": [5.0, 5.0],
+    }
+    for student_id, grade in [("0000001", 6.0), ("0000002", 9.5), ("0000003", 6.0)]
+]
+
+
+class IngestionJobs(unittest.TestCase):
+    def setUp(self) -> None:
+        disconnect()
+        connect(
+            "mongoenginetest",
+            host="mongodb://localhost",
+            mongo_client_class=mongomock.MongoClient,
+        )
+        # the indexes initialize_db and the startup build create
+        create_indexes(unique=True)
+        build_indexes()
+        response = client.post("/courses/add_course", json=course)
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self) -> None:
+        disconnect()
+
+    def test_submit_job(self) -> None:
+        response = client.post(
+            "/grades/ingestion_jobs",
+            json=grades,
+            headers={"Idempotency-Key": "upload-1"},
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job"]["job_id"]
+
+        # the background task has run once the response is returned
+        response = client.get(f"/grades/ingestion_jobs/{job_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["job"]["status"], "succeeded")
+        self.assertEqual(response.json()["job"]["num_grades"], 3)
+        self.assertEqual(Grades.objects.count(), 3)
+        self.assertEqual(
+            decode_dist(CourseStatistics.objects().first().grades_dist),
+            {"6.0": 2, "9.5": 1},
+        )
+
+        # a retry with the same key returns the existing job
+        response = client.post(
+            "/grades/ingestion_jobs",
+            json=grades,
+            headers={"Idempotency-Key": "upload-1"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["job"]["job_id"], job_id)
+        self.assertEqual(Grades.objects.count(), 3)
+
+    def test_failed_job(self) -> None:
+        unknown_student = [{**grades[0], "student_id": "0000009"}]
+        response = client.post("/grades/ingestion_jobs", json=grades + unknown_student)
+        self.assertEqual(response.status_code, 202)
+
+        response = client.get(
+            f"/grades/ingestion_jobs/{response.json()['job']['job_id']}"
+        )
+        self.assertEqual(response.json()["job"]["status"], "failed")
+        self.assertEqual(
+            response.json()["job"]["error"],
+            "400: Student 0000009 doesn't exist in this course",
+        )
+        self.assertEqual(Grades.objects.count(), 0)
+        self.assertEqual(CourseStatistics.objects.count(), 0)
+
+    def test_unknown_job(self) -> None:
+        response = client.get("/grades/ingestion_jobs/unknown")
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_grades_idempotency_key(self) -> None:
+        headers = {"Idempotency-Key": "upload-2"}
+        response = client.post("/grades/add_grades", json=grades, headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        # e.g. the rpc client re-publishing the request after a timeout
+        response = client.post("/grades/add_grades", json=grades, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["description"], "Grades added successfully")
+        self.assertEqual(Grades.objects.count(), 3)
+
+        # without the key the duplicate is still rejected
+        response = client.post("/grades/add_grades", json=grades)
+        self.assertEqual(response.status_code, 400)
+
+    def test_resume_interrupted_job(self) -> None:
+        job, created = create_ingestion_job([GradesModel(**x) for x in grades])
+        self.assertTrue(created)
+
+        # the service stopped after inserting part of the grades
+        Grades(id=job.grade_ids[0], **grades[0]).save()
+        job.update(set__status="running")
+
+        run_ingestion_job(job.job_id)
+
+        self.assertEqual(IngestionJob.objects().first().status, "succeeded")
+        self.assertEqual(Grades.objects.count(), 3)
+        self.assertEqual(len(Course.objects(course_id="NTU_CS101").first().grades), 3)
+
+    def test_duplicate_idempotency_key(self) -> None:
+        def job(job_id: str, idempotency_key: Optional[str]) -> IngestionJob:
+            now = datetime.now()
+            return IngestionJob(
+                job_id=job_id,
+                idempotency_key=idempotency_key,
+                status="pending",
+                course_id="NTU_CS101",
+                exam_type="Winter",
+                year=2024,
+                num_grades=0,
+                created_at=now,
+                updated_at=now,
+            )
+
+        job("1", "key").save()
+        with self.assertRaises(NotUniqueError):
+            job("2", "key").save()
+
+        # the key is optional, any number of jobs can go without one
+        job("3", None).save()
+        job("4", None).save()
+
+        passed_grades = [GradesModel(**grade) for grade in grades]
+        stored, created = create_ingestion_job(passed_grades, "key")
+        self.assertFalse(created)
+        self.assertEqual(stored.job_id, "1")
+
+    def test_duplicate_grade(self) -> None:
+        response = client.post("/grades/add_grades", json=grades)
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(NotUniqueError):
+            Grades(**grades[0]).save()
@@ -9,10 +9,17 @@ import mongomock
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.testclient import TestClient
 from mongoengine import connect, disconnect
-from werkzeug.security import generate_password_hash
+from werkzeug.security import check_password_hash, generate_password_hash
 
 from user_management.user_management.app import app
+from user_management.user_management.database.cache import validation_cache
+from user_management.user_management.database.sessions import (
+    SESSION_TTL,
+    hash_token,
+    utcnow,
+)
 from user_management.user_management.models.models import Session, User
+from user_management.user_management.passwords import needs_rehash
 
 client = TestClient(app)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -74,7 +81,7 @@ class TestLoginFastAPI(unittest.TestCase):
 
         token_in_db = Session.objects(username="Admin1").first()
         self.assertIsNotNone(token_in_db)
-        self.assertEqual(token_in_db.token, data["token"])
+        self.assertEqual(token_in_db.token_hash, hash_token(data["token"]))
 
     def test_InstitutionRepresentative_login(self) -> None:
         login_json = {
@@ -89,7 +96,7 @@ class TestLoginFastAPI(unittest.TestCase):
 
         token_in_db = Session.objects(username="InstitutionRepresentative1").first()
         self.assertIsNotNone(token_in_db)
-        self.assertEqual(token_in_db.token, data["token"])
+        self.assertEqual(token_in_db.token_hash, hash_token(data["token"]))
 
     def test_Instructor_login(self) -> None:
         login_json = {
@@ -104,7 +111,7 @@ class TestLoginFastAPI(unittest.TestCase):
 
         token_in_db = Session.objects(username="Instructor1").first()
         self.assertIsNotNone(token_in_db)
-        self.assertEqual(token_in_db.token, data["token"])
+        self.assertEqual(token_in_db.token_hash, hash_token(data["token"]))
 
     def test_Student_login(self) -> None:
         login_json = {
@@ -119,7 +126,21 @@ class TestLoginFastAPI(unittest.TestCase):
 
         token_in_db = Session.objects(username="Student1").first()
         self.assertIsNotNone(token_in_db)
-        self.assertEqual(token_in_db.token, data["token"])
+        self.assertEqual(token_in_db.token_hash, hash_token(data["token"]))
+
+    def test_rehash_on_login(self) -> None:
+        # hashed with other parameters than PASSWORD_HASH_METHOD
+        User.objects(username="Student1").update_one(
+            set__password=generate_password_hash("123456789", "pbkdf2:sha256:1000")
+        )
+
+        login_json = {"username": "Student1", "password": "123456789"}
+        response = client.post("/login/login", json=login_json)
+        self.assertEqual(response.status_code, 200)
+
+        password = User.objects(username="Student1").first().password
+        self.assertFalse(needs_rehash(password))
+        self.assertTrue(check_password_hash(password, "123456789"))
 
     def test_invalid_username(self) -> None:
         login_json = {"username": "wronguser", "password": "123456789"}
@@ -168,7 +189,7 @@ class TestLoginFastAPI(unittest.TestCase):
         print(response.json())
         self.assertEqual(response.status_code, 422)
 
-    def test_user_already_logged_in(self) -> None:
+    def test_user_logged_in_twice(self) -> None:
         login_json = {"username": "Admin1", "password": "123456789"}
         response = client.post("/login/login", json=login_json)
         print(response.status_code)
@@ -180,14 +201,16 @@ class TestLoginFastAPI(unittest.TestCase):
 
         token_in_db = Session.objects(username="Admin1").first()
         self.assertIsNotNone(token_in_db)
-        self.assertEqual(token_in_db.token, data["token"])
+        self.assertEqual(token_in_db.token_hash, hash_token(data["token"]))
 
+        # e.g. from a second device, both sessions stay valid
         login_json = {"username": "Admin1", "password": "123456789"}
         response = client.post("/login/login", json=login_json)
         print(response.status_code)
         print(response.json())
-        self.assertEqual(response.status_code, 402)
-        self.assertEqual(response.json()["detail"], "Already logged in")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()["token"], data["token"])
+        self.assertEqual(Session.objects(username="Admin1").count(), 2)
 
 
 class TestLogoutFastAPI(unittest.TestCase):
@@ -245,7 +268,7 @@ class TestLogoutFastAPI(unittest.TestCase):
         logout_response = client.post("/login/logout", headers=headers)
         self.assertEqual(logout_response.status_code, 204)
 
-        session = Session.objects(token=token).first()
+        session = Session.objects(token_hash=hash_token(token)).first()
         self.assertIsNone(session)
 
     def test_missing_token(self) -> None:
@@ -276,3 +299,107 @@ class TestLogoutFastAPI(unittest.TestCase):
         self.assertEqual(
             logout_response.json()["detail"], "Invalid token or already logged out"
         )
+
+
+class TestCheckAccessFastAPI(unittest.TestCase):
+    def setUp(self) -> None:
+        disconnect()
+        connect(
+            "mongoenginetest",
+            host="mongodb://localhost",
+            mongo_client_class=mongomock.MongoClient,
+        )
+        Session.objects().delete()
+        User.objects().delete()
+        validation_cache.clear()
+
+        User(
+            username="Instructor1",
+            password=generate_password_hash("123456789"),
+            email="instructor@ntua.gr",
+            role="Instructor",
+            institution="NTUA",
+        ).save()
+
+    def tearDown(self) -> None:
+        Session.objects().delete()
+        User.objects().delete()
+        disconnect()
+
+    def test_check_access(self) -> None:
+        login_json = {"username": "Instructor1", "password": "123456789"}
+        token = client.post("/login/login", json=login_json).json()["token"]
+
+        response = client.post("/login/check_access", params={"token": token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["privilege"], "Instructor")
+        self.assertEqual(validation_cache.get(token), "Instructor")
+
+        # logging out evicts the cached token
+        headers = {"Authorization": f"Bearer {token}"}
+        self.assertEqual(client.post("/login/logout", headers=headers).status_code, 204)
+        self.assertIsNone(validation_cache.get(token))
+        response = client.post("/login/check_access", params={"token": token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_check_access_forged_token(self) -> None:
+        # a session with a token that was not signed with the secret key
+        Session(
+            token_hash=hash_token("1234567890"),
+            username="Instructor1",
+            role="Instructor",
+            created_at=utcnow(),
+            expires_at=utcnow() + SESSION_TTL,
+        ).save()
+
+        response = client.post("/login/check_access", params={"token": "1234567890"})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["detail"], "Invalid token")
+
+    def test_expired_session(self) -> None:
+        login_json = {"username": "Instructor1", "password": "123456789"}
+        token = client.post("/login/login", json=login_json).json()["token"]
+
+        # not yet removed by the TTL monitor
+        Session.objects(token_hash=hash_token(token)).update_one(
+            set__expires_at=utcnow()
+        )
+        response = client.post("/login/check_access", params={"token": token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_session_renewal(self) -> None:
+        login_json = {"username": "Instructor1", "password": "123456789"}
+        token = client.post("/login/login", json=login_json).json()["token"]
+
+        expires_at = utcnow() + SESSION_TTL / 2
+        Session.objects(token_hash=hash_token(token)).update_one(
+            set__expires_at=expires_at
+        )
+        response = client.post("/login/check_access", params={"token": token})
+        self.assertEqual(response.status_code, 200)
+        session = Session.objects(token_hash=hash_token(token)).first()
+        self.assertGreater(session.expires_at, expires_at)
+
+    def test_logout_all(self) -> None:
+        login_json = {"username": "Instructor1", "password": "123456789"}
+        tokens = [
+            client.post("/login/login", json=login_json).json()["token"]
+            for _ in range(2)
+        ]
+        for token in tokens:
+            response = client.post("/login/check_access", params={"token": token})
+            self.assertEqual(response.status_code, 200)
+
+        headers = {"Authorization": f"Bearer {tokens[0]}"}
+        response = client.post("/login/logout_all", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["revoked"], 2)
+
+        for token in tokens:
+            response = client.post("/login/check_access", params={"token": token})
+            self.assertEqual(response.status_code, 401)
+
+        response = client.post(
+            "/login/logout_all", headers={"Authorization": "Bearer forged"}
+        )
+        self.assertEqual(response.status_code, 401)
@@ -10,7 +10,12 @@ from fastapi.testclient import TestClient
 from mongoengine import connect, disconnect
 
 from user_management.user_management.app import app
-from user_management.user_management.models.models import Instructor
+from user_management.user_management.database.directory import directory_cache
+from user_management.user_management.models.models import (
+    DirectoryChange,
+    DirectoryVersion,
+    Instructor,
+)
 
 client = TestClient(app)
 
@@ -73,6 +78,17 @@ class RegisterInstructor(unittest.TestCase):
         response = client.post("/register/register_instructor", json=instructor_data)
         self.assertEqual(response.status_code, 422)
 
+    def test_register_instructor_missing_password(self) -> None:
+        instructor_data = {
+            "instructor_id": "inst001",
+            "email": "john@example.com",
+            "name": "John Doe",
+            "institution": "Example University",
+        }
+        response = client.post("/register/register_instructor", json=instructor_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Instructor.objects(instructor_id="inst001").first())
+
 
 class RemoveInstructor(unittest.TestCase):
     def setUp(self) -> None:
@@ -172,3 +188,83 @@ class UpdateInstructor(unittest.TestCase):
 
         response = client.put("/register/update_instructor", json=instructor_data)
         self.assertEqual(response.status_code, 406)
+
+
+class InstructorDirectory(unittest.TestCase):
+    def setUp(self) -> None:
+        disconnect()
+        connect(
+            "mongoenginetest",
+            host="mongodb://localhost",
+            mongo_client_class=mongomock.MongoClient,
+        )
+        Instructor.objects().delete()
+        DirectoryVersion.objects().delete()
+        DirectoryChange.objects().delete()
+        directory_cache.clear()
+
+    def tearDown(self) -> None:
+        disconnect()
+
+    def instructor_data(self, instructor_id: str) -> dict:
+        return {
+            "instructor_id": instructor_id,
+            "password": "123456789",
+            "email": f"{instructor_id}@example.com",
+            "name": "John Doe",
+            "institution": "Example University",
+            "department": "CS",
+            "phone": "1234567890",
+            "office": "Room 101",
+        }
+
+    def test_fetch_instructors_after_update(self) -> None:
+        instructor_data = self.instructor_data("inst001")
+        client.post("/register/register_instructor", json=instructor_data)
+
+        response = client.get("/register/fetch_instructors/Example University")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 1)
+        self.assertEqual(response.json()["instructors"][0]["office"], "Room 101")
+
+        client.put(
+            "/register/update_instructor",
+            json={**instructor_data, "office": "Room 202"},
+        )
+        response = client.get("/register/fetch_instructors/Example University")
+        self.assertEqual(response.json()["version"], 2)
+        self.assertEqual(response.json()["instructors"][0]["office"], "Room 202")
+
+    def test_directory_changes(self) -> None:
+        client.post("/register/register_instructor", json=self.instructor_data("a"))
+        client.post("/register/register_instructor", json=self.instructor_data("b"))
+        client.request(
+            "DELETE", "/register/remove_instructor", json=self.instructor_data("a")
+        )
+
+        response = client.get(
+            "/register/directory_changes/Example University", params={"since": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertFalse(body["reset"])
+        self.assertEqual(body["version"], 3)
+        self.assertEqual(
+            [(change["id"], change["entry"] is None) for change in body["changes"]],
+            [("b", False), ("a", True)],
+        )
+
+        response = client.get(
+            "/register/directory_changes/Example University", params={"since": 3}
+        )
+        self.assertEqual(response.json()["changes"], [])
+
+        response = client.get(
+            "/register/directory_changes/Example University", params={"since": -1}
+        )
+        body = response.json()
+        self.assertTrue(body["reset"])
+        self.assertEqual(body["version"], 3)
+        self.assertEqual(
+            [instructor["instructor_id"] for instructor in body["instructors"]], ["b"]
+        )
@@ -123,3 +123,44 @@ class RegisterStudent(unittest.TestCase):
         }
         response = client.put("/register/update_student", json=student_data)
         self.assertEqual(response.status_code, 406)
+
+    def test_register_students(self) -> None:
+        students = [
+            {
+                "student_id": f"S{i:05}",
+                "password": "123456789",
+                "email": f"student{i}@example.com",
+                "name": f"Student {i}",
+                "institution": "Example University",
+                "enrollment_year": "2023",
+            }
+            for i in range(4)
+        ]
+        client.post("/register/register_student", json=students[0])
+        students.append({**students[1], "email": "other@example.com"})
+        students.append({**students[2], "student_id": "S99999"})
+
+        response = client.post("/register/register_students", json=students)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["registered"], 3)
+        self.assertEqual(
+            [
+                (result["status"], result.get("detail"))
+                for result in response.json()["results"]
+            ],
+            [
+                ("rejected", "Student already exists"),
+                ("registered", None),
+                ("registered", None),
+                ("registered", None),
+                ("rejected", "Duplicate of a previous row"),
+                ("rejected", "Duplicate of a previous row"),
+            ],
+        )
+        self.assertEqual(Student.objects.count(), 4)
+
+        # the registered students can log in
+        response = client.post(
+            "/login/login", json={"username": "S00003", "password": "123456789"}
+        )
+        self.assertEqual(response.status_code, 200)
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from user_management.user_management.database.db import initialize_db
+from user_management.user_management.passwords import shutdown_hash_pool
 from user_management.user_management.routes.google_login import (
     router as GoogleLoginRouter,
 )
@@ -24,6 +25,11 @@ async def start_database() -> None:
     initialize_db()
 
 
+@app.on_event("shutdown")  # type: ignore
+async def stop_hash_pool() -> None:
+    shutdown_hash_pool()
+
+
 @app.get("/", tags=["Root"])  # type: ignore
 async def read_root() -> dict:
     return {"message": "welcome"}
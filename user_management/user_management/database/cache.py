@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# seconds a validated token is answered without reading its session
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+# tokens kept by the validation cache
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+
+
+class ValidationCache:
+    """
+    Thread safe LRU cache of the username and role of the validated tokens,
+    each entry expiring after ttl seconds. Ending a session evicts its token
+    (revoking the sessions of a user evicts all of the user's tokens), so the
+    ttl only bounds how long a session deleted in another way is still accepted.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # token -> (username, role, expiry time)
+        self.entries: OrderedDict[str, tuple[str, str, float]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            _, role, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return role
+
+    def set(self, token: str, username: str, role: str) -> None:
+        if self.max_size == 0:
+            return
+        with self.lock:
+            self.entries[token] = (username, role, time.monotonic() + self.ttl)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, token: str) -> None:
+        with self.lock:
+            self.entries.pop(token, None)
+
+    def delete_user(self, username: str) -> None:
+        with self.lock:
+            for token in [
+                token for token, entry in self.entries.items() if entry[0] == username
+            ]:
+                del self.entries[token]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+validation_cache = ValidationCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
@@ -3,12 +3,14 @@ import os
 import mongoengine
 from werkzeug.security import generate_password_hash
 
+from user_management.user_management.database.sessions import migrate_sessions
 from user_management.user_management.models.models import User
 
 
 def initialize_db() -> None:
     mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     mongoengine.connect(db="user_management", host=mongo_uri, alias="default")
+    migrate_sessions()
 
     # Create a default admin if not exists
     default_username = "Admin1"
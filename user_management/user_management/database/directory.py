@@ -0,0 +1,214 @@
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+from typing import Any, Optional, Sequence
+
+from mongoengine import Document
+
+from user_management.user_management.database.sessions import utcnow
+from user_management.user_management.models.models import (
+    DirectoryChange,
+    DirectoryVersion,
+    Instructor,
+    Student,
+)
+
+# institutions whose directory is kept by the directory cache
+DIRECTORY_CACHE_SIZE = int(os.getenv("DIRECTORY_CACHE_SIZE", "64"))
+# changes kept per institution, a client further behind reloads the directory
+DIRECTORY_CHANGES_KEPT = int(os.getenv("DIRECTORY_CHANGES_KEPT", "10000"))
+# seconds a missing version is waited for before the change feed skips it,
+# as versions are reserved before their change is written
+DIRECTORY_GAP_GRACE = timedelta(seconds=float(os.getenv("DIRECTORY_GAP_GRACE", "10")))
+
+PROFILE_DOCUMENTS: dict[str, type[Document]] = {
+    "instructor": Instructor,
+    "student": Student,
+}
+DIRECTORY_FIELDS: dict[str, list[str]] = {
+    "instructor": [
+        "instructor_id",
+        "email",
+        "name",
+        "institution",
+        "department",
+        "phone",
+        "office",
+    ],
+    "student": ["student_id", "email", "name", "institution", "enrollment_year"],
+}
+
+# (id of the version counter, version) the directory of an institution was read at
+Stamp = tuple[Optional[Any], int]
+
+
+class DirectoryCache:
+    """
+    Thread safe LRU cache of the instructor and student directories of the
+    institutions. An entry is stamped with the version of the institution's
+    directory it was read at and is only served while that is still the
+    current version, so a change made by another process is never missed.
+    The changes made by this process also evict the entry at once.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        # (institution, kind) -> (stamp, entries)
+        self.entries: OrderedDict[tuple[str, str], tuple[Stamp, list[dict]]] = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+
+    def get(self, institution: str, kind: str, stamp: Stamp) -> Optional[list[dict]]:
+        with self.lock:
+            entry = self.entries.get((institution, kind))
+            if entry is None or entry[0] != stamp:
+                return None
+            self.entries.move_to_end((institution, kind))
+            return entry[1]
+
+    def set(
+        self, institution: str, kind: str, stamp: Stamp, entries: list[dict]
+    ) -> None:
+        if self.max_size == 0:
+            return
+        with self.lock:
+            self.entries[(institution, kind)] = (stamp, entries)
+            self.entries.move_to_end((institution, kind))
+            # both kinds of an institution count as one
+            while len(self.entries) > 2 * self.max_size:
+                self.entries.popitem(last=False)
+
+    def evict(self, institution: str) -> None:
+        with self.lock:
+            for kind in PROFILE_DOCUMENTS:
+                self.entries.pop((institution, kind), None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+directory_cache = DirectoryCache(DIRECTORY_CACHE_SIZE)
+
+
+def directory_entry(kind: str, profile: dict) -> dict:
+    # the public fields of an instructor or student, as listed in the directory
+    return {field: profile.get(field) for field in DIRECTORY_FIELDS[kind]}
+
+
+def profile_entry(kind: str, profile: Document) -> dict:
+    return directory_entry(kind, profile.to_mongo().to_dict())
+
+
+def current_stamp(institution: str) -> Stamp:
+    counter = (
+        DirectoryVersion.objects(institution=institution)
+        .only("version")
+        .as_pymongo()
+        .first()
+    )
+    if counter is None:
+        return None, 0
+    return counter["_id"], counter["version"]
+
+
+def fetch_directory(institution: str, kind: str) -> tuple[int, list[dict]]:
+    """
+    The directory entries of the instructors or students of the institution,
+    with the version they are up to date with. The stored version is read
+    before the profiles, so a change in between only makes the next lookup
+    read them again.
+    """
+    stamp = current_stamp(institution)
+    entries = directory_cache.get(institution, kind, stamp)
+    if entries is None:
+        fields = DIRECTORY_FIELDS[kind]
+        entries = [
+            directory_entry(kind, profile)
+            for profile in PROFILE_DOCUMENTS[kind]
+            .objects(institution=institution)
+            .only(*fields)
+            .as_pymongo()
+        ]
+        directory_cache.set(institution, kind, stamp, entries)
+    return stamp[1], entries
+
+
+def record_changes(
+    kind: str, changes: Sequence[tuple[str, str, Optional[dict]]]
+) -> None:
+    """
+    Records changes to the directories after the profiles were written, as
+    (institution, user id, directory entry) with a None entry for a removed
+    user. The changes of an institution get consecutive versions, reserved
+    with a single increment of its counter.
+    """
+    by_institution: dict[str, list[tuple[str, Optional[dict]]]] = defaultdict(list)
+    for institution, user_id, entry in changes:
+        by_institution[institution].append((user_id, entry))
+
+    now = utcnow()
+    for institution, institution_changes in by_institution.items():
+        counter = DirectoryVersion.objects(institution=institution).modify(
+            upsert=True, new=True, inc__version=len(institution_changes)
+        )
+        first_version = counter.version - len(institution_changes) + 1
+        DirectoryChange._get_collection().insert_many(
+            [
+                DirectoryChange(
+                    institution=institution,
+                    version=first_version + offset,
+                    kind=kind,
+                    user_id=user_id,
+                    entry=entry,
+                    created_at=now,
+                ).to_mongo()
+                for offset, (user_id, entry) in enumerate(institution_changes)
+            ]
+        )
+        DirectoryChange.objects(
+            institution=institution,
+            version__lte=counter.version - DIRECTORY_CHANGES_KEPT,
+        ).delete()
+        directory_cache.evict(institution)
+
+
+def changes_since(institution: str, since: int) -> Optional[dict]:
+    """
+    The changes to the directory of the institution after version since, in
+    order, and the version they bring a replica to. Returns None when the
+    replica has to be reloaded, as since is unknown or its changes were dropped.
+
+    A change whose version was reserved but is not written yet ends the list,
+    so a replica never skips it; after DIRECTORY_GAP_GRACE its writer is
+    considered failed and the version is skipped.
+    """
+    stored_changes = list(
+        DirectoryChange.objects(institution=institution, version__gt=since)
+        .order_by("version")
+        .as_pymongo()
+    )
+    # read after the changes, so the changes pruned meanwhile are noticed
+    version = current_stamp(institution)[1]
+    if since < 0 or since > version or since < version - DIRECTORY_CHANGES_KEPT:
+        return None
+
+    changes = []
+    expected = since + 1
+    skipped_before = utcnow() - DIRECTORY_GAP_GRACE
+    for change in stored_changes:
+        if change["version"] != expected and change["created_at"] > skipped_before:
+            break
+        changes.append(
+            {
+                "version": change["version"],
+                "kind": change["kind"],
+                "id": change["user_id"],
+                "entry": change.get("entry"),
+            }
+        )
+        expected = change["version"] + 1
+
+    return {"version": expected - 1, "changes": changes}
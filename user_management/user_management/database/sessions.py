@@ -0,0 +1,130 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from mongoengine import get_db
+
+from user_management.user_management.database.cache import validation_cache
+from user_management.user_management.models.models import Session, User
+
+# the .env is loaded here, as this module is imported before the routes load it
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
+serializer = URLSafeTimedSerializer(SECRET_KEY)
+# seconds a token stays valid, checked from its signature
+TOKEN_MAX_AGE = int(os.getenv("TOKEN_MAX_AGE", str(7 * 24 * 3600)))
+# seconds an unused session lives, renewed while it is used
+SESSION_TTL = timedelta(seconds=int(os.getenv("SESSION_TTL", str(24 * 3600))))
+# seconds between two renewals of a session, so a check is not always a write
+SESSION_RENEW_AFTER = timedelta(seconds=int(os.getenv("SESSION_RENEW_AFTER", "300")))
+
+
+def utcnow() -> datetime:
+    # naive UTC, as MongoDB returns the dates
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def hash_token(token: str) -> str:
+    # sessions are stored and looked up by the hash of their token
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_token(user: User) -> str:
+    """
+    Token of a new session, signed with SECRET_KEY. It holds the username and
+    the role, so it can be verified (see read_token) without a lookup, also by
+    the orchestrator. The session id makes every login's token different.
+    """
+    return str(
+        serializer.dumps(
+            {"username": user.username, "role": user.role, "sid": uuid4().hex}
+        )
+    )
+
+
+def read_token(token: str) -> Optional[Any]:
+    # the payload of a token, None if it is forged or older than TOKEN_MAX_AGE
+    try:
+        return serializer.loads(token, max_age=TOKEN_MAX_AGE)
+    except BadSignature:
+        return None
+
+
+def create_session(user: User) -> str:
+    """
+    Starts a new session of the user and returns its token. A user can hold
+    any number of sessions, e.g. one per device.
+    """
+    token = issue_token(user)
+    now = utcnow()
+    Session(
+        token_hash=hash_token(token),
+        username=user.username,
+        role=user.role,
+        created_at=now,
+        expires_at=now + SESSION_TTL,
+    ).save()
+    return token
+
+
+def find_session(token: str) -> Optional[str]:
+    """
+    The role of the live session of the token, None if there is none.
+    Valid tokens are read through the validation cache. A session read from
+    the database is renewed for SESSION_TTL, at most once per SESSION_RENEW_AFTER.
+    """
+    if read_token(token) is None:
+        return None
+
+    role = validation_cache.get(token)
+    if role is not None:
+        return role
+
+    now = utcnow()
+    session = (
+        Session.objects(token_hash=hash_token(token), expires_at__gt=now)
+        .only("username", "role", "expires_at")
+        .first()
+    )
+    if session is None:
+        return None
+
+    if session.expires_at - now < SESSION_TTL - SESSION_RENEW_AFTER:
+        Session.objects(id=session.id).update_one(set__expires_at=now + SESSION_TTL)
+
+    validation_cache.set(token, session.username, session.role)
+    return session.role  # type: ignore
+
+
+def end_session(token: str) -> bool:
+    # ends the session of the token, False if there was none
+    validation_cache.delete(token)
+    return Session.objects(token_hash=hash_token(token)).delete() > 0  # type: ignore
+
+
+def revoke_sessions(username: str) -> int:
+    """
+    Ends every session of the user, e.g. on "log out everywhere", a password
+    change or the removal of the user. Returns the number of ended sessions.
+    """
+    validation_cache.delete_user(username)
+    return Session.objects(username=username).delete()  # type: ignore
+
+
+def migrate_sessions() -> None:
+    """
+    Drops the sessions stored before they were keyed by token hash, together
+    with the indexes that made a username hold a single session. The users
+    of these sessions log in again.
+    """
+    # the raw collection, as the document would first create its new indexes
+    collection = get_db()[Session._get_collection_name()]
+    for name, index in collection.index_information().items():
+        if index["key"] in [[("username", 1)], [("token", 1)]] and index.get("unique"):
+            collection.drop_index(name)
+    collection.delete_many({"token_hash": {"$exists": False}})
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from mongoengine import Document, IntField, StringField
+from mongoengine import DateTimeField, DictField, Document, IntField, StringField
 from pydantic import BaseModel, Extra
 
 
@@ -35,19 +35,76 @@ class UserModel(BaseModel):
 
 
 class Session(Document):
-    token = StringField(required=True, unique=True)
-    username = StringField(required=True, unique=True)
+    # sha256 of the token, the token itself is not stored
+    token_hash = StringField(required=True, unique=True)
+    username = StringField(required=True)
     role = StringField(
         required=True,
         choices=["Admin", "InstitutionRepresentative", "Instructor", "Student"],
     )
+    created_at = DateTimeField(required=True)
+    # sliding expiry (UTC), see database/sessions.py
+    expires_at = DateTimeField(required=True)
+
+    meta = {
+        "indexes": [
+            # the sessions of a user, for bulk revocation
+            "username",
+            # expired sessions are deleted by MongoDB's TTL monitor
+            {"fields": ["expires_at"], "expireAfterSeconds": 0},
+        ]
+    }
 
     class Config:
         json_schema_extra = {
             "example": {
-                "token": "123456789",
+                "token_hash": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
                 "username": "el00000",
                 "role": "Student",
+                "created_at": "2025-01-20T09:00:00",
+                "expires_at": "2025-01-21T09:00:00",
+            }
+        }
+
+
+class DirectoryVersion(Document):
+    # number of changes to the directory of the institution, see database/directory.py
+    institution = StringField(required=True, unique=True)
+    version = IntField(required=True, default=0)
+
+
+class DirectoryChange(Document):
+    institution = StringField(required=True)
+    version = IntField(required=True)
+    kind = StringField(required=True, choices=["instructor", "student"])
+    user_id = StringField(required=True)
+    # the directory entry of the user, None when the user was removed
+    entry = DictField(required=False, null=True)
+    created_at = DateTimeField(required=True)
+
+    meta = {
+        "indexes": [
+            {"fields": ["institution", "version"], "unique": True},
+        ]
+    }
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "institution": "National Technical University of Athens",
+                "version": 42,
+                "kind": "instructor",
+                "user_id": "I21312",
+                "entry": {
+                    "instructor_id": "I21312",
+                    "email": "I21312@uoa.gr",
+                    "name": "Alexandros Mandilaras",
+                    "institution": "National Technical University of Athens",
+                    "department": "Computer Science",
+                    "phone": "+210 XXXXXXXXX",
+                    "office": "1.1.13 old Electrical Engineering buildings",
+                },
+                "created_at": "2025-01-20T09:00:00",
             }
         }
 
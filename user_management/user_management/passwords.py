@@ -0,0 +1,68 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# werkzeug hash method with its cost parameters, e.g. "scrypt:32768:8:1"
+# (n, r, p) or "pbkdf2:sha256:1000000" (iterations). Stored hashes of another
+# method are rehashed on the next login.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+# processes hashing the passwords, by default one per CPU
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count())))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def hash_pool() -> ProcessPoolExecutor:
+    """
+    The process pool the hashes run in, so they neither block the event loop
+    nor serialize on the GIL. Spawned rather than forked, as the service
+    process holds the threads of the MongoDB client.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_hash_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(
+        hash_pool(), generate_password_hash, password, PASSWORD_HASH_METHOD
+    )
+
+
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    # the hashes of a bulk registration, spread over all the workers
+    return list(
+        await asyncio.gather(*[hash_password(password) for password in passwords])
+    )
+
+
+async def verify_password(pwhash: str, password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        hash_pool(), check_password_hash, pwhash, password
+    )
+
+
+@lru_cache(maxsize=1)
+def current_method() -> str:
+    # the method as werkzeug writes it in a hash, with all its parameters
+    return generate_password_hash("", PASSWORD_HASH_METHOD).split("$", 1)[0]
+
+
+def needs_rehash(pwhash: str) -> bool:
+    return pwhash.split("$", 1)[0] != current_method()
@@ -6,15 +6,13 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
-from itsdangerous import URLSafeTimedSerializer
 
 load_dotenv()
 
-from user_management.user_management.models.models import Session, User
+from user_management.user_management.database.sessions import SECRET_KEY, create_session
+from user_management.user_management.models.models import User
 
 router = APIRouter()
-SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
-serializer = URLSafeTimedSerializer(SECRET_KEY)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -30,7 +28,7 @@ FRONTEND_URL = "http://localhost:8501" # Change to your Streamlit URL in product
 async def google_login(request: Request) -> RedirectResponse:
     """
     Authenticate a user via Google Sign-In token. Needs the user to be registered with the same email.
-    If the user is already logged in or credentials are invalid, appropriate errors are raised.
+    Every login starts a new session. If the credentials are invalid, the user is redirected with an error.
     """
     try:
         code = request.query_params.get("code")
@@ -74,17 +72,7 @@ async def google_login(request: Request) -> RedirectResponse:
         except ValueError:
             return RedirectResponse(f"{FRONTEND_URL}/?error=Invalid Google token")
 
-        role_obj = user.role
-        username_obj = user.username
-
-        if Session.objects(username=username_obj):
-            return RedirectResponse(f"{FRONTEND_URL}/?error=Already logged in")
-
-        if len(Session.objects()) == 1:
-            Session.objects().delete()
-
-        token = str(serializer.dumps(username_obj))
-        Session(token=token, username=username_obj, role=role_obj).save()
+        token = create_session(user)
 
         payload = {
             "token": token,
@@ -1,16 +1,22 @@
-import os
-
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordBearer
-from itsdangerous import URLSafeTimedSerializer
-from werkzeug.security import check_password_hash
 
-from user_management.user_management.models.models import Session, User, UserModel
+from user_management.user_management.database.sessions import (
+    create_session,
+    end_session,
+    find_session,
+    read_token,
+    revoke_sessions,
+)
+from user_management.user_management.models.models import User, UserModel
+from user_management.user_management.passwords import (
+    hash_password,
+    needs_rehash,
+    verify_password,
+)
 
 router = APIRouter()
-SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
-serializer = URLSafeTimedSerializer(SECRET_KEY)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -18,20 +24,19 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 @router.post("/check_access")  # type: ignore
 async def check_access(token: str) -> JSONResponse:
     """
-    Checks if a logged in user with a specific token can perform an operation
+    Checks if a logged in user with a specific token can perform an operation.
+    Tokens with an invalid signature are rejected without a lookup, the session
+    of a valid one is read through the validation cache and renewed (see find_session).
 
     :param token: The passed token of the logged in user
     :type token: str
     """
     try:
-        searched_token = Session.objects(token=token).first()
-
-        if not searched_token:
+        role = find_session(token)
+        if role is None:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        return JSONResponse(
-            status_code=status.HTTP_200_OK, content={"privilege": searched_token.role}
-        )
+        return JSONResponse(status_code=status.HTTP_200_OK, content={"privilege": role})
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -45,24 +50,24 @@ async def check_access(token: str) -> JSONResponse:
 async def login(user_data: UserModel) -> JSONResponse:
     """
     Authenticate a user based on their user ID, password, and role.
-    If the user is already logged in or credentials are invalid, appropriate errors are raised.
+    Every login starts a new session, so a user can be logged in on several devices.
+    If the credentials are invalid, an appropriate error is raised.
+    A password hashed with other parameters than the current ones is rehashed.
 
     :param user_data: User login information (user ID, password, and role)
     :type user_data: BaseModel (see model.py)
     """
     try:
         user = User.objects(username=user_data.username).first()
-        if not user or not check_password_hash(user.password, user_data.password):
+        if not user or not await verify_password(user.password, user_data.password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        if Session.objects(username=user.username):
-            raise HTTPException(status_code=402, detail="Already logged in")
-
-        if len(Session.objects()) == 1:
-            Session.objects().delete()
+        if needs_rehash(user.password):
+            User.objects(id=user.id).update_one(
+                set__password=await hash_password(user_data.password)
+            )
 
-        token = str(serializer.dumps(user.username))
-        Session(token=token, username=user.username, role=user.role).save()
+        token = create_session(user)
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -93,16 +98,50 @@ async def logout(token: str = Depends(oauth2_scheme)) -> Response:
         raise HTTPException(status_code=400, detail="Token missing")
 
     try:
-        session = Session.objects(token=token).first()
-        if not session:
+        if not end_session(token):
             raise HTTPException(
                 status_code=401, detail="Invalid token or already logged out"
             )
 
-        session.delete()
-
         return Response(status_code=204)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/logout_all",
+    response_description="User logged out of all sessions successfully",
+)  # type: ignore
+async def logout_all(token: str = Depends(oauth2_scheme)) -> JSONResponse:
+    """
+    Log out a user from all of their sessions (every device), based on the
+    authentication token of one of them.
+
+    :param token: Bearer token used for authenticating the session
+    :type token: str (provided via OAuth2 scheme)
+    """
+    if not token:
+        raise HTTPException(status_code=400, detail="Token missing")
+
+    try:
+        payload = read_token(token)
+        if payload is None or find_session(token) is None:
+            raise HTTPException(
+                status_code=401, detail="Invalid token or already logged out"
+            )
+
+        revoked = revoke_sessions(payload["username"])
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "description": "User logged out of all sessions successfully",
+                "revoked": revoked,
+            },
+        )
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
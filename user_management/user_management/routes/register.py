@@ -1,7 +1,17 @@
+from typing import Any, Optional, Sequence, Union
+
 from fastapi import APIRouter, HTTPException, status
 from fastapi.responses import JSONResponse
-from werkzeug.security import generate_password_hash
-
+from mongoengine import Document, Q, ValidationError
+from pymongo.errors import BulkWriteError
+
+from user_management.user_management.database.directory import (
+    changes_since,
+    fetch_directory,
+    profile_entry,
+    record_changes,
+)
+from user_management.user_management.database.sessions import revoke_sessions
 from user_management.user_management.models.models import (
     InstitutionRepresentative,
     InstitutionRepresentativeModel,
@@ -11,10 +21,145 @@ from user_management.user_management.models.models import (
     StudentModel,
     User,
 )
+from user_management.user_management.passwords import hash_password, hash_passwords
 
 router = APIRouter()
 
 
+def insert_rows(document: type[Document], rows: list[tuple[int, Document]]) -> set[int]:
+    """
+    Inserts the documents of the rows with a single unordered insert_many.
+
+    :return: the rows whose document was not inserted, e.g. registered concurrently
+    """
+    if not rows:
+        return set()
+    try:
+        document._get_collection().insert_many(
+            [new_document.to_mongo() for _, new_document in rows], ordered=False
+        )
+    except BulkWriteError as e:
+        return {rows[error["index"]][0] for error in e.details["writeErrors"]}
+    return set()
+
+
+async def register_users(
+    users: Sequence[Union[StudentModel, InstructorModel]],
+    id_field: str,
+    profile_document: type[Document],
+    role: str,
+) -> list[dict[str, Any]]:
+    """
+    Registers a batch of students or instructors: the ids and emails already taken
+    are found with one $in query per collection, the passwords are hashed in parallel
+    and the profiles and users are written with one insert_many each.
+    A row that cannot be registered does not stop the others.
+
+    :return: the result of every row, in order
+    """
+    results: list[dict[str, Any]] = [
+        {"row": row, "id": getattr(user, id_field), "status": "registered"}
+        for row, user in enumerate(users)
+    ]
+
+    def reject(row: int, detail: str) -> None:
+        results[row]["status"] = "rejected"
+        results[row]["detail"] = detail
+
+    ids = [result["id"] for result in results]
+    emails = [user.email for user in users]
+    taken_ids: set[str] = set()
+    taken_emails: set[str] = set()
+    lookups: list[tuple[type[Document], str]] = [
+        (profile_document, id_field),
+        (User, "username"),
+    ]
+    for document, id_key in lookups:
+        for taken in (
+            document.objects(Q(**{f"{id_key}__in": ids}) | Q(email__in=emails))
+            .only(id_key, "email")
+            .as_pymongo()
+        ):
+            taken_ids.add(taken[id_key])
+            # the email of a user is optional
+            if taken.get("email") is not None:
+                taken_emails.add(taken["email"])
+
+    seen_ids: set[str] = set()
+    seen_emails: set[str] = set()
+    # (row, password) of the rows to register
+    accepted: list[tuple[int, str]] = []
+    for row, user in enumerate(users):
+        if ids[row] in taken_ids:
+            reject(row, f"{role} already exists")
+        elif user.email in taken_emails:
+            reject(row, "Email already in use")
+        elif ids[row] in seen_ids or user.email in seen_emails:
+            reject(row, "Duplicate of a previous row")
+        elif not user.password:
+            reject(row, "Password missing")
+        else:
+            accepted.append((row, user.password))
+        seen_ids.add(ids[row])
+        seen_emails.add(user.email)
+
+    hashed_passwords = await hash_passwords([password for _, password in accepted])
+
+    profiles = []
+    new_users = []
+    for (row, _), hashed_password in zip(accepted, hashed_passwords):
+        user = users[row]
+        profile = profile_document(**user.dict(exclude={"password"}))
+        new_user = User(
+            username=ids[row],
+            password=hashed_password,
+            email=user.email,
+            role=role,
+            institution=user.institution,
+        )
+        try:
+            profile.validate()
+            new_user.validate()
+        except ValidationError as e:
+            reject(row, str(e))
+            continue
+        profiles.append((row, profile))
+        new_users.append((row, new_user))
+
+    failed = insert_rows(profile_document, profiles)
+    failed_users = insert_rows(
+        User, [(row, new_user) for row, new_user in new_users if row not in failed]
+    )
+    if failed_users:
+        # the user of these rows was registered concurrently, drop their profile
+        profile_document.objects(
+            **{f"{id_field}__in": [ids[row] for row in failed_users]}
+        ).delete()
+    for row in failed | failed_users:
+        reject(row, f"{role} already exists")
+
+    kind = role.lower()
+    record_changes(
+        kind,
+        [
+            (profile.institution, ids[row], profile_entry(kind, profile))
+            for row, profile in profiles
+            if row not in failed | failed_users
+        ],
+    )
+
+    return results
+
+
+def registration_content(results: list[dict[str, Any]], users: str) -> dict[str, Any]:
+    registered = sum(result["status"] == "registered" for result in results)
+    return {
+        "description": f"Registered {registered} of {len(results)} {users}",
+        "registered": registered,
+        "results": results,
+    }
+
+
 @router.post(
     "/register_representative",
     response_description="Institution Representative registered successfully",
@@ -46,7 +191,7 @@ async def register_representative(
         )
         new_representative.save()
 
-        hashed_password = generate_password_hash(representative.password)
+        hashed_password = await hash_password(representative.password)
         new_user = User(
             username=representative.representative_id,
             password=hashed_password,
@@ -82,6 +227,9 @@ async def register_instructor(instructor: InstructorModel) -> JSONResponse:
     :type instructor: BaseModel(see models.py)
     """
     try:
+        if not instructor.password:
+            raise HTTPException(status_code=400, detail="Password missing")
+
         instructor_obj = Instructor.objects(
             instructor_id=instructor.instructor_id
         ).first()
@@ -100,7 +248,7 @@ async def register_instructor(instructor: InstructorModel) -> JSONResponse:
         )
         new_instructor.save()
 
-        hashed_password = generate_password_hash(instructor.password)
+        hashed_password = await hash_password(instructor.password)
         new_user = User(
             username=instructor.instructor_id,
             password=hashed_password,
@@ -109,6 +257,16 @@ async def register_instructor(instructor: InstructorModel) -> JSONResponse:
             institution=instructor.institution,
         )
         new_user.save()
+        record_changes(
+            "instructor",
+            [
+                (
+                    new_instructor.institution,
+                    new_instructor.instructor_id,
+                    profile_entry("instructor", new_instructor),
+                )
+            ],
+        )
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -120,6 +278,32 @@ async def register_instructor(instructor: InstructorModel) -> JSONResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/register_instructors",
+    response_description="Instructors registered",
+)  # type: ignore
+async def register_instructors(instructors: list[InstructorModel]) -> JSONResponse:
+    """
+    Register a batch of new instructors, e.g. the staff of a new semester.
+    Every row is registered independently: the response reports the status
+    ("registered" or "rejected", with the reason) of every row, in order.
+
+    :param instructors: Instructors info
+    :type instructors: List[BaseModel](see models.py)
+    """
+    try:
+        results = await register_users(
+            instructors, "instructor_id", Instructor, "Instructor"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=registration_content(results, "instructors"),
+    )
+
+
 @router.get("/fetch_instructors/{institution}")  # type: ignore
 async def fetch_instructors(institution: str) -> JSONResponse:
     """
@@ -129,25 +313,76 @@ async def fetch_instructors(institution: str) -> JSONResponse:
     :type institution: str
     """
     try:
-        returned_instructors = []
-        for instructor in Instructor.objects(institution=institution):
-            returned_instructors.append(
-                InstructorModel(
-                    instructor_id=instructor.instructor_id,
-                    email=instructor.email,
-                    name=instructor.name,
-                    institution=instructor.institution,
-                    department=instructor.department,
-                    phone=instructor.phone,
-                    office=instructor.office,
-                ).dict()
-            )
+        version, instructors = fetch_directory(institution, "instructor")
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "description": "Instructors fetched successfully",
-                "instructors": returned_instructors,
+                "version": version,
+                "instructors": instructors,
+            },
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/fetch_students/{institution}")  # type: ignore
+async def fetch_students(institution: str) -> JSONResponse:
+    """
+    Fetch students of an institution
+
+    :param institution: The passed institution name
+    :type institution: str
+    """
+    try:
+        version, students = fetch_directory(institution, "student")
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "description": "Students fetched successfully",
+                "version": version,
+                "students": students,
+            },
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/directory_changes/{institution}")  # type: ignore
+async def directory_changes(institution: str, since: int) -> JSONResponse:
+    """
+    Fetch the changes to the instructors and students of an institution after
+    a version, to keep a replica of its directory up to date. Every change holds
+    the directory entry of the user, or a null entry if the user was removed.
+    When since is too old (or negative) the whole directory is returned instead,
+    with "reset" set.
+
+    :param institution: The passed institution name
+    :type institution: str
+    :param since: The version the replica is up to date with
+    :type since: int
+    """
+    try:
+        feed = changes_since(institution, since)
+        if feed is None:
+            version, instructors = fetch_directory(institution, "instructor")
+            _, students = fetch_directory(institution, "student")
+            content = {
+                "version": version,
+                "reset": True,
+                "instructors": instructors,
+                "students": students,
+            }
+        else:
+            content = {"reset": False, **feed}
+
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content={
+                "description": "Directory changes fetched successfully",
+                **content,
             },
         )
     except Exception as e:
@@ -176,6 +411,11 @@ async def remove_instructor(instructor: InstructorModel) -> JSONResponse:
 
         instructor_obj.delete()
         user_obj.delete()
+        revoke_sessions(instructor.instructor_id)
+        record_changes(
+            "instructor",
+            [(instructor_obj.institution, instructor_obj.instructor_id, None)],
+        )
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -200,6 +440,9 @@ async def update_instructor(instructor: InstructorModel) -> JSONResponse:
     :type instructor: BaseModel(see models.py)
     """
     try:
+        if not instructor.password:
+            raise HTTPException(status_code=400, detail="Password missing")
+
         instructor_obj = Instructor.objects(
             instructor_id=instructor.instructor_id
         ).first()
@@ -207,6 +450,7 @@ async def update_instructor(instructor: InstructorModel) -> JSONResponse:
         if not instructor_obj or not user_obj:
             raise HTTPException(status_code=406, detail="Instructor does not exist")
 
+        old_institution = instructor_obj.institution
         instructor_obj.update(
             instructor_id=instructor.instructor_id,
             email=instructor.email,
@@ -217,7 +461,7 @@ async def update_instructor(instructor: InstructorModel) -> JSONResponse:
             office=instructor.office,
         )
 
-        hashed_password = generate_password_hash(instructor.password)
+        hashed_password = await hash_password(instructor.password)
         user_obj.update(
             username=instructor.instructor_id,
             password=hashed_password,
@@ -225,6 +469,18 @@ async def update_instructor(instructor: InstructorModel) -> JSONResponse:
             role="Instructor",
         )
 
+        instructor_obj.reload()
+        changes: list[tuple[str, str, Optional[dict]]] = [
+            (
+                instructor_obj.institution,
+                instructor_obj.instructor_id,
+                profile_entry("instructor", instructor_obj),
+            )
+        ]
+        if old_institution != instructor_obj.institution:
+            changes.insert(0, (old_institution, instructor_obj.instructor_id, None))
+        record_changes("instructor", changes)
+
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={"description": "Instructor updated successfully"},
@@ -262,7 +518,7 @@ async def register_student(student: StudentModel) -> JSONResponse:
         )
         new_student.save()
 
-        hashed_password = generate_password_hash(student.password)
+        hashed_password = await hash_password(student.password)
         new_student_user = User(
             username=student.student_id,
             password=hashed_password,
@@ -271,6 +527,16 @@ async def register_student(student: StudentModel) -> JSONResponse:
             institution=student.institution,
         )
         new_student_user.save()
+        record_changes(
+            "student",
+            [
+                (
+                    new_student.institution,
+                    new_student.student_id,
+                    profile_entry("student", new_student),
+                )
+            ],
+        )
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -282,6 +548,30 @@ async def register_student(student: StudentModel) -> JSONResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post(
+    "/register_students",
+    response_description="Students registered",
+)  # type: ignore
+async def register_students(students: list[StudentModel]) -> JSONResponse:
+    """
+    Register a batch of new students, e.g. a new intake.
+    Every row is registered independently: the response reports the status
+    ("registered" or "rejected", with the reason) of every row, in order.
+
+    :param students: Students info
+    :type students: List[BaseModel](see models.py)
+    """
+    try:
+        results = await register_users(students, "student_id", Student, "Student")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=registration_content(results, "students"),
+    )
+
+
 @router.delete(
     "/remove_student",
     response_description="Student removed successfully",
@@ -302,6 +592,10 @@ async def remove_student(student: StudentModel) -> JSONResponse:
 
         student_obj.delete()
         user_obj.delete()
+        revoke_sessions(student.student_id)
+        record_changes(
+            "student", [(student_obj.institution, student_obj.student_id, None)]
+        )
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
@@ -331,6 +625,7 @@ async def put_student(student: StudentModel) -> JSONResponse:
         if not student_obj or not user_obj:
             raise HTTPException(status_code=406, detail="Student does not exist")
 
+        old_institution = student_obj.institution
         student_obj.update(
             student_id=student.student_id,
             email=student.email,
@@ -339,7 +634,7 @@ async def put_student(student: StudentModel) -> JSONResponse:
             enrollment_year=student.enrollment_year,
         )
 
-        hashed_password = generate_password_hash(student.password)
+        hashed_password = await hash_password(student.password)
         user_obj.update(
             username=student.student_id,
             password=hashed_password,
@@ -347,6 +642,18 @@ async def put_student(student: StudentModel) -> JSONResponse:
             role="Student",
         )
 
+        student_obj.reload()
+        changes: list[tuple[str, str, Optional[dict]]] = [
+            (
+                student_obj.institution,
+                student_obj.student_id,
+                profile_entry("student", student_obj),
+            )
+        ]
+        if old_institution != student_obj.institution:
+            changes.insert(0, (old_institution, student_obj.student_id, None))
+        record_changes("student", changes)
+
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={"description": "Student updated successfully"},
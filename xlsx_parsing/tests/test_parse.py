@@ -1,8 +1,12 @@
+import os
+import tempfile
 import unittest
 
+import openpyxl
 from fastapi.testclient import TestClient
 
 from xlsx_parsing.xlsx_parsing.app import app  # CHANGE this line depending on workdir
+from xlsx_parsing.xlsx_parsing.parse import parse_grades_excel
 
 client = TestClient(app)
 
@@ -169,3 +173,132 @@ class TestParse(unittest.TestCase):
                     0,
                     f"Empty result for file: {xlsx_file}",
                 )
+
+
+class TestParserEngines(unittest.TestCase):
+    def assertSameResult(self, file_path: str) -> None:
+        expected = parse_grades_excel(file_path, engine="full")
+        self.assertEqual(
+            parse_grades_excel(file_path, engine="streaming"),
+            expected,
+            f"Engines disagree for file: {file_path}",
+        )
+
+        columnar = parse_grades_excel(file_path, engine="columnar")
+        columnar["result"].pop("distributions", None)
+        self.assertEqual(
+            columnar, expected, f"Columnar engine disagrees for file: {file_path}"
+        )
+
+    def test_columnar_distributions(self) -> None:
+        for xlsx_file in examples:
+            result = parse_grades_excel(base_path + xlsx_file, engine="columnar")
+            graded = [x for x in result["result"]["data"] if "grade" in x]
+            distributions = result["result"]["distributions"]
+
+            grades_dist: dict = {}
+            for student in graded:
+                key = str(float(student["grade"]))
+                grades_dist[key] = grades_dist.get(key, 0) + 1
+            self.assertEqual(distributions["grades_dist"], grades_dist)
+
+            for q, question_dist in enumerate(distributions["question_grades_dist"]):
+                self.assertEqual(
+                    sum(question_dist.values()), len(graded), f"Question {q}"
+                )
+
+    def test_sample_files(self) -> None:
+        for xlsx_file in examples + invalid_examples + warning_examples:
+            self.assertSameResult(base_path + xlsx_file)
+
+    def test_generated_file(self) -> None:
+        # extended sheet with empty rows and non numeric question scores
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append([None] * 18)
+        sheet.append([None] * 8 + [10] * 10)
+        sheet.append(
+            [
+                "Αριθμός Μητρώου",
+                "Ονοματεπώνυμο",
+                "Ακαδημαϊκό E-mail",
+                "Περίοδος δήλωσης",
+                "Τμήμα Τάξης",
+                "Κλίμακα βαθμολόγησης",
+                "Βαθμολογία",
+                None,
+            ]
+            + [f"Q{q:02d}" for q in range(1, 11)]
+        )
+        for i in range(200):
+            if i % 50 == 7:
+                sheet.append([])
+                continue
+            scores = [(i + q) % 11 for q in range(10)]
+            scores[i % 10] = "n/a" if i % 3 == 0 else None
+            sheet.append(
+                [
+                    f"{i:07d}",
+                    f"STUDENT {i}",
+                    f"s{i}@ntua.gr",
+                    "2024-2025 ΧΕΙΜ 2024",
+                    "ΤΕΧΝΟΛΟΓΙΑ ΛΟΓΙΣΜΙΚΟΥ   (NTU_CS101)",
+                    "0-10",
+                    1 + i % 10,
+                    None,
+                ]
+                + scores
+            )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "generated.xlsx")
+            workbook.save(file_path)
+            result = parse_grades_excel(file_path, engine="streaming")
+            self.assertEqual(result["error"], "")
+            self.assertEqual(len(result["result"]["data"]), 200)
+            self.assertSameResult(file_path)
+
+    def test_parse_users(self) -> None:
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(
+            ["Αριθμός Μητρώου", "Ονοματεπώνυμο", "Ακαδημαϊκό E-mail"]
+            + ["password", "enrollment_year"]
+        )
+        sheet.append(["03184623", "STUDENT 1", "s1@ntua.gr", "123456789", 2018])
+        sheet.append([])
+        sheet.append(["03184610", "STUDENT 2", "s2@ntua.gr", "abcdefgh", 2018])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "users.xlsx")
+            workbook.save(file_path)
+            with open(file_path, "rb") as f:
+                response = client.post("/xlsx_parsing/parse_users", files={"file": f})
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()["result"]
+        self.assertEqual(result["format"], "students")
+        self.assertEqual(
+            result["users"][1],
+            {
+                "student_id": "03184610",
+                "name": "STUDENT 2",
+                "email": "s2@ntua.gr",
+                "password": "abcdefgh",
+                "enrollment_year": "2018",
+            },
+        )
+        self.assertEqual(len(result["users"]), 2)
+
+        # an instructor row without email
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["instructor_id", "name", "email", "password"])
+        workbook.active.append(["I1", "INSTRUCTOR 1", None, "123456789"])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "users.xlsx")
+            workbook.save(file_path)
+            with open(file_path, "rb") as f:
+                response = client.post("/xlsx_parsing/parse_users", files={"file": f})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Mandatory data in (2,3) is missing")
@@ -2,7 +2,7 @@ import importlib
 import json
 import os
 import tempfile
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.responses import JSONResponse
@@ -24,6 +24,7 @@ except ImportError:
 
 parse_grades_excel = parse_module.parse_grades_excel
 parse_enrolled_students_excel = parse_module.parse_enrolled_students_excel
+parse_users_excel = parse_module.parse_users_excel
 
 for example_base_path in (
     base_path + x for x in ["", "xlsx_parsing/", "xlsx_parsing/xlsx_parsing/"]
@@ -37,6 +38,44 @@ for example_base_path in (
 app = FastAPI()
 
 
+async def parse_upload(
+    file: UploadFile, parser: Callable[[str], Dict[str, Any]]
+) -> JSONResponse:
+    # Check file extension
+    if file.filename is None or not file.filename.lower().endswith((".xlsx")):
+        raise HTTPException(
+            status_code=415, detail={"error": "Only Excel files (.xlsx) are allowed"}
+        )
+
+    # Create a temporary file, named independently of the client's filename
+    fd, temp_path = tempfile.mkstemp(suffix=".xlsx")
+
+    try:
+        # Save the uploaded file temporarily
+        with os.fdopen(fd, "wb") as temp_file:
+            content = await file.read()
+            temp_file.write(content)
+
+        # Process the file
+        res: Dict[str, Any] = parser(temp_path)
+
+        if res["error"]:
+            # Return 400 for validation errors
+            return JSONResponse(status_code=400, content=res)
+        return JSONResponse(content=res)
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={"error": f"Unexpected Error processing file: {str(e)}"},
+        )
+
+    finally:
+        # Clean up - delete the temporary file
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
 @app.post(
     "/xlsx_parsing/parse_grades",
     response_description="Grades parsed successfully",
@@ -80,44 +119,7 @@ app = FastAPI()
     },
 )  # type: ignore
 async def parse_grades(file: UploadFile = File(...)) -> JSONResponse:
-    # Check file extension
-    if not file.filename.lower().endswith((".xlsx")):
-        raise HTTPException(
-            status_code=415, detail={"error": "Only Excel files (.xlsx) are allowed"}
-        )
-
-    # Create a temporary file
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, file.filename)
-
-    try:
-        # Save the uploaded file temporarily
-        with open(temp_path, "wb") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-
-        # Process the file
-        res: Dict[str, Any] = parse_grades_excel(temp_path)
-
-        if res["error"]:
-            # Return 400 for validation errors
-            return JSONResponse(status_code=400, content=res)
-        return JSONResponse(content=res)
-
-    except HTTPException:
-        # Re-raise HTTPExceptions (like the 415 above)
-        raise
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"error": f"Unexpected Error processing file: {str(e)}"},
-        )
-
-    finally:
-        # Clean up - delete the temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    return await parse_upload(file, parse_grades_excel)
 
 
 @app.post(
@@ -149,41 +151,38 @@ async def parse_grades(file: UploadFile = File(...)) -> JSONResponse:
     },
 )  # type: ignore
 async def parse_enrolled_students(file: UploadFile = File(...)) -> JSONResponse:
-    # Check file extension
-    if not file.filename.lower().endswith((".xlsx")):
-        raise HTTPException(
-            status_code=415, detail={"error": "Only Excel files (.xlsx) are allowed"}
-        )
-
-    # Create a temporary file
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, file.filename)
-
-    try:
-        # Save the uploaded file temporarily
-        with open(temp_path, "wb") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
+    return await parse_upload(file, parse_enrolled_students_excel)
 
-        # Process the file
-        res: Dict[str, Any] = parse_enrolled_students_excel(temp_path)
-
-        if res["error"]:
-            # Return 400 for validation errors
-            return JSONResponse(status_code=400, content=res)
-        return JSONResponse(content=res)
-
-    except HTTPException:
-        # Re-raise HTTPExceptions (like the 415 above)
-        raise
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail={"error": f"Unexpected Error processing file: {str(e)}"},
-        )
 
-    finally:
-        # Clean up - delete the temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+@app.post(
+    "/xlsx_parsing/parse_users",
+    response_description="Users parsed successfully",
+    responses={
+        200: {
+            "description": "Users parsed successfully",
+            "model": Dict[str, Any],
+            "content": {
+                "application/json": {
+                    "example": {
+                        "error": "",
+                        "warning": "",
+                        "result": {
+                            "format": "students",
+                            "users": [
+                                {
+                                    "student_id": "03184623",
+                                    "name": "KARAGIANNHS ELENH",
+                                    "email": "el18623@mail.ntua.gr",
+                                    "password": "123456789",
+                                    "enrollment_year": "2018",
+                                },
+                            ],
+                        },
+                    }
+                },
+            },
+        },
+    },
+)  # type: ignore
+async def parse_users(file: UploadFile = File(...)) -> JSONResponse:
+    return await parse_upload(file, parse_users_excel)
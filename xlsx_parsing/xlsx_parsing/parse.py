@@ -1,5 +1,7 @@
-from typing import Any, Dict, List, Union
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
 
+import numpy as np
 import openpyxl
 
 examples = [
@@ -38,8 +40,65 @@ greek_to_english = {
     "Ακαδημαϊκό E-mail": "email",
 }
 
+# "streaming" reads the sheet row by row in read-only mode,
+# "columnar" streams the rows and computes the scores with NumPy,
+# "full" loads the whole workbook in memory
+PARSER_ENGINE = os.getenv("XLSX_PARSER_ENGINE", "streaming")
 
-def parse_grades_excel(file_path: str) -> Dict[str, Any]:
+
+def parse_grades_excel(file_path: str, engine: Optional[str] = None) -> Dict[str, Any]:
+    engine = engine or PARSER_ENGINE
+    if engine == "full":
+        return parse_grades_excel_full(file_path)
+    return parse_grades_excel_streaming(file_path, columnar=engine == "columnar")
+
+
+def compute_total_scores(
+    question_scores: List[List[Union[int, float]]], question_weights: List[float]
+) -> List[float]:
+    scores = np.asarray(question_scores, dtype=np.float64)
+    # adjustment (/10) as weights sum up to 10
+    weighted = scores * (np.asarray(question_weights, dtype=np.float64) / 10)
+    # cumsum adds the questions left to right like sum() does,
+    # so the totals are identical to the ones of the row by row engines
+    totals: List[float] = np.cumsum(weighted, axis=1)[:, -1].tolist()
+    return totals
+
+
+def distribution(values: "np.ndarray[Any, Any]") -> Dict[str, int]:
+    # same keys as the CourseStatistics distributions, e.g. {"8.0": 5}
+    keys, counts = np.unique(values, return_counts=True)
+    return {str(float(key)): int(count) for key, count in zip(keys, counts)}
+
+
+def compute_distributions(data: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Precompute the grades_dist and question_grades_dist of CourseStatistics
+    for the parsed students, so they can be sent to the statistics service
+    together with the grades. Returns None if some grade is not numeric.
+    """
+    graded = [student for student in data if "grade" in student]
+    if not graded:
+        return None
+
+    try:
+        grades = np.asarray([student["grade"] for student in graded], dtype=np.float64)
+        question_grades = np.asarray(
+            [student["question_grades"] for student in graded], dtype=np.float64
+        )
+    except (ValueError, TypeError):
+        return None
+
+    return {
+        "grades_dist": distribution(grades),
+        "question_grades_dist": [
+            distribution(question_grades[:, q]) for q in range(question_grades.shape[1])
+        ],
+    }
+
+
+def parse_grades_excel_full(file_path: str) -> Dict[str, Any]:
+    # the whole workbook is loaded in memory
     result: Dict[str, Any] = {"error": "", "warning": "", "result": {}}
 
     try:
@@ -47,181 +106,254 @@ def parse_grades_excel(file_path: str) -> Dict[str, Any]:
         workbook = openpyxl.load_workbook(filename=file_path, data_only=True)
         sheet = workbook.active
 
-        # Determine if it's simple or extended format
-        is_extended = False
-        num_questions = 0
-        global_course_id = None
-        global_exam_type = None
-        global_year = None
-        not_empty_rows = 0
+        rows = (
+            tuple(cell.value for cell in row)
+            for row in sheet.iter_rows(
+                min_row=1, max_row=sheet.max_row, max_col=sheet.max_column
+            )
+        )
+        return parse_grades_rows(rows, sheet.max_row, sheet.max_column)
 
-        # Check for extended format markers
-        if sheet.max_column >= 18:
-            # Check for question headers in row 3, columns 9-18
-            question_headers: List[str] = []
-            for col in range(9, 19):
-                cell_value = sheet.cell(row=3, column=col).value
-                if cell_value and (
-                    str(cell_value).startswith("Q") or str(cell_value).startswith("W")
-                ):
-                    question_headers.append(str(cell_value))
+    except Exception as e:
+        result["error"] = f"An error occurred while processing the file: {str(e)}"
 
-            if len(question_headers) > 0:
-                is_extended = True
-                num_questions = len(question_headers)
+    return result
 
-        # Validate basic structure
-        if sheet.max_row < 4:
-            result["error"] = "Excel file has too few rows (minimum 4 required)"
-            return result
 
-        # Extract headers (row 3)
-        mandatory_headers: List[str] = []
-        for col in range(1, 8):
-            header = sheet.cell(row=3, column=col).value
-            if header is None:
-                result["error"] = f"Mandatory header in column {col} is missing"
-                return result
-            mandatory_headers.append(str(header))
+def parse_grades_excel_streaming(
+    file_path: str, columnar: bool = False
+) -> Dict[str, Any]:
+    # The workbook is opened in read-only mode and every row is read exactly
+    # once as a tuple of values, so memory stays constant regardless of the
+    # number of rows.
+    result: Dict[str, Any] = {"error": "", "warning": "", "result": {}}
+    workbook = None
 
-        # Add question weights if extended format
-        if is_extended:
-            question_weights: List[float] = []
-            for q in range(1, num_questions + 1):
-                col = 8 + q
-                weight = sheet.cell(row=2, column=col).value
-                try:
-                    question_weights.append(
-                        float(weight) / 10 if weight is not None else 0.0
-                    )  # adjustment (/10) so that weights sum up to 10
-                except (ValueError, TypeError):
-                    question_weights.append(0.0)
-                    result[
-                        "warning"
-                    ] += f"Question weight in ({2},{col}) is not numeric, assumed as 0.0\n"
-
-            if sum(question_weights) != 10:
+    try:
+        # Load the workbook
+        workbook = openpyxl.load_workbook(
+            filename=file_path, read_only=True, data_only=True
+        )
+        sheet = workbook.active
+
+        # the dimensions come from the sheet metadata, which some writers omit
+        if sheet.max_row is None or sheet.max_column is None:
+            sheet.calculate_dimension(force=True)
+        max_row: int = sheet.max_row
+        max_column: int = sheet.max_column
+
+        # columns 1-7 are mandatory, questions live in columns 9-18
+        rows = sheet.iter_rows(
+            min_row=1,
+            max_row=max_row,
+            max_col=max(7, min(max_column, 18)),
+            values_only=True,
+        )
+        return parse_grades_rows(rows, max_row, max_column, columnar)
+
+    except Exception as e:
+        result["error"] = f"An error occurred while processing the file: {str(e)}"
+    finally:
+        # read-only workbooks keep the file open until closed
+        if workbook is not None:
+            workbook.close()
+
+    return result
+
+
+def parse_grades_rows(
+    rows: Iterator[Sequence[Any]],
+    max_row: int,
+    max_column: int,
+    columnar: bool = False,
+) -> Dict[str, Any]:
+    """
+    Parses the rows of a grades sheet, given as tuples of cell values from
+    row 1 on, whichever engine read them.
+    In columnar mode the question scores are collected into one array:
+    totals and the grade distributions are then computed in vectorized form.
+    """
+    result: Dict[str, Any] = {"error": "", "warning": "", "result": {}}
+
+    # Determine if it's simple or extended format
+    is_extended = False
+    num_questions = 0
+    global_course_id = None
+    global_exam_type = None
+    global_year = None
+    not_empty_rows = 0
+    score_rows: List[List[Union[int, float]]] = []
+
+    # columns 1-7 are mandatory, questions live in columns 9-18
+    width = max(7, min(max_column, 18))
+
+    def padded(values: Optional[Sequence[Any]]) -> Sequence[Any]:
+        # rows of a read-only sheet can be shorter than the sheet
+        values = tuple(values or ())
+        return values + (None,) * (width - len(values))
+
+    next(rows, None)  # row 1 holds no data
+    weights_row = padded(next(rows, None))
+    headers_row = padded(next(rows, None))
+
+    # Check for extended format markers
+    if max_column >= 18:
+        # Check for question headers in row 3, columns 9-18
+        question_headers: List[str] = []
+        for cell_value in headers_row[8:18]:
+            if cell_value and (
+                str(cell_value).startswith("Q") or str(cell_value).startswith("W")
+            ):
+                question_headers.append(str(cell_value))
+
+        if len(question_headers) > 0:
+            is_extended = True
+            num_questions = len(question_headers)
+
+    # Validate basic structure
+    if max_row < 4:
+        result["error"] = "Excel file has too few rows (minimum 4 required)"
+        return result
+
+    # Extract headers (row 3)
+    mandatory_headers: List[str] = []
+    for col in range(1, 8):
+        header = headers_row[col - 1]
+        if header is None:
+            result["error"] = f"Mandatory header in column {col} is missing"
+            return result
+        mandatory_headers.append(str(header))
+
+    # Add question weights if extended format
+    if is_extended:
+        question_weights: List[float] = []
+        for q in range(1, num_questions + 1):
+            col = 8 + q
+            weight = weights_row[col - 1]
+            try:
+                question_weights.append(
+                    float(weight) / 10 if weight is not None else 0.0
+                )  # adjustment (/10) so that weights sum up to 10
+            except (ValueError, TypeError):
+                question_weights.append(0.0)
                 result[
                     "warning"
-                ] += f"Question weights sum to {sum(question_weights)} instead of 10. Be sure that you have not forgotten to add headers (Q01, Q02, ...) for questions in the row 3 of the excel\n"
+                ] += f"Question weight in ({2},{col}) is not numeric, assumed as 0.0\n"
 
-        # Process data rows
-        data: List[Dict[str, Any]] = []
-        for row in range(4, sheet.max_row + 1):
-            student_data: Dict[str, Any] = {}
+        if sum(question_weights) != 10:
+            result[
+                "warning"
+            ] += f"Question weights sum to {sum(question_weights)} instead of 10. Be sure that you have not forgotten to add headers (Q01, Q02, ...) for questions in the row 3 of the excel\n"
 
-            if all((sheet.cell(row=row, column=c).value is None) for c in range(1, 8)):
-                pass  # skip empty rows
-            else:
-                not_empty_rows += 1
-
-            # Process mandatory columns (1-7)
-            for col in range(1, 8):
-                header = greek_to_english[mandatory_headers[col - 1]]
-                if header in ["email", "grade_scale"]:
-                    continue  # Skip headers that are not needed
+    # Process data rows
+    data: List[Dict[str, Any]] = []
+    for row, row_values in enumerate(rows, start=4):
+        values = padded(row_values)
+        student_data: Dict[str, Any] = {}
 
-                cell_value = sheet.cell(row=row, column=col).value
-                if not cell_value and all(
-                    (sheet.cell(row=row, column=c).value is None) for c in range(1, 8)
-                ):
-                    # Skip empty rows
-                    continue
-                elif not cell_value:
-                    result["error"] = f"Mandatory data in ({row},{col}) is missing"
-                    print("missed data")
-                    return result
+        is_empty_row = all(value is None for value in values[:7])
+        if not is_empty_row:
+            not_empty_rows += 1
 
-                if header == "exam_type_and_year":
-                    # Split the exam type and year
-                    try:
-                        assert isinstance(cell_value, str)
-                        year = int(cell_value.strip().split("-")[0])
-                        exam_type = ""
-                        if "ΧΕΙΜ" in cell_value:
-                            exam_type = "Winter"
-                        elif any(x in cell_value for x in ["ΕΑΡ", "ΘΕΡ"]):
-                            exam_type = "Spring"
-                        elif any(x in cell_value for x in ["ΣΕΠ", "ΕΠΑΝ"]):
-                            exam_type = "September"
-                        else:
-                            raise ValueError("Invalid exam type")
-                        student_data["exam_type"] = exam_type
-                        student_data["year"] = year
+        # Process mandatory columns (1-7)
+        for col in range(1, 8):
+            header = greek_to_english[mandatory_headers[col - 1]]
+            if header in ["email", "grade_scale"]:
+                continue  # Skip headers that are not needed
+
+            cell_value = values[col - 1]
+            if not cell_value and is_empty_row:
+                # Skip empty rows
+                continue
+            elif not cell_value:
+                result["error"] = f"Mandatory data in ({row},{col}) is missing"
+                return result
 
-                        # ensure no different exam types are present
-                        if (not_empty_rows >= 2) and (global_exam_type != exam_type):
-                            result["error"] = (
-                                f"Exam type in ({row},{col}) does not match the global exam type: {global_exam_type}"
-                            )
-                            return result
-                        global_exam_type = exam_type
+            if header == "exam_type_and_year":
+                # Split the exam type and year
+                try:
+                    assert isinstance(cell_value, str)
+                    year = int(cell_value.strip().split("-")[0])
+                    exam_type = ""
+                    if "ΧΕΙΜ" in cell_value:
+                        exam_type = "Winter"
+                    elif any(x in cell_value for x in ["ΕΑΡ", "ΘΕΡ"]):
+                        exam_type = "Spring"
+                    elif any(x in cell_value for x in ["ΣΕΠ", "ΕΠΑΝ"]):
+                        exam_type = "September"
+                    else:
+                        raise ValueError("Invalid exam type")
+                    student_data["exam_type"] = exam_type
+                    student_data["year"] = year
 
-                        # ensure no different years are present
-                        if (not_empty_rows >= 2) and (global_year != year):
-                            result["error"] = (
-                                f"Year in ({row},{col}) does not match the global year: {global_year}"
-                            )
-                            return result
-                        global_year = year
+                    # ensure no different exam types are present
+                    if (not_empty_rows >= 2) and (global_exam_type != exam_type):
+                        result["error"] = (
+                            f"Exam type in ({row},{col}) does not match the global exam type: {global_exam_type}"
+                        )
+                        return result
+                    global_exam_type = exam_type
 
-                    except Exception as e:
+                    # ensure no different years are present
+                    if (not_empty_rows >= 2) and (global_year != year):
                         result["error"] = (
-                            f"Invalid format in ({row},{col}) for exam type and year:\n {e}"
+                            f"Year in ({row},{col}) does not match the global year: {global_year}"
                         )
                         return result
-                elif header == "course_title":
-                    try:
-                        assert isinstance(cell_value, str)
-                        course_id = cell_value.strip().split("(")[1].split(")")[0]
-                        student_data["course_id"] = course_id
+                    global_year = year
 
-                        # ensure no different course IDs are present
-                        if (not_empty_rows >= 2) and (global_course_id != course_id):
-                            result["error"] = (
-                                f"Course ID in ({row},{col}) does not match the global course ID: {global_course_id}"
-                            )
-                            return result
-                        global_course_id = course_id
+                except Exception as e:
+                    result["error"] = (
+                        f"Invalid format in ({row},{col}) for exam type and year:\n {e}"
+                    )
+                    return result
+            elif header == "course_title":
+                try:
+                    assert isinstance(cell_value, str)
+                    course_id = cell_value.strip().split("(")[1].split(")")[0]
+                    student_data["course_id"] = course_id
 
-                    except Exception as e:
+                    # ensure no different course IDs are present
+                    if (not_empty_rows >= 2) and (global_course_id != course_id):
                         result["error"] = (
-                            f"Invalid format in ({row},{col}) for course title:\n {e}"
+                            f"Course ID in ({row},{col}) does not match the global course ID: {global_course_id}"
                         )
                         return result
-                else:
-                    student_data[header] = cell_value
+                    global_course_id = course_id
 
-            # Process question data if extended format
-            if is_extended:
-                question_scores: List[Union[int, float]] = []
-                total_score = 0.0
-
-                for q in range(1, num_questions + 1):
-                    col = 8 + q
-                    cell_value = sheet.cell(row=row, column=col).value
-
-                    # Convert to float if possible, otherwise None
-                    if isinstance(cell_value, (int, float)):
-                        question_scores.append(cell_value)
-                    elif isinstance(cell_value, str):
-                        try:
-                            question_scores.append(float(cell_value))
-                        except ValueError:
-                            question_scores.append(0.0)
-                            result[
-                                "warning"
-                            ] += f"Question score in ({row},{col}) is not numeric, assumed as 0.0\n"
-                            # result["error"] = f"Question score in ({row},{col}) is not numeric"
-                            # return result
-                    else:
+                except Exception as e:
+                    result["error"] = (
+                        f"Invalid format in ({row},{col}) for course title:\n {e}"
+                    )
+                    return result
+            else:
+                student_data[header] = cell_value
+
+        # Process question data if extended format
+        if is_extended:
+            question_scores: List[Union[int, float]] = []
+            total_score = 0.0
+
+            for q in range(1, num_questions + 1):
+                col = 8 + q
+                cell_value = values[col - 1]
+
+                # Convert to float if possible, otherwise 0.0
+                if isinstance(cell_value, (int, float)):
+                    question_scores.append(cell_value)
+                else:
+                    try:
+                        question_scores.append(float(cell_value))
+                    except (ValueError, TypeError):
                         question_scores.append(0.0)
-                        result["warning"] = (
-                            f"Question score in ({row},{col}) is not numeric, assumed as 0.0\n"
-                        )
-                        # result["error"] = f"Question score in ({row},{col}) is not numeric"
-                        # return result
+                        result[
+                            "warning"
+                        ] += f"Question score in ({row},{col}) is not numeric, assumed as 0.0\n"
 
+            if columnar:
+                # totals are computed for the whole question block at once
+                score_rows.append(question_scores)
+            else:
                 # Calculate total score with None values treated as 0
                 numeric_scores = [
                     question_scores[i]
@@ -231,29 +363,32 @@ def parse_grades_excel(file_path: str) -> Dict[str, Any]:
                     for i in range(len(question_scores))
                 ]
                 total_score = sum(numeric_scores) if numeric_scores else 0.0
-                student_data["total_score"] = total_score
-
-            if student_data:
-                # add grade weights and question grades to student_data
-                student_data["grade_weights"] = (
-                    question_weights if is_extended else [10.0]
-                )
-                student_data["question_grades"] = (
-                    question_scores if is_extended else [student_data["grade"]]
-                )
-                data.append(student_data)
-
-        # Prepare result
-        result["result"] = {
-            "format": "extended" if is_extended else "simple",
-            "num_questions": num_questions if is_extended else None,
-            "mandatory_headers": mandatory_headers,
-            "data": data,
-            "question_weights": question_weights if is_extended else None,
-        }
-
-    except Exception as e:
-        result["error"] = f"An error occurred while processing the file: {str(e)}"
+            student_data["total_score"] = total_score
+
+        if student_data:
+            # add grade weights and question grades to student_data
+            student_data["grade_weights"] = question_weights if is_extended else [10.0]
+            student_data["question_grades"] = (
+                question_scores if is_extended else [student_data["grade"]]
+            )
+            data.append(student_data)
+
+    if columnar and is_extended and data:
+        # every extended row is appended to data, so rows line up
+        totals = compute_total_scores(score_rows, question_weights)
+        for student_data, total_score in zip(data, totals):
+            student_data["total_score"] = total_score
+
+    # Prepare result
+    result["result"] = {
+        "format": "extended" if is_extended else "simple",
+        "num_questions": num_questions if is_extended else None,
+        "mandatory_headers": mandatory_headers,
+        "data": data,
+        "question_weights": question_weights if is_extended else None,
+    }
+    if columnar:
+        result["result"]["distributions"] = compute_distributions(data)
 
     return result
 
@@ -391,6 +526,91 @@ def parse_enrolled_students_excel(file_path: str) -> Dict[str, Any]:
     return result
 
 
+# mandatory columns of a registrar export of students / instructors
+user_mandatory_headers = {
+    "student_id": ["student_id", "name", "email", "password", "enrollment_year"],
+    "instructor_id": ["instructor_id", "name", "email", "password"],
+}
+user_optional_headers = {
+    "student_id": [],
+    "instructor_id": ["department", "phone", "office"],
+}
+
+
+def parse_users_excel(file_path: str) -> Dict[str, Any]:
+    """
+    Parses a registrar export of students or instructors: one header row
+    (the english field names, or the greek headers of greek_to_english) and
+    one user per row. The user type follows from the id column, student_id
+    or instructor_id. Values are returned as strings (ids stored as numbers
+    lose their leading zeros).
+    """
+    result: Dict[str, Any] = {"error": "", "warning": "", "result": {}}
+    workbook = None
+
+    try:
+        workbook = openpyxl.load_workbook(
+            filename=file_path, read_only=True, data_only=True
+        )
+        rows = workbook.active.iter_rows(values_only=True)
+
+        header_row = next(rows, None)
+        if header_row is None:
+            result["error"] = "Excel file is empty"
+            return result
+        headers = [
+            (
+                greek_to_english.get(str(header).strip(), str(header).strip())
+                if header is not None
+                else None
+            )
+            for header in header_row
+        ]
+
+        id_header = next((h for h in user_mandatory_headers if h in headers), None)
+        if id_header is None:
+            result["error"] = "Missing student_id or instructor_id header"
+            return result
+        for header in user_mandatory_headers[id_header]:
+            if header not in headers:
+                result["error"] = f"Mandatory header {header} is missing"
+                return result
+
+        columns = {
+            header: headers.index(header)
+            for header in user_mandatory_headers[id_header]
+            + user_optional_headers[id_header]
+            if header in headers
+        }
+        users = []
+        for row_number, row in enumerate(rows, start=2):
+            if all(value is None for value in row):
+                continue  # skip empty rows
+
+            user: Dict[str, Any] = {}
+            for header, column in columns.items():
+                value = row[column] if column < len(row) else None
+                if value is None and header in user_mandatory_headers[id_header]:
+                    result["error"] = (
+                        f"Mandatory data in ({row_number},{column + 1}) is missing"
+                    )
+                    return result
+                user[header] = None if value is None else str(value).strip()
+            users.append(user)
+
+        result["result"] = {
+            "format": "students" if id_header == "student_id" else "instructors",
+            "users": users,
+        }
+    except Exception as e:
+        result["error"] = f"An error occurred while processing the file: {str(e)}"
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+    return result
+
+
 if __name__ == "__main__":
     file_path = examples[2]  # Example file path
     result = parse_grades_excel(file_path)